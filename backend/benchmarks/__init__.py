@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the cost engine and the API.
+
+Run from the backend directory with ``python -m benchmarks.run --help``.
+"""
@@ -0,0 +1,361 @@
+"""
+Benchmark the cost engine and /api/calculate against synthetic data.
+
+Usage (from the backend directory)::
+
+    python -m benchmarks.run --plans 10 100 1000 --output before.json
+    python -m benchmarks.run --plans 10 100 1000 --output after.json --compare before.json
+
+Results are written as JSON: one entry per microbenchmark and per load test,
+keyed by ``name`` so two runs can be compared entry by entry.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    from benchmarks.synthetic import (
+        USAGE_PROFILES, synthetic_payload, synthetic_usage, write_synthetic_catalog, write_synthetic_fehb,
+        write_synthetic_service_costs,
+    )
+    from routers.health_plans import get_parsed_health_plans
+    from services import cost_calculator
+    from services.compile_catalog import compile_catalog
+    from services.fehb_ingest import BENEFITS_KEY, load_fehb_plans, normalize_benefits
+    from services.plan_catalog import PlanCatalog, catalog
+    from services.break_even import break_even
+    from services.cost_curves import evaluate_curves
+    from services.pareto import pareto_frontier
+    from services.projection import project_costs
+    from services.recommendation_engine import recommend_plans
+    from services.service_costs import service_cost_table
+except ImportError:
+    from backend.benchmarks.synthetic import (
+        USAGE_PROFILES, synthetic_payload, synthetic_usage, write_synthetic_catalog, write_synthetic_fehb,
+        write_synthetic_service_costs,
+    )
+    from backend.routers.health_plans import get_parsed_health_plans
+    from backend.services import cost_calculator
+    from backend.services.compile_catalog import compile_catalog
+    from backend.services.fehb_ingest import BENEFITS_KEY, load_fehb_plans, normalize_benefits
+    from backend.services.plan_catalog import PlanCatalog, catalog
+    from backend.services.break_even import break_even
+    from backend.services.cost_curves import evaluate_curves
+    from backend.services.pareto import pareto_frontier
+    from backend.services.projection import project_costs
+    from backend.services.recommendation_engine import recommend_plans
+    from backend.services.service_costs import service_cost_table
+
+DEFAULT_PLAN_COUNTS = (10, 100, 1000, 10000)
+
+
+def measure(fn: Callable[[], Any], repeat: int = 20, number: int = 1, budget: float = 2.0) -> Dict[str, float]:
+    """
+    Time ``fn`` in ``repeat`` rounds of ``number`` calls each.
+
+    Stops early once ``budget`` seconds have been spent (after at least three
+    rounds), so slow cases don't dominate the run.
+
+    :return: Per-call seconds: min, median, mean and p95 over the rounds.
+    """
+    fn()  # warm up caches and lazy imports
+    timings = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - t0) / number)
+        if len(timings) >= 3 and time.perf_counter() - started > budget:
+            break
+    return {
+        "rounds": len(timings),
+        "calls_per_round": number,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+        "p95_s": float(np.percentile(timings, 95)),
+    }
+
+
+def peak_memory(fn: Callable[[], Any]) -> Dict[str, float]:
+    """
+    Peak Python heap allocated while running ``fn`` once, per tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_mb": peak / 1e6}
+
+
+def latency_summary(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Percentiles and throughput of a load test.
+    """
+    return {
+        "requests": len(latencies),
+        "elapsed_s": elapsed,
+        "requests_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def use_data_files(plan_csv: str, service_costs_json: str) -> None:
+    """
+    Point the process-wide plan catalog and service cost table at new files
+    (ignoring any compiled catalog).
+    """
+    catalog.path, catalog.compiled_path = plan_csv, None
+    service_cost_table.path, service_cost_table.compiled_path = service_costs_json, None
+    catalog.get()
+    service_cost_table.get()
+
+
+def micro_benchmarks(plan_counts, profiles, engines, repeat: int, budget: float, workdir: str) -> List[Dict[str, Any]]:
+    results = []
+
+    def record(name: str, params: Dict[str, Any], stats: Dict[str, float]) -> None:
+        entry = {"name": name, "params": params, **stats}
+        results.append(entry)
+        print(f"{name:<60} median {stats['median_s'] * 1e6:12.1f} us", file=sys.stderr)
+
+    coverage = {"deductible_applies": True, "copay": 0.0, "coinsurance": 0.2}
+    record("calculate_service_cost", {}, measure(
+        lambda: cost_calculator.calculate_service_cost(275.0, 1, coverage, 500.0, 6000.0),
+        repeat=repeat, number=1000, budget=budget,
+    ))
+
+    record("calculate_hsa_growth/cached", {}, measure(
+        lambda: cost_calculator.calculate_hsa_growth(3000.0, 1200.0, 0.5, 0.05),
+        repeat=repeat, number=1000, budget=budget,
+    ))
+
+    def uncached_hsa_growth():
+        cost_calculator._cached_hsa_growth.cache_clear()
+        cost_calculator.calculate_hsa_growth(3000.0, 1200.0, 0.5, 0.05)
+
+    record("calculate_hsa_growth/uncached", {}, measure(uncached_hsa_growth, repeat=repeat, number=1000, budget=budget))
+
+    service_costs_json = write_synthetic_service_costs(os.path.join(workdir, "service_costs.json"))
+    for n_plans in plan_counts:
+        plan_csv = write_synthetic_catalog(os.path.join(workdir, f"plans_{n_plans}.csv"), n_plans)
+        use_data_files(plan_csv, service_costs_json)
+
+        params = {"plans": n_plans}
+        record(f"get_parsed_health_plans/warm/{n_plans}", params, measure(
+            get_parsed_health_plans, repeat=repeat, number=100, budget=budget,
+        ))
+        record(f"get_parsed_health_plans/cold/{n_plans}", params, measure(
+            lambda: PlanCatalog(plan_csv).get(), repeat=repeat, budget=budget,
+        ))
+        compiled = os.path.join(workdir, f"plans_{n_plans}.catalog")
+        compile_catalog(plan_csv, service_costs_json, compiled)
+        record(f"get_parsed_health_plans/cold_compiled/{n_plans}", params, measure(
+            lambda: PlanCatalog(plan_csv, compiled).get(), repeat=repeat, budget=budget,
+        ))
+
+        fehb_json = write_synthetic_fehb(os.path.join(workdir, f"fehb_{n_plans}.json"), n_plans)
+
+        def fehb_json_load():
+            # The non-streaming equivalent: decode the whole document, then normalize
+            with open(fehb_json, "rb") as f:
+                document = json.load(f)
+            return [plan for record in document[BENEFITS_KEY] for plan in normalize_benefits(record["attributes"])]
+
+        for name, fn in (("stream", lambda: load_fehb_plans(fehb_json)), ("json_load", fehb_json_load)):
+            record(f"fehb_ingest/{name}/{n_plans}", params, {
+                **measure(fn, repeat=repeat, budget=budget), **peak_memory(fn),
+            })
+
+        # One slider position, and a whole chart's worth of levels
+        for n_levels in (1, 101):
+            levels = np.linspace(0.0, 50000.0, n_levels).tolist()
+            record(f"evaluate_curves/{n_levels}_levels/{n_plans}", params, measure(
+                lambda: evaluate_curves(levels, 0.22, "Self", cost_calculator.user_financials({})),
+                repeat=repeat, budget=budget,
+            ))
+
+        # Every plan against one reference, and a pairwise matrix of up to 100 plans
+        self_plans = [plan.plan_id for plan in catalog.get().tables.get("Self", ())]
+        if self_plans:
+            record(f"break_even/reference/{n_plans}", params, measure(
+                lambda: break_even(0.22, "Self", cost_calculator.user_financials({}), reference=self_plans[0]),
+                repeat=repeat, budget=budget,
+            ))
+            record(f"break_even/matrix/{min(n_plans, 100)}", params, measure(
+                lambda: break_even(0.22, "Self", cost_calculator.user_financials({}), plan_ids=self_plans[:100]),
+                repeat=repeat, budget=budget,
+            ))
+
+        for profile in profiles:
+            user_input = synthetic_usage(profile)
+            for engine in engines:
+                record(f"calculate_costs/{engine}/{profile}/{n_plans}",
+                       {"plans": n_plans, "profile": profile, "engine": engine,
+                        "events": sum(details["count"] for details in user_input.values())},
+                       measure(lambda: cost_calculator.calculate_costs(user_input, 0.22, "Self", engine=engine),
+                               repeat=repeat, budget=budget))
+            # Scoring only: the recommend endpoint reuses cached cost results
+            costs = cost_calculator.calculate_costs(user_input, 0.22, "Self")
+            record(f"recommend_plans/{profile}/{n_plans}", {"plans": n_plans, "profile": profile},
+                   measure(lambda: recommend_plans(user_input, 0.22, "Self", results=costs),
+                           repeat=repeat, budget=budget))
+            record(f"pareto_frontier/{profile}/{n_plans}", {"plans": n_plans, "profile": profile},
+                   measure(lambda: pareto_frontier(user_input, 0.22, "Self", results=costs),
+                           repeat=repeat, budget=budget))
+            record(f"project_costs/30_years/{profile}/{n_plans}", {"plans": n_plans, "profile": profile},
+                   measure(lambda: project_costs([user_input], 0.22, "Self", 30, premium_inflation=0.06,
+                                                 service_inflation=0.05),
+                           repeat=repeat, budget=budget))
+    return results
+
+
+async def _load_test(path: str, payloads: List[Dict[str, Any]], concurrency: int) -> Dict[str, float]:
+    import httpx
+
+    try:
+        from main import app
+    except ImportError:
+        from backend.main import app
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def one(payload):
+            async with semaphore:
+                t0 = time.perf_counter()
+                response = await client.post(path, json=payload)
+                latencies.append(time.perf_counter() - t0)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(payload) for payload in payloads))
+        elapsed = time.perf_counter() - started
+    return latency_summary(latencies, elapsed)
+
+
+def load_tests(plan_counts, profiles, requests: int, concurrency: int, workdir: str,
+               path: str = "/api/calculate") -> List[Dict[str, Any]]:
+    """
+    Drive ``path`` in-process with ``requests`` distinct payloads per plan
+    count and profile, ``concurrency`` at a time.
+
+    Every payload has different event dates, so the result cache never hits.
+    """
+    results = []
+    service_costs_json = os.path.join(workdir, "service_costs.json")
+    if not os.path.exists(service_costs_json):
+        write_synthetic_service_costs(service_costs_json)
+    for n_plans in plan_counts:
+        plan_csv = os.path.join(workdir, f"plans_{n_plans}.csv")
+        if not os.path.exists(plan_csv):
+            write_synthetic_catalog(plan_csv, n_plans)
+        use_data_files(plan_csv, service_costs_json)
+        for profile in profiles:
+            payloads = [synthetic_payload(profile, seed=seed) for seed in range(requests)]
+            summary = asyncio.run(_load_test(path, payloads, concurrency))
+            name = f"load{path}/{profile}/{n_plans}"
+            results.append({
+                "name": name,
+                "params": {"plans": n_plans, "profile": profile, "concurrency": concurrency},
+                **summary,
+            })
+            print(f"{name:<60} p50 {summary['p50_ms']:8.2f} ms  p99 {summary['p99_ms']:8.2f} ms  "
+                  f"{summary['requests_per_s']:8.1f} req/s", file=sys.stderr)
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cost_engine": cost_calculator.COST_ENGINE,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """
+    Print how each benchmark in ``current`` moved relative to ``baseline``.
+    """
+    before = {entry["name"]: entry for entry in baseline.get("micro", []) + baseline.get("load", [])}
+    for entry in current.get("micro", []) + current.get("load", []):
+        previous = before.get(entry["name"])
+        if previous is None:
+            continue
+        metric = "median_s" if "median_s" in entry else "p50_ms"
+        ratio = entry[metric] / previous[metric] if previous[metric] else float("inf")
+        print(f"{entry['name']:<60} {metric} x{ratio:6.2f}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, nargs="+", default=DEFAULT_PLAN_COUNTS,
+                        help="Synthetic catalog sizes to benchmark")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(USAGE_PROFILES), default=sorted(USAGE_PROFILES),
+                        help="Usage profiles to benchmark")
+    parser.add_argument("--engines", nargs="+", choices=cost_calculator.ENGINES, default=cost_calculator.ENGINES)
+    parser.add_argument("--repeat", type=int, default=20, help="Timing rounds per microbenchmark")
+    parser.add_argument("--budget", type=float, default=2.0, help="Seconds allowed per microbenchmark")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per load test (0 skips load tests)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests in the load test")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    # Keep per-request log lines out of the timings
+    logging.disable(logging.WARNING)
+    original_paths = catalog.path, catalog.compiled_path, service_cost_table.path, service_cost_table.compiled_path
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = {
+                "environment": environment(),
+                "args": vars(args),
+                "micro": micro_benchmarks(args.plans, args.profiles, args.engines, args.repeat, args.budget, workdir),
+                "load": load_tests(args.plans, args.profiles, args.requests, args.concurrency, workdir)
+                if args.requests > 0 else [],
+            }
+    finally:
+        catalog.path, catalog.compiled_path, service_cost_table.path, service_cost_table.compiled_path = original_paths
+        logging.disable(logging.NOTSET)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import csv
+import datetime
+import json
+import random
+from typing import Any, Dict, List
+
+try:
+    from services.fehb_ingest import BENEFITS_KEY, FEHB_SERVICE_COLUMNS, MEDICARE_GROUPS, PREMIUM_COLUMN
+    from services.plan_catalog import ENROLLMENT_TYPES, SERVICE_COLUMNS, SERVICE_NAMES
+except ImportError:
+    from backend.services.fehb_ingest import BENEFITS_KEY, FEHB_SERVICE_COLUMNS, MEDICARE_GROUPS, PREMIUM_COLUMN
+    from backend.services.plan_catalog import ENROLLMENT_TYPES, SERVICE_COLUMNS, SERVICE_NAMES
+
+PLAN_CSV_HEADER = [
+    "Short Name",
+    "Enrollment Type",
+    "2025 Monthly - Empl. Pays",
+    "Calendar Year Deductible",
+    "Premium Pass Through HSA/HRA Contribution",
+    "Services & Benefits - Type of Account",
+    *SERVICE_COLUMNS.values(),
+]
+
+# Rough average cost of each service, in dollars
+SYNTHETIC_SERVICE_COSTS = {
+    "Primary Care": 150.0,
+    "Specialist": 275.0,
+    "Emergency Care": 2200.0,
+    "Urgent Care": 180.0,
+    "Accidental Injury": 650.0,
+    "Inpatient Admission": 12500.0,
+    "Room and Board": 3100.0,
+    "Outpatient Surgery": 4200.0,
+    "Outpatient Tests": 850.0,
+    "Simple Labs": 45.0,
+    "Complex Labs": 1100.0,
+    "Medications Tier 0": 5.0,
+    "Medications Tier 1": 12.0,
+    "Medications Tier 2": 65.0,
+    "Medications Tier 3": 180.0,
+    "Medications Tier 4": 950.0,
+    "Medications Tier 5": 3800.0,
+    "ABA": 240.0,
+    "Chiropractic": 70.0,
+    "OT": 140.0,
+    "Speech Therapy": 130.0,
+    "Physical Therapy": 120.0,
+    "Infertility Services": 14000.0,
+    "Hearing Services": 2400.0,
+    "Maternity Care": 13000.0,
+}
+
+# Events per year for each service, from a light user to a high utilizer
+USAGE_PROFILES = {
+    "light": {
+        "Primary Care": 2,
+        "Simple Labs": 1,
+        "Medications Tier 1": 2,
+    },
+    "moderate": {
+        "Primary Care": 4,
+        "Specialist": 3,
+        "Urgent Care": 1,
+        "Simple Labs": 4,
+        "Medications Tier 1": 12,
+        "Physical Therapy": 6,
+    },
+    "chronic": {
+        "Primary Care": 6,
+        "Specialist": 12,
+        "Emergency Care": 1,
+        "Outpatient Tests": 4,
+        "Simple Labs": 12,
+        "Complex Labs": 4,
+        "Medications Tier 1": 24,
+        "Medications Tier 2": 12,
+        "Medications Tier 3": 12,
+        "Physical Therapy": 12,
+    },
+    "high_utilizer": {
+        "Primary Care": 12,
+        "Specialist": 48,
+        "Emergency Care": 4,
+        "Urgent Care": 6,
+        "Inpatient Admission": 2,
+        "Room and Board": 10,
+        "Outpatient Surgery": 2,
+        "Outpatient Tests": 24,
+        "Simple Labs": 52,
+        "Complex Labs": 12,
+        "Medications Tier 1": 36,
+        "Medications Tier 2": 36,
+        "Medications Tier 3": 24,
+        "Medications Tier 4": 12,
+        "Chiropractic": 24,
+        "OT": 24,
+        "Physical Therapy": 52,
+        "Speech Therapy": 24,
+    },
+}
+
+_COVERAGE_CHOICES = ("0", "10%", "15%", "20%", "25%", "30%", "35%", "10", "25", "40", "75", "150", "350")
+_ACCOUNT_TYPES = ("N/A", "HSA", "HRA")
+# FEHB cost-sharing values, in the forms the benefits document uses
+_FEHB_COVERAGE_CHOICES = (0, 0.1, 0.2, 0.3, 10, 25, 40, "Tier 1: $10", "Tier 2: 45%", "25% $350 Max",
+                          "Member Pays All Charges", "Not Covered", "Yes", "No", "Covered")
+
+
+def synthetic_plan_rows(n_plans: int, seed: int = 0) -> List[List[str]]:
+    """
+    Build ``n_plans`` health_plan_info.csv rows, cycling through the
+    enrollment types, with random premiums, deductibles and coverage.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_plans):
+        enrollment_type = ENROLLMENT_TYPES[i % len(ENROLLMENT_TYPES)]
+        scale = 1 + ENROLLMENT_TYPES.index(enrollment_type)
+        account_type = rng.choice(_ACCOUNT_TYPES)
+        if account_type == "HSA":
+            deductible = rng.choice((1650, 2000, 3000, 3500)) * scale
+            pass_through = rng.choice((600, 900, 1200)) * scale
+        else:
+            deductible = rng.choice((0, 250, 350, 500, 750, 1000)) * scale
+            pass_through = rng.choice((0, 360, 720)) * scale if account_type == "HRA" else 0
+        rows.append([
+            f"Synthetic {i:05d}",
+            enrollment_type,
+            f"{rng.uniform(60, 400) * scale:.2f}",
+            str(deductible),
+            str(pass_through),
+            account_type,
+            *(rng.choice(_COVERAGE_CHOICES) for _ in SERVICE_COLUMNS),
+        ])
+    return rows
+
+
+def write_synthetic_catalog(path: str, n_plans: int, seed: int = 0) -> str:
+    """
+    Write a synthetic health_plan_info.csv with ``n_plans`` plans.
+
+    :return: The path written.
+    """
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(PLAN_CSV_HEADER)
+        writer.writerows(synthetic_plan_rows(n_plans, seed))
+    return path
+
+
+def write_synthetic_fehb(path: str, n_plans: int, seed: int = 0, extra_columns: int = 120) -> str:
+    """
+    Write a synthetic FEHB benefits document (see services.fehb_ingest) that
+    loads as ``n_plans`` plans: one benefits record and three premium records
+    per plan code. ``extra_columns`` pads each record with benefit columns the
+    cost engine doesn't read, as the real document has.
+
+    :return: The path written.
+    """
+    rng = random.Random(seed)
+    benefits, premiums = [], []
+    for i in range(-(-n_plans // len(ENROLLMENT_TYPES))):
+        code = f"{i:04d}"
+        attributes = {
+            "Plan Code": code,
+            "Plan Code Name": f"Synthetic {code}",
+            "Network Type": "In-Network 1",
+            "Plan Code Option": rng.choice(("Standard", "High", "HDHP")),
+            "Services & Benefits - Medical Account (HRA/HSA)": rng.choice(("No", "Yes")),
+        }
+        for scale, enrollment_type in enumerate(ENROLLMENT_TYPES, 1):
+            attributes[f"Calendar Year Deductible {enrollment_type}"] = rng.choice((0, 350, 1500, 3000)) * scale
+            attributes[f"Catastrophic Limit {enrollment_type}"] = rng.choice((5000, 7500, 9000)) * scale
+            attributes[f"Premium Pass Through HSA/HRA Contribution {enrollment_type}"] = rng.choice((0, 750)) * scale
+            premiums.append({"attributes": {
+                "Plan": attributes["Plan Code Name"],
+                "Enrollment Code": f"{code}{scale}",
+                "Enrollment Type": enrollment_type,
+                PREMIUM_COLUMN: round(rng.uniform(60, 400) * scale, 2),
+            }})
+        for column in FEHB_SERVICE_COLUMNS.values():
+            attributes[column] = rng.choice(_FEHB_COVERAGE_CHOICES)
+        for prefix in MEDICARE_GROUPS.values():
+            attributes[f"{prefix}Office Visit"] = rng.choice(_FEHB_COVERAGE_CHOICES)
+        for j in range(extra_columns):
+            attributes[f"Other Benefits - Benefit {j:03d}"] = rng.choice(_FEHB_COVERAGE_CHOICES)
+        benefits.append({"id": i + 1, "attributes": attributes})
+    with open(path, "w") as f:
+        json.dump({BENEFITS_KEY: benefits, "Premiums": premiums}, f, indent=4)
+    return path
+
+
+def write_synthetic_service_costs(path: str) -> str:
+    """
+    Write a service_costs.json covering every service the plan parser knows.
+    """
+    with open(path, "w") as f:
+        json.dump({service: SYNTHETIC_SERVICE_COSTS[service] for service in SERVICE_NAMES}, f, indent=2)
+    return path
+
+
+def synthetic_usage(profile: str, seed: int = 0, year: int = 2025) -> Dict[str, Dict[str, Any]]:
+    """
+    Usage for one of USAGE_PROFILES, with each event on a random date of ``year``.
+
+    :return: ``{service: {"count", "dates"}}`` as sent by the frontend.
+    """
+    rng = random.Random(seed)
+    start = datetime.date(year, 1, 1)
+    days = (datetime.date(year + 1, 1, 1) - start).days
+    usage = {}
+    for service, count in USAGE_PROFILES[profile].items():
+        dates = sorted(
+            (start + datetime.timedelta(days=rng.randrange(days))).isoformat()
+            for _ in range(count)
+        )
+        usage[service] = {"count": count, "dates": dates}
+    return usage
+
+
+def synthetic_payload(profile: str, plan_type: str = "Self", seed: int = 0) -> Dict[str, Any]:
+    """
+    Build a /api/calculate request body for a usage profile.
+    """
+    return {
+        "userData": {
+            "planType": plan_type,
+            "income": 85000,
+            "taxRate": 22,
+            "assumedRateOfReturn": 0.05,
+            "hsa": {"contribution": 3000, "limit": 4150, "percentSpent": 0.5},
+            "fsa": {"contribution": 500, "limit": 3200},
+            "medicare": {"partBPremium": 0, "coveredPeople": 0},
+        },
+        "inputDetails": synthetic_usage(profile, seed),
+    }
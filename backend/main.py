@@ -1,9 +1,42 @@
+import gc
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from routers import health_plans, calculate, recommend
 from routers.calculate import router as calculate_router
+from services.plan_catalog import catalog
+from services.service_costs import service_cost_table
+from services.calculation_pool import calculation_pool
+from logging_config import RequestIdMiddleware, configure_logging
+from metrics import CONTENT_TYPE, MetricsMiddleware, registry
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the plan catalog once so the first request doesn't pay for parsing
+    try:
+        catalog.get()
+    except RuntimeError as e:
+        logger.warning("Plan catalog not loaded at startup: %s", e)
+    try:
+        service_cost_table.get()
+    except RuntimeError as e:
+        logger.warning("Service costs not loaded at startup: %s", e)
+    # Move everything loaded so far out of the collector's reach: calculation
+    # pool workers are forked on first use and would otherwise copy the
+    # catalog's pages as soon as a collection touched their object headers
+    gc.freeze()
+    try:
+        yield
+    finally:
+        calculation_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Routers
 app.include_router(health_plans.router, prefix="/api/health-plans", tags=["Health Plans"])
@@ -16,6 +49,11 @@ app.include_router(calculate_router, prefix="/api")
 def ping():
     return {"message": "Application is running!"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,7 +61,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],# ["*", "GET", "POST", "OPTIONS", "PUT", "DELETE"],
     allow_headers=["*"],# ["*", "Content-Type", "Authorization"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 @app.options("/{path:path}")
 async def options_handler(path: str):
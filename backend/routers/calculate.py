@@ -1,16 +1,56 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, List
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Any, AsyncIterator, Dict, Iterable, List, Literal, Optional, Tuple
+import asyncio
 import json
+import logging
+import math
+import secrets
+import time
 
 try:
     from models import InputDetails
-    from services.cost_calculator import calculate_costs
-    from routers.health_plans import get_parsed_health_plans
+    from logging_config import request_id_var
+    from metrics import SPAN_DURATION, registry, request_started_at, span
+    from services.cost_calculator import (
+        MONTH_NAMES, iter_plan_costs, load_service_costs, rank_plan_costs, user_financials,
+    )
+    from services.break_even import break_even
+    from services.cost_curves import CURVE_DEFAULT_SERVICE, CURVE_MAX_LEVELS, evaluate_curves
+    from services.calculation_pool import (
+        calculation_pool, run_batch, run_calculation, run_simulation, PoolSaturated,
+        CALC_BATCH_MAX_SCENARIOS, CALC_RETRY_AFTER_SECONDS,
+    )
+    from services.plan_catalog import catalog
+    from services.result_cache import cached_costs, cached_costs_async, calculation_key, result_cache
+    from services.pareto import DEFAULT_PARETO_CRITERIA, pareto_frontier
+    from services.payload_store import payload_store, PayloadTooLarge
+    from services.projection import PROJECTION_MAX_YEARS, project_costs
+    from services.simulation import DEFAULT_PERCENTILES, SIM_DEFAULT_SAMPLES, SIM_MAX_SAMPLES
+    from services.whatif import apply_delta, build_state, replay_state, whatif_states
 except ImportError:
     from backend.models import InputDetails
-    from backend.services.cost_calculator import calculate_costs
-    from backend.routers.health_plans import get_parsed_health_plans
+    from backend.logging_config import request_id_var
+    from backend.metrics import SPAN_DURATION, registry, request_started_at, span
+    from backend.services.cost_calculator import (
+        MONTH_NAMES, iter_plan_costs, load_service_costs, rank_plan_costs, user_financials,
+    )
+    from backend.services.break_even import break_even
+    from backend.services.cost_curves import CURVE_DEFAULT_SERVICE, CURVE_MAX_LEVELS, evaluate_curves
+    from backend.services.calculation_pool import (
+        calculation_pool, run_batch, run_calculation, run_simulation, PoolSaturated,
+        CALC_BATCH_MAX_SCENARIOS, CALC_RETRY_AFTER_SECONDS,
+    )
+    from backend.services.plan_catalog import catalog
+    from backend.services.result_cache import cached_costs, cached_costs_async, calculation_key, result_cache
+    from backend.services.pareto import DEFAULT_PARETO_CRITERIA, pareto_frontier
+    from backend.services.payload_store import payload_store, PayloadTooLarge
+    from backend.services.projection import PROJECTION_MAX_YEARS, project_costs
+    from backend.services.simulation import DEFAULT_PERCENTILES, SIM_DEFAULT_SAMPLES, SIM_MAX_SAMPLES
+    from backend.services.whatif import apply_delta, build_state, replay_state, whatif_states
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -34,95 +74,618 @@ class Payload(BaseModel):
     userData: UserData
     inputDetails: Dict[str, InputDetails]
 
+class SimulationOptions(BaseModel):
+    samples: int = Field(SIM_DEFAULT_SAMPLES, ge=1, le=SIM_MAX_SAMPLES)
+    seed: Optional[int] = Field(None, ge=0)
+    percentiles: List[float] = Field(list(DEFAULT_PERCENTILES), max_length=20)
+    # Expected events per year, overriding (or adding to) the entered usage
+    frequencies: Dict[str, float] = {}
+    time_budget_seconds: Optional[float] = Field(None, gt=0)
+
+class SimulationPayload(Payload):
+    simulation: SimulationOptions = SimulationOptions()
+
+class ParetoPayload(Payload):
+    # Two or three of services.pareto.PARETO_CRITERIA
+    criteria: List[Literal["premium", "worst_case", "expected_cost", "out_of_pocket"]] = Field(
+        list(DEFAULT_PARETO_CRITERIA), min_length=2, max_length=3)
+
+class CurveGrid(BaseModel):
+    start: float = Field(0.0, ge=0)
+    stop: float = Field(20000.0, ge=0)
+    steps: int = Field(41, ge=1, le=CURVE_MAX_LEVELS)
+
+class CurvePayload(Payload):
+    # Usage is optional: the curves replace it with a spending level
+    inputDetails: Dict[str, InputDetails] = {}
+    service: str = CURVE_DEFAULT_SERVICE
+    # Allowed charges to evaluate at; when omitted, the levels of ``grid``
+    spending: Optional[List[float]] = Field(None, min_length=1, max_length=CURVE_MAX_LEVELS)
+    grid: CurveGrid = CurveGrid()
+
+class BreakEvenPayload(Payload):
+    inputDetails: Dict[str, InputDetails] = {}
+    service: str = CURVE_DEFAULT_SERVICE
+    # Plans to compare (default: every plan of the enrollment type)
+    plan_ids: Optional[List[str]] = Field(None, min_length=1)
+    # Compare each plan with this one instead of every pair
+    reference: Optional[str] = None
+
+class ProjectionPayload(Payload):
+    years: int = Field(10, ge=1, le=PROJECTION_MAX_YEARS)
+    # Annual growth rates, e.g. 0.06 for 6% a year
+    premium_inflation: float = Field(0.0, ge=-0.5, le=1.0)
+    service_inflation: float = Field(0.0, ge=-0.5, le=1.0)
+    starting_hsa_balance: float = Field(0.0, ge=0)
+    # Usage for year 1, 2, ...; later years repeat the last entry. Defaults
+    # to ``inputDetails`` every year
+    usage_by_year: List[Dict[str, InputDetails]] = Field([], max_length=PROJECTION_MAX_YEARS)
+
+class WhatIfDelta(BaseModel):
+    # Service name -> dates of events to add or remove
+    add: Dict[str, List[str]] = {}
+    remove: Dict[str, List[str]] = {}
+
+# Header (or cookie) identifying whose Data Input payload to save or return;
+# requests without either get a new random session in the cookie
+SESSION_HEADER = "X-Session-ID"
+SESSION_COOKIE = "session_id"
+
+
+def get_session_id(request: Request, response: Response) -> str:
+    """
+    The session ID sent with ``request``, or a new random one set as the
+    session cookie on ``response``.
+
+    :raises HTTPException: 400 for an ID longer than 128 characters.
+    """
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        session_id = secrets.token_urlsafe(32)
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    if len(session_id) > 128:
+        raise HTTPException(status_code=400, detail="Session ID too long")
+    return session_id
+
+
 @router.post("/user-data")
-def save_user_data(payload: dict):
+def save_user_data(payload: dict, request: Request, response: Response):
     """
-    Save the user payload from the Data Input tab to a file.
+    Save the user payload from the Data Input tab for this session.
     """
+    session_id = get_session_id(request, response)
     try:
-        with open("data/user_payload.json", "w") as f:
-            json.dump(payload, f)
+        payload_store.save(session_id, payload)
         return {"calculate.py": "User data saved successfully"}
-    except Exception as e:
-        print(f"Error saving user data: {e}")
+    except PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception:
+        logger.exception("Error saving user data")
         raise HTTPException(status_code=500, detail="Failed to save user data")
 
 
 @router.get("/user-data")
-def get_user_data():
+def get_user_data(request: Request, response: Response):
     """
-    Retrieve the most recent user payload for the Compare tab.
+    Retrieve this session's most recent user payload for the Compare tab.
     """
+    session_id = get_session_id(request, response)
     try:
-        with open("data/user_payload.json", "r") as f:
-            payload = json.load(f)
-        return payload
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="No user data found")
-    except Exception as e:
-        print(f"Error retrieving user data: {e}")
+        payload = payload_store.load(session_id)
+    except Exception:
+        logger.exception("Error retrieving user data")
         raise HTTPException(status_code=500, detail="Failed to fetch user data")
+    if payload is None:
+        raise HTTPException(status_code=404, detail="No user data found")
+    return payload
+
+
+def prepare_calculation(payload: Payload) -> Tuple[Dict[str, Any], float, str]:
+    """
+    Turn a Payload into the (user_input, tax_rate, plan_type) arguments of
+    calculate_costs.
+    """
+    user_data = payload.userData.dict()
+
+    # Extract enrollment type
+    enrollment_type = user_data.get("planType", "Self")
+
+    # Convert InputDetails to a dictionary
+    input_details_dict = {key: value.dict() for key, value in payload.inputDetails.items()}
+
+    # Convert tax rate to decimal
+    tax_rate = user_data["taxRate"] / 100
+    logger.debug("Calculate request: enrollment type %r, tax rate %.4f, %d services",
+                 enrollment_type, tax_rate, len(input_details_dict))
+    return input_details_dict, tax_rate, enrollment_type
+
+
+def format_plan_result(plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Shape one calculate_costs entry for the API response.
+    """
+    return {
+        "plan_name": plan_data["plan_name"],
+        "monthly_breakdown": plan_data["monthly_breakdown"],  # Directly use the pre-formatted dictionary
+        "annual_cost": plan_data["total_cost"],
+        "tax_savings": plan_data["tax_savings"],
+        "cumulative_cost": plan_data["cumulative_cost"],
+        "unused_hsa": plan_data["unused_hsa"],
+        "unused_fsa": plan_data["unused_fsa"]
+    }
+
+
+def format_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Format calculate_costs results with monthly and annual breakdowns.
+    """
+    formatted_results = {plan_id: format_plan_result(plan_data) for plan_id, plan_data in results.items()}
+    return {"message": "Cost calculation successful", "plans": formatted_results}
 
 
 @router.post("")
-def calculate_cost(payload: Payload):
+def calculate_cost(payload: Payload, request: Request, stream: bool = False,
+                   top_k: Optional[int] = Query(None, ge=1),
+                   sort_by: Optional[Literal["total_cost", "premiums", "worst_case"]] = None):
     """
     Calculate monthly and annual costs for each health plan.
-    """
-    try:
-        # Extract user inputs
-        user_data = payload.userData.dict()
-        input_details = payload.inputDetails
-        # print("Received Payload:", payload.dict())
 
-        # Extract enrollment type
-        enrollment_type = user_data.get("planType", "Self")
-        # print("Extracted enrollment type from user data:", enrollment_type)
+    With ``?stream=true`` each plan's result is sent as soon as it is costed
+    (see stream_plan_results), as server-sent events if the client accepts
+    ``text/event-stream`` and as NDJSON otherwise.
 
-        # Convert InputDetails to a dictionary
-        input_details_dict = {key: value.dict() for key, value in input_details.items()}
-        # print("Converted Input Details:", input_details_dict)
+    ``top_k`` and/or ``sort_by`` return only the K best plans, cheapest first,
+    by total cost (the default), annual premiums or worst-case exposure; plans
+    that can't make the cut are never fully costed (see rank_plan_costs).
+    """
+    try:
+        # Reading the body, JSON decoding and pydantic validation all happen
+        # before the handler runs
+        started_at = request_started_at(request.scope)
+        if started_at is not None:
+            SPAN_DURATION.observe(time.perf_counter() - started_at, span="parse_and_validate")
 
-        # Convert tax rate to decimal
-        tax_rate = user_data["taxRate"] / 100
-        # print("Processed tax rate:", tax_rate)
+        if top_k is not None or sort_by is not None:
+            return _ranked_calculation(payload, request, stream, top_k, sort_by or "total_cost")
 
-        # Load health plan data
-        health_plans = get_parsed_health_plans()
-        # print("Parsed plan:", health_plans)
+        with span("prepare"):
+            input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
 
-        # Perform cost calculationsS
+        # Perform cost calculations (plans come from the shared catalog),
+        # reusing the result of an identical earlier request when possible
         try:
-            results = calculate_costs(
-            user_input=input_details_dict,
-            tax_rate=tax_rate,
-            plan_type=enrollment_type
-        )
+            if stream:
+                with span("cache_lookup"):
+                    results = result_cache.get(calculation_key(input_details_dict, tax_rate, enrollment_type))
+                plan_results = results.items() if results is not None else iter_plan_costs(
+                    user_input=input_details_dict,
+                    tax_rate=tax_rate,
+                    plan_type=enrollment_type
+                )
+            else:
+                results = cached_costs(input_details_dict, tax_rate, enrollment_type)
 
         except Exception as e:
-            print(f"Error during cost calculations: {e}")
+            logger.exception("Error during cost calculations")
             raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
-        # print("Results", results)
-
-        # Format response with monthly and annual breakdowns
-        formatted_results = {
-            plan_id: {
-                "plan_name": plan_data["plan_name"],
-                "monthly_breakdown": plan_data["monthly_breakdown"],  # Directly use the pre-formatted dictionary
-                "annual_cost": plan_data["total_cost"],
-                "tax_savings": plan_data["tax_savings"],
-                "cumulative_cost": plan_data["cumulative_cost"],
-                "unused_hsa": plan_data["unused_hsa"],
-                "unused_fsa": plan_data["unused_fsa"]
-            }
-            for plan_id, plan_data in results.items()
-        }
-        return {"message": "Cost calculation successful", "plans": formatted_results}
+
+        if stream:
+            sse = "text/event-stream" in request.headers.get("accept", "")
+            return stream_plan_results(plan_results, sse)
+
+        # Render the response here rather than in FastAPI so serialization
+        # is timed too
+        with span("serialize"):
+            return JSONResponse(format_results(results))
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Unhandled error in calculate endpoint: {e}")
+        logger.exception("Unhandled error in calculate endpoint")
         raise HTTPException(status_code=500, detail=f"Error during calculation: {str(e)}")
 
 
+def _ranked_calculation(payload: Payload, request: Request, stream: bool,
+                        top_k: Optional[int], sort_by: str):
+    """
+    Top-K variant of calculate_cost. Ranked results are partial, so they
+    bypass the result cache.
+    """
+    with span("prepare"):
+        input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    try:
+        with span("calculate_costs"):
+            ranked, stats = rank_plan_costs(
+                user_input=input_details_dict,
+                tax_rate=tax_rate,
+                plan_type=enrollment_type,
+                top_k=top_k,
+                sort_by=sort_by,
+            )
+    except Exception as e:
+        logger.exception("Error during ranked cost calculations")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+    if stream:
+        return stream_plan_results(ranked, "text/event-stream" in request.headers.get("accept", ""))
+    with span("serialize"):
+        response = format_results(dict(ranked))
+        response["ranking"] = {"sort_by": sort_by, "top_k": top_k, **stats}
+        return JSONResponse(response)
+
+
+def stream_plan_results(plan_results: Iterable[Tuple[str, Dict[str, Any]]], sse: bool = False) -> StreamingResponse:
+    """
+    Stream ``(plan_id, result)`` pairs as they are produced.
+
+    Each plan is one ``{"plan_id", "plan"}`` message, followed by a final
+    ``{"message", "count"}`` message so clients can tell a complete response
+    from a dropped connection; a failure midway ends the stream with an
+    ``{"error"}`` message. In SSE mode these are ``plan``, ``done`` and
+    ``error`` events.
+
+    Streamed results aren't added to the result cache, since that would mean
+    holding the whole catalog's results until the last plan.
+    """
+    def frame(event: str, data: Dict[str, Any]) -> str:
+        body = json.dumps(data)
+        return f"event: {event}\ndata: {body}\n\n" if sse else body + "\n"
+
+    # A sync generator: Starlette iterates it in a worker thread, so costing
+    # the plans doesn't block the event loop
+    def messages():
+        count = 0
+        try:
+            for plan_id, result in plan_results:
+                yield frame("plan", {"plan_id": plan_id, "plan": format_plan_result(result)})
+                count += 1
+        except Exception as e:
+            logger.exception("Error while streaming plan results")
+            yield frame("error", {"error": f"Calculation error: {str(e)}"})
+            return
+        yield frame("done", {"message": "Cost calculation successful", "count": count})
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(messages(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+def _saturated() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Calculation capacity exhausted, please retry",
+        headers={"Retry-After": str(CALC_RETRY_AFTER_SECONDS)},
+    )
+
+
+@router.get("/cache-stats")
+def get_cache_stats():
+    """
+    Report result cache size and hit/miss/eviction counters.
+    """
+    return result_cache.stats()
+
+
+# Read at scrape time; result_cache is looked up on each call so a replaced
+# cache is reported
+for _stat, _kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                     ("expirations", "counter"), ("invalidations", "counter"),
+                     ("entries", "gauge"), ("hit_ratio", "gauge")):
+    registry.callback(
+        f"result_cache_{_stat}_total" if _kind == "counter" else f"result_cache_{_stat}",
+        f"Result cache {_stat.replace('_', ' ')}.",
+        lambda stat=_stat: result_cache.stats()[stat],
+        kind=_kind,
+    )
+registry.callback("calc_pool_pending", "Calculations queued or running in the calculation pool.",
+                  lambda: calculation_pool.pending)
+
+
+@router.post("/async")
+async def calculate_cost_async(payload: Payload):
+    """
+    Same as the calculate endpoint, but the calculation runs in the worker
+    process pool so it doesn't hold this process's GIL.
+
+    Returns 503 with Retry-After when the pool is saturated and 504 when the
+    calculation exceeds the configured timeout.
+    """
+    input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    try:
+        results = await cached_costs_async(
+            input_details_dict, tax_rate, enrollment_type,
+            lambda service_costs: calculation_pool.run(
+                run_calculation, input_details_dict, tax_rate, enrollment_type, request_id_var.get(), None,
+                service_costs,
+            ),
+        )
+    except PoolSaturated:
+        raise _saturated()
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Calculation timed out")
+    except Exception as e:
+        logger.exception("Error during cost calculations")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+    return format_results(results)
+
+
+@router.post("/simulate")
+async def simulate_cost(payload: SimulationPayload):
+    """
+    Monte Carlo distribution of each plan's annual cost.
+
+    The entered usage is read as expected events per year per service (see
+    simulate_costs); ``simulation`` sets the sample count, seed, reported
+    percentiles, frequency overrides and a time budget. Runs on the
+    calculation pool, with the same 503/504 handling as the async endpoint.
+    """
+    options = payload.simulation
+    if any(not 0 <= p <= 100 for p in options.percentiles):
+        raise HTTPException(status_code=422, detail="Percentiles must be between 0 and 100")
+    if any(frequency < 0 for frequency in options.frequencies.values()):
+        raise HTTPException(status_code=422, detail="Frequencies must not be negative")
+
+    input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    simulation_options = {
+        "samples": options.samples,
+        "seed": options.seed,
+        "percentiles": options.percentiles,
+        "frequencies": options.frequencies,
+        "time_budget": options.time_budget_seconds,
+    }
+    try:
+        results = await calculation_pool.run(
+            run_simulation, input_details_dict, tax_rate, enrollment_type, simulation_options, request_id_var.get()
+        )
+    except PoolSaturated:
+        raise _saturated()
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Simulation timed out")
+    except Exception as e:
+        logger.exception("Error during cost simulation")
+        raise HTTPException(status_code=500, detail=f"Simulation error: {str(e)}")
+
+    return {"message": "Cost simulation successful", **results}
+
+
+@router.post("/whatif")
+def start_whatif(payload: Payload):
+    """
+    Cost a base scenario and keep its month-by-month checkpoints.
+
+    Returns the usual plan results plus a ``token`` to pass to
+    ``POST /whatif/{token}``. Tokens expire after WHATIF_TTL_SECONDS and when
+    the plan or service-cost data is reloaded.
+    """
+    input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    try:
+        state = build_state(input_details_dict, tax_rate, enrollment_type)
+    except Exception as e:
+        logger.exception("Error during what-if calculation")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+    whatif_states.put(state.token, state)
+    return {**format_results(state.results()), "token": state.token}
+
+
+@router.post("/whatif/{token}")
+def update_whatif(token: str, delta: WhatIfDelta):
+    """
+    Add or remove dated events from a saved scenario.
+
+    Only the months from the earliest changed one onward are recalculated.
+    The response carries a new ``token`` for the updated scenario and
+    ``replayed_from`` (the first recalculated month, or null if nothing
+    changed).
+    """
+    base = whatif_states.get(token)
+    if base is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired what-if token")
+    try:
+        user_input = apply_delta(base.user_input, delta.add, delta.remove)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        state, start = replay_state(base, user_input)
+    except Exception as e:
+        logger.exception("Error during what-if calculation")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+    whatif_states.put(state.token, state)
+    return {
+        **format_results(state.results()),
+        "token": state.token,
+        "base_token": token,
+        "replayed_from": MONTH_NAMES[start] if start < len(MONTH_NAMES) else None,
+    }
+
+
+@router.post("/pareto")
+def calculate_pareto(payload: ParetoPayload):
+    """
+    The plans no other plan beats on all of ``criteria`` (by default annual
+    premiums, worst-case exposure and expected cost).
+
+    Frontier plans are returned in full, cheapest on the first criterion
+    first; every other plan is listed under ``dominated`` with the frontier
+    plan that beats it. Cost results are shared with the calculate endpoint
+    through the result cache.
+    """
+    input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    try:
+        snapshot = catalog.get()
+        results = cached_costs(input_details_dict, tax_rate, enrollment_type, snapshot)
+        with span("pareto"):
+            frontier = pareto_frontier(input_details_dict, tax_rate, enrollment_type, payload.criteria,
+                                       results=results, snapshot=snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("Error during Pareto frontier calculation")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+    return {
+        "message": "Pareto frontier calculation successful",
+        "criteria": payload.criteria,
+        "frontier": {
+            plan_id: {**format_plan_result(results[plan_id]), "criteria": values}
+            for plan_id, values in frontier["frontier"]
+        },
+        "dominated": frontier["dominated"],
+    }
+
+
+@router.post("/curves")
+def calculate_curves(payload: CurvePayload):
+    """
+    Each plan's out-of-pocket spending and total annual cost as a function of
+    the allowed charges for one service (default CURVE_DEFAULT_SERVICE).
+
+    Curves are precomputed when the catalog loads, so evaluating every plan
+    at each level of ``spending`` (or of ``grid``) is a lookup and one
+    multiply-add, not a replay of individual events. Each plan's
+    ``curve.breakpoints`` lets clients interpolate further levels themselves.
+    """
+    if payload.spending is not None:
+        levels = payload.spending
+    else:
+        grid = payload.grid
+        if grid.stop < grid.start:
+            raise HTTPException(status_code=422, detail="grid.stop must not be below grid.start")
+        step = (grid.stop - grid.start) / max(grid.steps - 1, 1)
+        levels = [grid.start + step * i for i in range(grid.steps)]
+    if any(not 0 <= level < math.inf for level in levels):
+        raise HTTPException(status_code=422, detail="Spending levels must be finite and not negative")
+
+    input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    try:
+        with span("cost_curves"):
+            curves = evaluate_curves(levels, tax_rate, enrollment_type, user_financials(input_details_dict),
+                                     service=payload.service)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("Error during cost curve evaluation")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+    return {"message": "Cost curve calculation successful", **curves}
+
+
+@router.post("/break-even")
+def calculate_break_even(payload: BreakEvenPayload):
+    """
+    Spending levels (allowed charges for ``service``) at which plans trade
+    places on total annual cost, solved from each plan's premiums, tax
+    savings, HSA growth and cost curve rather than by recalculating.
+
+    With ``reference``, each plan is compared with that one; otherwise every
+    pair of ``plan_ids`` (default: all plans of the enrollment type, up to
+    BREAKEVEN_MAX_PLANS) is, as a symmetric ``matrix``.
+    """
+    input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    try:
+        with span("break_even"):
+            result = break_even(tax_rate, enrollment_type, user_financials(input_details_dict),
+                                service=payload.service, plan_ids=payload.plan_ids, reference=payload.reference)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("Error during break-even calculation")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+    return {"message": "Break-even calculation successful", **result}
+
+
+@router.post("/projection")
+def calculate_projection(payload: ProjectionPayload):
+    """
+    Each plan's costs year by year over ``years`` years, with premiums and
+    service costs inflating and HSA balances carried forward (see
+    project_costs), plus cumulative and total amounts.
+
+    Years share one vectorized pass per usage profile, so a 30-year
+    projection costs little more than a single year.
+    """
+    input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    usage_by_year = [{key: value.dict() for key, value in usage.items()} for usage in payload.usage_by_year]
+    try:
+        with span("projection"):
+            projection = project_costs(usage_by_year or [input_details_dict], tax_rate, enrollment_type,
+                                       payload.years, premium_inflation=payload.premium_inflation,
+                                       service_inflation=payload.service_inflation,
+                                       starting_hsa_balance=payload.starting_hsa_balance,
+                                       financials=user_financials(input_details_dict))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("Error during cost projection")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+    return {"message": "Cost projection successful", **projection}
+
+
+async def _batch_outcomes(scenarios: List[Tuple[int, Dict[str, Any], float, str]],
+                          service_costs: Dict[str, float], catalog_version: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run batch scenarios on the calculation pool and yield each formatted
+    outcome as its chunk finishes.
+
+    Scenarios are split into chunks (about four per worker) so results start
+    arriving early, and a batch keeps at most one chunk per worker in flight
+    so a single large batch can't take every pending slot.
+    """
+    concurrency = max(calculation_pool.workers, 1)
+    chunk_size = max(1, math.ceil(len(scenarios) / (concurrency * 4)))
+    chunks = [scenarios[start:start + chunk_size] for start in range(0, len(scenarios), chunk_size)]
+    semaphore = asyncio.Semaphore(concurrency)
+    request_id = request_id_var.get()
+
+    async def run_chunk(chunk):
+        async with semaphore:
+            try:
+                return await calculation_pool.run(run_batch, chunk, service_costs, catalog_version, request_id)
+            except PoolSaturated:
+                error = "Calculation capacity exhausted, please retry"
+            except asyncio.TimeoutError:
+                error = "Calculation timed out"
+            except Exception as e:
+                logger.exception("Error during batch calculations")
+                error = f"Calculation error: {str(e)}"
+            return [{"index": index, "error": error} for index, *_ in chunk]
+
+    for finished in asyncio.as_completed([run_chunk(chunk) for chunk in chunks]):
+        for outcome in await finished:
+            if "results" in outcome:
+                yield {"index": outcome["index"], "plans": format_results(outcome["results"])["plans"]}
+            else:
+                yield outcome
+
+
+@router.post("/batch")
+async def calculate_batch(payloads: List[Payload], stream: bool = False):
+    """
+    Calculate costs for many scenarios (e.g. what-if variants of one
+    household) in one call.
+
+    All scenarios share one plan catalog snapshot and service-cost table and
+    run in parallel on the calculation pool. Results are returned in request
+    order, or with ``?stream=true`` as NDJSON lines (``{"index", "plans"}`` or
+    ``{"index", "error"}``) in completion order.
+    """
+    if len(payloads) > CALC_BATCH_MAX_SCENARIOS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {CALC_BATCH_MAX_SCENARIOS} scenarios")
+    if calculation_pool.pending >= calculation_pool.max_pending:
+        raise _saturated()
+
+    try:
+        catalog_version = catalog.get().version
+        # Plain dict: it is pickled to the worker processes
+        service_costs = dict(load_service_costs())
+    except RuntimeError as e:
+        logger.exception("Error loading plan data for batch")
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+    scenarios = [(index, *prepare_calculation(payload)) for index, payload in enumerate(payloads)]
+    outcomes = _batch_outcomes(scenarios, service_costs, catalog_version)
 
+    if stream:
+        async def ndjson_lines():
+            async for outcome in outcomes:
+                yield json.dumps(outcome) + "\n"
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
 
- 
\ No newline at end of file
+    results = sorted([outcome async for outcome in outcomes], key=lambda outcome: outcome["index"])
+    return {"message": "Batch calculation successful", "catalog_version": catalog_version, "results": results}
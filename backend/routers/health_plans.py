@@ -1,113 +1,95 @@
-from fastapi import APIRouter, HTTPException
-import csv
-import os
-from typing import Dict, Any
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response
+from typing import List, Optional
 
-# Dynamically resolve the path to the data file
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-HEALTH_PLAN_FILE = os.path.join(BASE_DIR, "../data/health_plan_info.csv")
+try:
+    from metrics import registry, span
+    from services.catalog_payload import CATALOG_CACHE_MAX_AGE, catalog_payloads
+    from services.plan_catalog import catalog, PLAN_DETAIL_FIELDS, PLAN_FIELDS, PlanRecords
+    from services.service_costs import service_cost_table
+except ImportError:
+    from backend.metrics import registry, span
+    from backend.services.catalog_payload import CATALOG_CACHE_MAX_AGE, catalog_payloads
+    from backend.services.plan_catalog import catalog, PLAN_DETAIL_FIELDS, PLAN_FIELDS, PlanRecords
+    from backend.services.service_costs import service_cost_table
 
 router = APIRouter()
 
-def parse_cost(value: str) -> float:
+def get_parsed_health_plans() -> PlanRecords:
     """
-    Convert cost value to a float. Handles decimals, percentages, and whole numbers.
-    """
-    value = value.strip()
-    if value.endswith("%"):  # Percentage case
-        return float(value.strip("%")) / 100
-    try:
-        return float(value)  # Handle decimals and whole numbers
-    except ValueError:
-        raise ValueError(f"Invalid cost format: {value}")
+    Return the parsed health plans from the shared in-memory catalog.
 
-def get_parsed_health_plans() -> Dict[str, Dict[str, Any]]:
-    """
-    Parse the health_plan_info.csv file into a structured dictionary.
+    The CSV is only re-parsed when health_plan_info.csv changes on disk, so the
+    returned mapping is read-only and shared between requests.
 
-    :return: Dictionary with plan IDs as keys and plan details as values.
+    :return: Mapping with plan IDs as keys and plan details as values.
     """
-    
-    try:
-        with open(HEALTH_PLAN_FILE, mode="r") as csvfile:
-            reader = csv.DictReader(csvfile)
-            plans = {}
+    with span("get_parsed_health_plans"):
+        return catalog.get().plans
 
-            for row in reader:
-                # Extract unique plan name as ID
-                plan_id = row["Short Name"]
-                enrollment_type = row["Enrollment Type"]
-                # plan_type = plan_id[-1]  # S, SF, or SO for enrollment type
-                # plan_name = plan_id[:-2].strip()  # Remove enrollment type for display
+def _split(values: Optional[List[str]]) -> List[str]:
+    # Accept both ?field=a&field=b and ?field=a,b
+    return [item.strip() for value in values or () for item in value.split(",") if item.strip()]
 
-                # Determine enrollment-specific fields
-                premium = parse_cost(row["2025 Monthly - Empl. Pays"])
-                deductible = parse_cost(row["Calendar Year Deductible"])
-                oop_max = float("inf")  # Default to infinity if not provided
-                premium = parse_cost(row["2025 Monthly - Empl. Pays"])
-                deductible = parse_cost(row["Calendar Year Deductible"])
-                premium = parse_cost(row["2025 Monthly - Empl. Pays"])
-                deductible = parse_cost(row["Calendar Year Deductible"])
-                hsa_pass_through = parse_cost(row["Premium Pass Through HSA/HRA Contribution"])
-
-                # Extract HSA/HRA information
-                hsa_hra_type = row["Services & Benefits - Type of Account"]
-                hsa_contribution = parse_cost(row["Premium Pass Through HSA/HRA Contribution"])
+@router.get("/health-plans", response_model=dict)
+@router.get("", response_model=dict, include_in_schema=False)
+def get_health_plans(fields: Optional[List[str]] = Query(None),
+                     enrollment_type: Optional[List[str]] = Query(None),
+                     hsa_hra_type: Optional[List[str]] = Query(None),
+                     if_none_match: Optional[str] = Header(None),
+                     accept_encoding: Optional[str] = Header(None)):
+    """
+    Endpoint to retrieve parsed health plan data.
 
-                # Extract service costs
-                services = {
-                    "Primary Care": parse_cost(row["Primary/Specialty Care - Primary Care Office Visit"]),
-                    "Specialist": parse_cost(row["Primary/Specialty Care - Specialist Office Visit"]),
-                    "Emergency Care": parse_cost(row["Emergency & Urgent Care - Emergency Care"]),
-                    "Urgent Care": parse_cost(row["Emergency & Urgent Care - Urgent Care"]),
-                    "Accidental Injury": parse_cost(row["Emergency & Urgent Care - Accidental Injuries"]),
-                    "Inpatient Admission": parse_cost(row["Surgery & Hospital Charges - Hospital Inpatient Cost"]),
-                    "Room and Board": parse_cost(row["Surgery & Hospital Charges - Room & Board Charges"]),
-                    "Outpatient Surgery": parse_cost(row["Surgery & Hospital Charges - Doctor Costs Outpatient Surgery"]),
-                    "Outpatient Tests": parse_cost(row["Surgery & Hospital Charges - Outpatient Tests"]),
-                    "Simple Labs": parse_cost(row["Lab, X-Ray & Other Diagnostic Tests - Simple Diagnostic Tests/Procedures"]),
-                    "Complex Labs": parse_cost(row["Lab, X-Ray & Other Diagnostic Tests - Complex Diagnostic Tests/Procedures"]),
-                    "Medications Tier 0": parse_cost(row["Prescription Drugs - Tier 0 Prescriptions"]),
-                    "Medications Tier 1": parse_cost(row["Prescription Drugs - Tier 1 Prescriptions"]),
-                    "Medications Tier 2": parse_cost(row["Prescription Drugs - Tier 2 Prescriptions"]),
-                    "Medications Tier 3": parse_cost(row["Prescription Drugs - Tier 3 Prescriptions"]),
-                    "Medications Tier 4": parse_cost(row["Prescription Drugs - Tier 4 Prescriptions"]),
-                    "Medications Tier 5": parse_cost(row["Prescription Drugs - Tier 5 Prescriptions"]),
-                    "ABA": parse_cost(row["Treatment, Devices, and Services - Applied Behavioral Analysis (ABA)"]),
-                    "Chiropractic": parse_cost(row["Treatment, Devices, and Services - Chiropractic"]),
-                    "OT": parse_cost(row["Treatment, Devices, and Services - Occupational Therapy"]),
-                    "Speech Therapy": parse_cost(row["Treatment, Devices, and Services - Speech Therapy"]),
-                    "Physical Therapy": parse_cost(row["Treatment, Devices, and Services - Physical Therapy"]),
-                    "Infertility Services": parse_cost(row["Treatment, Devices, and Services - Infertility Services"]),
-                    "Hearing Services": parse_cost(row["Treatment, Devices, and Services - Hearing Services"]),
-                    "Maternity Care": parse_cost(row["Treatment, Devices, and Services - Maternity Care - Hospital Stay"]),
-                }
+    Returns the same ``{plan_id: plan}`` shape parse_health_plans produces
+    (a missing out-of-pocket maximum is null), serialized and compressed once
+    per catalog load rather than per request. Responses carry a strong ETag
+    and Cache-Control; a matching If-None-Match gets 304.
 
-                # Store plan data
-                plans[plan_id] = {
-                    "plan_name": plan_id,
-                    "enrollment_type": enrollment_type,
-                    "premium": premium,
-                    "deductible": deductible,
-                    "oop_max": oop_max,
-                    "hsa_hra_type": hsa_hra_type,
-                    "hsa_contribution": hsa_contribution,
-                    "services": services,
-                    "hsa_pass_through" : hsa_pass_through,
-                }
-    except FileNotFoundError:
-        raise RuntimeError(f"Health plan file not found: {HEALTH_PLAN_FILE}")
-    except Exception as e:
-        raise RuntimeError(f"Error parsing health plans: {e}")
+    :param fields: Plan keys to return (comma-separated or repeated); plans
+        loaded from an FEHB document also have PLAN_DETAIL_FIELDS.
+    :param enrollment_type: Only plans of these enrollment types.
+    :param hsa_hra_type: Only plans with these account types (HSA, HRA, N/A).
+    """
+    requested = set(_split(fields))
+    known = PLAN_FIELDS + PLAN_DETAIL_FIELDS
+    unknown = requested - set(known)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown plan fields: {', '.join(sorted(unknown))}")
+    try:
+        snapshot = catalog.get()
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    return plans
+    with span("encode_health_plans"):
+        payload = catalog_payloads.get(snapshot, [field for field in known if field in requested],
+                                       _split(enrollment_type), _split(hsa_hra_type))
+    body, encoding, etag = payload.select(accept_encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+    if payload.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
 
-@router.get("/health-plans", response_model=dict)
-async def get_health_plans():
+@router.get("/catalog-status", response_model=dict)
+def get_catalog_status():
     """
-    Endpoint to retrieve parsed health plan data.
+    Report the plan catalog and service cost table versions, last load times
+    and reload counts.
     """
-    return get_parsed_health_plans()
+    return {**catalog.status(), "service_costs": service_cost_table.status()}
+
+registry.callback("plan_catalog_reloads_total", "Times the plan catalog was (re)loaded.",
+                  lambda: catalog.reload_count, kind="counter")
+registry.callback("service_costs_reloads_total", "Times the service cost table was (re)loaded.",
+                  lambda: service_cost_table.reload_count, kind="counter")
+registry.callback("service_costs_validation_failures_total", "Service cost files rejected by validation.",
+                  lambda: service_cost_table.validation_failures, kind="counter")
 
 # Example usage
 if __name__ == "__main__":
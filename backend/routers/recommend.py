@@ -1,44 +1,57 @@
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
-from services.recommendation_engine import score_plans
-from models import InputDetails
+from pydantic import Field
+from typing import Dict, Optional
+import logging
+
+try:
+    from metrics import span
+    from routers.calculate import Payload, prepare_calculation
+    from services.plan_catalog import catalog
+    from services.recommendation_engine import recommend_plans
+    from services.result_cache import cached_costs
+except ImportError:
+    from backend.metrics import span
+    from backend.routers.calculate import Payload, prepare_calculation
+    from backend.services.plan_catalog import catalog
+    from backend.services.recommendation_engine import recommend_plans
+    from backend.services.result_cache import cached_costs
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-def recommend_plan(input_details: InputDetails):
+
+
+class RecommendPayload(Payload):
+    # Criterion -> relative weight; see recommendation_engine.CRITERIA
+    preferences: Dict[str, float] = {}
+    top_n: Optional[int] = Field(None, ge=1)
+
+
+@router.post("")
+def recommend_plan(payload: RecommendPayload):
     """
-    Recommend the best health plan based on user input.
+    Rank the health plans for the entered usage by expected cost, worst-case
+    exposure, tax savings and HSA growth, weighted by ``preferences``.
+
+    Plans another plan beats on every criterion are listed under
+    ``dominated`` instead of being ranked. Cost results are shared with
+    /api/calculate through the result cache.
     """
-    user_data = input_details.user_data
-    medical_needs = input_details.medical_needs
-
-    # Mock implementation of recommendations
-    recommendation = "Plan A is the best based on your inputs."
-
-    # Example response with received data echoed back
-    return {
-        "status": "success",
-        "recommendation": recommendation,
-        "data": {
-            "user_data": user_data,
-            "medical_needs": medical_needs
-        }
-    }
-
-
-# @router.post("/")
-# def recommend_plan(user_input: UserInput):
-#     try:
-#         # Extract plan costs and user preferences
-#         plan_costs = user_input.get("plan_costs")
-#         user_preferences = user_input.get("preferences", {})
-
-#         if not plan_costs:
-#             raise ValueError("Plan costs are required in the input.")
-
-#         # Generate ranked recommendations
-#         ranked_plans = score_plans(plan_costs, user_preferences)
-#         return {"status": "success", "data": ranked_plans}
-#     except ValueError as e:
-#         raise HTTPException(status_code=400, detail=str(e))
-#     except Exception as e:
-#         raise HTTPException(status_code=500, detail="An error occurred during recommendation.")
+    input_details_dict, tax_rate, enrollment_type = prepare_calculation(payload)
+    try:
+        snapshot = catalog.get()
+        results = cached_costs(input_details_dict, tax_rate, enrollment_type, snapshot)
+        with span("recommend"):
+            recommendation = recommend_plans(
+                input_details_dict, tax_rate, enrollment_type,
+                preferences=payload.preferences,
+                top_n=payload.top_n,
+                results=results,
+                snapshot=snapshot,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("Error during recommendation")
+        raise HTTPException(status_code=500, detail=f"Recommendation error: {str(e)}")
+    return {"message": "Recommendation successful", **recommendation}
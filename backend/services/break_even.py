@@ -0,0 +1,145 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from services.cost_curves import CURVE_DEFAULT_SERVICE, CostCurves, cost_curves, fixed_costs
+    from services.plan_catalog import catalog, CatalogSnapshot, SERVICE_INDEX
+except ImportError:
+    from backend.services.cost_curves import CURVE_DEFAULT_SERVICE, CostCurves, cost_curves, fixed_costs
+    from backend.services.plan_catalog import catalog, CatalogSnapshot, SERVICE_INDEX
+
+logger = logging.getLogger(__name__)
+
+# Most plans one /api/calculate/break-even request may compare pairwise
+BREAKEVEN_MAX_PLANS = int(os.environ.get("BREAKEVEN_MAX_PLANS", "500"))
+
+# Plan pairs solved per pass; bounds the temporary arrays to a few MB each
+_PAIR_CHUNK = 32768
+
+
+def crossings(curves: CostCurves, fixed: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Spending levels at which plan ``b`` becomes cheaper than plan ``a`` or
+    the other way round, for each pair of rows ``(a[i], b[i])``.
+
+    Total cost is each plan's fixed cost plus its piecewise-linear
+    out-of-pocket curve, so their difference is linear between the union of
+    both plans' breakpoints and past the last of them. Each sign change of
+    the difference is solved exactly on its segment; where the costs are
+    equal over a stretch, the crossing is where the tie starts.
+
+    :return: ``(pairs, slots)`` array of crossing levels in ascending order,
+        NaN-padded.
+    """
+    # Evaluation points: every finite breakpoint of either plan, sorted
+    points = np.concatenate((curves.spending[a], curves.spending[b]), axis=1)
+    points = np.sort(np.where(np.isfinite(points), points, 0.0), axis=1)
+
+    def difference(x):
+        return (fixed[b][:, None] + curves.at(b[:, None], x)) - (fixed[a][:, None] + curves.at(a[:, None], x))
+
+    values = difference(points)
+    # Past the last breakpoint the difference moves at a constant rate; add a
+    # point beyond any root there
+    last, last_value = points[:, -1], values[:, -1]
+    rate = difference(last[:, None] + 1.0)[:, 0] - last_value
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = np.where(rate * last_value < 0, -last_value / rate, 0.0)
+    tail = last + 2 * root + 1.0
+    points = np.concatenate((points, tail[:, None]), axis=1)
+    values = np.concatenate((values, difference(tail[:, None])), axis=1)
+
+    # Cents of float noise in either total shouldn't count as a crossing
+    sign = np.sign(np.where(np.abs(values) < 0.005, 0.0, values))
+    columns = np.arange(points.shape[1])
+    # Index of the last non-zero difference at or before each point
+    last_nonzero = np.maximum.accumulate(np.where(sign != 0, columns, -1), axis=1)
+    pairs = np.arange(len(a))[:, None]
+    previous = np.concatenate((np.full((len(a), 1), -1), last_nonzero[:, :-1]), axis=1)
+    previous_sign = np.where(previous >= 0, sign[pairs, np.maximum(previous, 0)], 0)
+    changed = (sign != 0) & (previous_sign != 0) & (sign != previous_sign)
+
+    start = np.maximum(previous, 0)
+    x0, y0 = points[pairs, start], values[pairs, start]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interpolated = x0 + y0 * (points - x0) / (y0 - values)
+    # A tie in between: the crossing is the first point of the tie
+    tie_start = points[pairs, np.minimum(start + 1, points.shape[1] - 1)]
+    level = np.where(previous == columns - 1, interpolated, tie_start)
+    return np.where(changed, level, np.nan)[:, 1:]
+
+
+def _level_lists(levels: np.ndarray) -> List[List[float]]:
+    # NaN-padded rows (any leading shape) to nested lists of their levels
+    levels = np.round(np.sort(levels, axis=-1), 2)
+    counts = np.count_nonzero(~np.isnan(levels), axis=-1)
+    width = int(counts.max(initial=0))
+    rows = levels[..., :width].reshape(counts.size, width).tolist()
+    flat = [row[:count] for row, count in zip(rows, counts.reshape(-1).tolist())]
+    if levels.ndim == 2:
+        return flat
+    n = levels.shape[1]
+    return [flat[start:start + n] for start in range(0, len(flat), n)]
+
+
+def break_even(tax_rate: float, plan_type: str, financials: Tuple[float, float, float, float],
+               service: str = CURVE_DEFAULT_SERVICE, plan_ids: Optional[Sequence[str]] = None,
+               reference: Optional[str] = None, snapshot: Optional[CatalogSnapshot] = None) -> Dict[str, Any]:
+    """
+    Spending levels (allowed charges for ``service``) at which plans trade
+    places on total annual cost, from each plan's fixed costs and cost curve.
+
+    With ``reference``, every plan (or each of ``plan_ids``) is compared with
+    that plan; otherwise each pair of ``plan_ids`` (default: every plan of
+    ``plan_type``) is.
+
+    :param financials: As returned by cost_calculator.user_financials.
+    :return: ``{"service", "plans": [plan_id, ...], "fixed_costs": [...]}``
+        plus ``"reference"`` and ``"break_even"`` (one list of levels per
+        plan) with a reference, or ``"matrix"`` (``matrix[i][j]`` lists the
+        levels for plans ``i`` and ``j``) without one.
+    :raises ValueError: for unknown services or plans, or too many plans for a
+        matrix.
+    """
+    if service not in SERVICE_INDEX:
+        raise ValueError(f"Unknown service {service!r}")
+    if snapshot is None:
+        snapshot = catalog.get()
+    if plan_type not in snapshot.tables:
+        raise ValueError(f"No {plan_type!r} plans in the catalog")
+    curves = cost_curves.get(snapshot, plan_type, service)
+    fixed = fixed_costs(snapshot.arrays[plan_type], tax_rate, financials)
+
+    row_of = {plan_id: row for row, plan_id in enumerate(curves.plan_ids)}
+    unknown = [plan_id for plan_id in (*(plan_ids or ()), *([reference] if reference else ())) if plan_id not in row_of]
+    if unknown:
+        raise ValueError(f"Unknown {plan_type!r} plan {unknown[0]!r}")
+    rows = np.array([row_of[plan_id] for plan_id in plan_ids] if plan_ids else range(len(curves.plan_ids)),
+                    dtype=int)
+    result: Dict[str, Any] = {
+        "service": service,
+        "plans": [curves.plan_ids[row] for row in rows],
+        "fixed_costs": np.round(fixed[rows], 2).tolist(),
+    }
+
+    if reference is not None:
+        levels = crossings(curves, fixed, np.full(len(rows), row_of[reference]), rows)
+        result["reference"] = reference
+        result["break_even"] = _level_lists(levels)
+        return result
+
+    if len(rows) > BREAKEVEN_MAX_PLANS:
+        raise ValueError(f"At most {BREAKEVEN_MAX_PLANS} plans can be compared pairwise; pass plan_ids or a reference")
+    # Crossings are symmetric, so only pairs i < j are solved
+    first, second = np.triu_indices(len(rows), k=1)
+    # One slot per evaluation point after the first: both plans' breakpoints and the tail
+    levels = np.full((len(rows), len(rows), 2 * curves.spending.shape[1]), np.nan)
+    for start in range(0, len(first), _PAIR_CHUNK):
+        i, j = first[start:start + _PAIR_CHUNK], second[start:start + _PAIR_CHUNK]
+        levels[i, j] = levels[j, i] = crossings(curves, fixed, rows[i], rows[j])
+    logger.debug("Break-even matrix for %d %s plans under %s", len(rows), plan_type, service)
+    result["matrix"] = _level_lists(levels)
+    return result
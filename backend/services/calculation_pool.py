@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from logging_config import request_id_var
+    from services.cost_calculator import calculate_costs
+    from services.plan_catalog import catalog
+    from services.service_costs import service_cost_table
+    from services.simulation import simulate_costs
+except ImportError:
+    from backend.logging_config import request_id_var
+    from backend.services.cost_calculator import calculate_costs
+    from backend.services.plan_catalog import catalog
+    from backend.services.service_costs import service_cost_table
+    from backend.services.simulation import simulate_costs
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for CPU-bound calculations; 0 runs them on the event loop's
+# default thread pool instead (useful for development and tests)
+CALC_POOL_WORKERS = int(os.environ.get("CALC_POOL_WORKERS", os.cpu_count() or 1))
+# Calculations allowed to be queued or running before new ones get a 503
+CALC_POOL_MAX_PENDING = int(os.environ.get("CALC_POOL_MAX_PENDING", 4 * max(CALC_POOL_WORKERS, 1)))
+CALC_TIMEOUT_SECONDS = float(os.environ.get("CALC_TIMEOUT_SECONDS", "10"))
+# Value of the Retry-After header sent with a 503
+CALC_RETRY_AFTER_SECONDS = int(os.environ.get("CALC_RETRY_AFTER_SECONDS", "1"))
+# Largest number of scenarios accepted by one batch request
+CALC_BATCH_MAX_SCENARIOS = int(os.environ.get("CALC_BATCH_MAX_SCENARIOS", "200"))
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when the calculation pool already has max_pending calculations.
+    """
+
+
+def _init_worker() -> None:
+    """
+    Load the plan catalog and service costs once when a worker process starts.
+    """
+    try:
+        catalog.get()
+        service_cost_table.get()
+    except RuntimeError as e:
+        logger.warning("Plan data not loaded in worker %d: %s", os.getpid(), e)
+
+
+def run_calculation(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                    request_id: str = "-", engine: Optional[str] = None,
+                    service_costs: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Worker entry point for calculate_costs that keeps the caller's request ID
+    on log lines written inside the worker. ``service_costs`` default to the
+    worker's own table.
+    """
+    token = request_id_var.set(request_id)
+    try:
+        return calculate_costs(user_input=user_input, tax_rate=tax_rate, plan_type=plan_type, engine=engine,
+                               service_costs=service_costs)
+    finally:
+        request_id_var.reset(token)
+
+
+def run_simulation(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                   options: Dict[str, Any], request_id: str = "-") -> Dict[str, Any]:
+    """
+    Worker entry point for simulate_costs; ``options`` are its keyword
+    arguments (samples, seed, percentiles, frequencies, time_budget).
+    """
+    token = request_id_var.set(request_id)
+    try:
+        return simulate_costs(user_input=user_input, tax_rate=tax_rate, plan_type=plan_type, **options)
+    finally:
+        request_id_var.reset(token)
+
+
+def run_batch(scenarios: List[Tuple[int, Dict[str, Any], float, str]], service_costs: Dict[str, float],
+              catalog_version: Optional[str], request_id: str = "-",
+              engine: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Worker entry point for a chunk of batch scenarios.
+
+    Every scenario is costed against the caller's service-cost table and the
+    catalog snapshot with ``catalog_version``, so all chunks of a batch see the
+    same data. Each ``(index, user_input, tax_rate, plan_type)`` produces
+    ``{"index", "results"}`` or, if it fails, ``{"index", "error"}``.
+    """
+    token = request_id_var.set(request_id)
+    try:
+        snapshot = catalog.get()
+        if catalog_version is not None and snapshot.version != catalog_version:
+            error = "Plan catalog changed while the batch was running, please retry"
+            return [{"index": index, "error": error} for index, *_ in scenarios]
+
+        outcomes = []
+        for index, user_input, tax_rate, plan_type in scenarios:
+            try:
+                results = calculate_costs(user_input=user_input, tax_rate=tax_rate, plan_type=plan_type,
+                                          engine=engine, snapshot=snapshot, service_costs=service_costs)
+                outcomes.append({"index": index, "results": results})
+            except Exception as e:
+                logger.warning("Batch scenario %d failed: %s", index, e)
+                outcomes.append({"index": index, "error": str(e)})
+        return outcomes
+    finally:
+        request_id_var.reset(token)
+
+
+class CalculationPool:
+    """
+    Bounded front end to a ProcessPoolExecutor for async handlers.
+
+    The executor is created on first use. ``pending`` counts calculations
+    queued or running; it is only touched from the event loop, so it needs no
+    lock.
+    """
+
+    def __init__(self, workers: int = CALC_POOL_WORKERS, max_pending: int = CALC_POOL_MAX_PENDING,
+                 timeout: float = CALC_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._executor
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """
+        Run ``fn(*args)`` in the pool and await its result.
+
+        :raises PoolSaturated: if max_pending calculations are already queued.
+        :raises asyncio.TimeoutError: if the result takes longer than the
+            timeout. The calculation still runs to completion in the
+            background and keeps its slot in ``pending`` until it does, so
+            timed-out work can't pile up beyond max_pending.
+        """
+        if self.pending >= self.max_pending:
+            raise PoolSaturated(f"{self.pending} calculations already pending")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_executor(), fn, *args)
+        self.pending += 1
+        future.add_done_callback(self._release)
+        # Shielded, so a timeout abandons the wait but not the calculation
+        return await asyncio.wait_for(asyncio.shield(future), timeout if timeout is not None else self.timeout)
+
+    def _release(self, future: asyncio.Future) -> None:
+        self.pending -= 1
+        if not future.cancelled():
+            # Nobody awaits a timed-out calculation; its error was logged where it was raised
+            future.exception()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Shared by the async endpoints in this process
+calculation_pool = CalculationPool()
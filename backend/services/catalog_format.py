@@ -0,0 +1,217 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Dynamically resolve the path to the compiled catalog
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILED_CATALOG_FILE = os.environ.get(
+    "COMPILED_CATALOG_FILE", os.path.join(BASE_DIR, "../data/health_plan_info.catalog"))
+
+MAGIC = b"HPCATLG\0"
+# Bump whenever the layout below changes; older files are then ignored
+FORMAT_VERSION = 2
+
+# Magic, format version, section count, SHA-256 of the source CSV and of
+# the source service_costs.json
+_HEADER = struct.Struct("<8sII32s32s")
+# Offset and item count of one section
+_SECTION = struct.Struct("<QQ")
+
+# Sections in file order, each 8-byte aligned. Per-plan columns come first;
+# strings are stored once in the string table and referenced by index.
+_SECTIONS: Tuple[Tuple[str, str], ...] = (
+    ("premium", "<f8"),
+    ("deductible", "<f8"),
+    ("oop_max", "<f8"),
+    ("hsa_pass_through", "<f8"),
+    ("services", "<f8"),  # plans x service_names, row-major
+    ("plan_ids", "<u4"),
+    ("enrollment_types", "<u4"),
+    ("account_types", "<u4"),
+    ("service_names", "<u4"),
+    ("cost_names", "<u4"),
+    ("cost_values", "<f8"),
+    ("source_paths", "<u4"),  # the plan file's, then the service cost file's
+    ("string_offsets", "<u8"),
+    ("string_data", "u1"),
+)
+
+
+class CatalogFile(NamedTuple):
+    """
+    Contents of a compiled catalog.
+
+    Numeric columns read by read_catalog_file are read-only views of the
+    memory-mapped file, so processes mapping the same file share its pages.
+    ``*_path`` and ``*_version`` are the absolute path and SHA-256 of each
+    source file at compile time.
+    """
+    plans_path: str
+    plans_version: str
+    service_costs_path: str
+    service_costs_version: str
+    plan_ids: Tuple[str, ...]
+    enrollment_types: Tuple[str, ...]
+    account_types: Tuple[str, ...]
+    service_names: Tuple[str, ...]
+    premium: np.ndarray
+    deductible: np.ndarray
+    oop_max: np.ndarray
+    hsa_pass_through: np.ndarray
+    services: np.ndarray
+    service_costs: Mapping[str, float]
+
+
+def file_stamp(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    ``(mtime_ns, size)`` of ``path``, or None if there is no such file.
+    """
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def same_path(recorded: str, path: str) -> bool:
+    """
+    Whether ``recorded`` (a source path stored in a compiled catalog) names
+    the file at ``path``.
+    """
+    return os.path.realpath(recorded) == os.path.realpath(path)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def write_catalog_file(path: str, catalog_file: CatalogFile) -> str:
+    """
+    Write ``catalog_file`` to ``path`` atomically (a temporary file in the
+    same directory is renamed over it).
+
+    :return: The path written.
+    """
+    strings: Dict[str, int] = {}
+
+    def refs(values: Sequence[str]) -> np.ndarray:
+        return np.array([strings.setdefault(value, len(strings)) for value in values], dtype="<u4")
+
+    n_plans, n_services = len(catalog_file.plan_ids), len(catalog_file.service_names)
+    services = np.asarray(catalog_file.services, dtype="<f8").reshape(n_plans, n_services)
+    columns = {
+        "premium": np.asarray(catalog_file.premium, dtype="<f8"),
+        "deductible": np.asarray(catalog_file.deductible, dtype="<f8"),
+        "oop_max": np.asarray(catalog_file.oop_max, dtype="<f8"),
+        "hsa_pass_through": np.asarray(catalog_file.hsa_pass_through, dtype="<f8"),
+        "services": services.ravel(),
+        "plan_ids": refs(catalog_file.plan_ids),
+        "enrollment_types": refs(catalog_file.enrollment_types),
+        "account_types": refs(catalog_file.account_types),
+        "service_names": refs(catalog_file.service_names),
+        "cost_names": refs(list(catalog_file.service_costs)),
+        "cost_values": np.array(list(catalog_file.service_costs.values()), dtype="<f8"),
+        "source_paths": refs([catalog_file.plans_path, catalog_file.service_costs_path]),
+    }
+    encoded = [value.encode("utf-8") for value in strings]
+    columns["string_offsets"] = np.cumsum([0] + [len(value) for value in encoded], dtype="<u8")
+    columns["string_data"] = np.frombuffer(b"".join(encoded), dtype="u1")
+
+    offset = _HEADER.size + _SECTION.size * len(_SECTIONS)
+    directory, payload = [], []
+    for name, dtype in _SECTIONS:
+        data = columns[name].astype(dtype, copy=False)
+        offset = _align(offset)
+        directory.append((offset, len(data)))
+        payload.append((offset, data.tobytes()))
+        offset += data.nbytes
+
+    directory_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory_name, prefix=".catalog-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(_SECTIONS),
+                                 bytes.fromhex(catalog_file.plans_version),
+                                 bytes.fromhex(catalog_file.service_costs_version)))
+            for section in directory:
+                f.write(_SECTION.pack(*section))
+            for section_offset, data in payload:
+                f.write(b"\0" * (section_offset - f.tell()))
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def read_catalog_file(path: str) -> CatalogFile:
+    """
+    Memory-map a compiled catalog.
+
+    :raises ValueError: if the file isn't a compiled catalog of this
+        FORMAT_VERSION or is truncated.
+    :raises OSError: if it can't be opened.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            raise ValueError(f"{path} is too short to be a compiled catalog")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, n_sections, plans_sha, costs_sha = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a compiled catalog")
+    if version != FORMAT_VERSION or n_sections != len(_SECTIONS):
+        raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+
+    if size < _HEADER.size + _SECTION.size * len(_SECTIONS):
+        raise ValueError(f"{path} is truncated (section directory)")
+    sections = {}
+    for i, (name, dtype) in enumerate(_SECTIONS):
+        offset, count = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+        if offset + count * np.dtype(dtype).itemsize > size:
+            raise ValueError(f"{path} is truncated (section {name})")
+        sections[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+
+    data = sections["string_data"].tobytes()
+    bounds = sections["string_offsets"].tolist()
+    strings: List[str] = [
+        sys.intern(data[start:stop].decode("utf-8")) for start, stop in zip(bounds, bounds[1:])
+    ]
+
+    def lookup(name: str) -> Tuple[str, ...]:
+        try:
+            return tuple(strings[index] for index in sections[name].tolist())
+        except IndexError:
+            raise ValueError(f"{path} is inconsistent: bad string reference in {name}")
+
+    source_paths = lookup("source_paths")
+    if len(source_paths) != 2:
+        raise ValueError(f"{path} is inconsistent: expected two source paths")
+    n_plans, service_names = len(sections["premium"]), lookup("service_names")
+    if len(sections["services"]) != n_plans * len(service_names):
+        raise ValueError(f"{path} is inconsistent: services table has the wrong size")
+    return CatalogFile(
+        plans_path=source_paths[0],
+        plans_version=plans_sha.hex(),
+        service_costs_path=source_paths[1],
+        service_costs_version=costs_sha.hex(),
+        plan_ids=lookup("plan_ids"),
+        enrollment_types=lookup("enrollment_types"),
+        account_types=lookup("account_types"),
+        service_names=service_names,
+        premium=sections["premium"],
+        deductible=sections["deductible"],
+        oop_max=sections["oop_max"],
+        hsa_pass_through=sections["hsa_pass_through"],
+        services=sections["services"].reshape(n_plans, len(service_names)),
+        service_costs=dict(zip(lookup("cost_names"), sections["cost_values"].tolist())),
+    )
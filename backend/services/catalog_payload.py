@@ -0,0 +1,204 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+try:
+    from services.plan_catalog import catalog, CatalogSnapshot, PLAN_DETAIL_FIELDS, PlanColumns, SERVICE_NAMES
+    from services.result_cache import ResultCache
+except ImportError:
+    from backend.services.plan_catalog import catalog, CatalogSnapshot, PLAN_DETAIL_FIELDS, PlanColumns, SERVICE_NAMES
+    from backend.services.result_cache import ResultCache
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+# Seconds clients may reuse /api/health-plans before revalidating with If-None-Match
+CATALOG_CACHE_MAX_AGE = int(os.environ.get("CATALOG_CACHE_MAX_AGE", "300"))
+# Filtered or projected variants of the catalog kept encoded
+CATALOG_MAX_VARIANTS = int(os.environ.get("CATALOG_MAX_VARIANTS", "64"))
+
+# Bodies smaller than this aren't worth compressing
+_MIN_COMPRESS_BYTES = 512
+# Fast enough to run on the request path for a new variant
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 5
+
+
+class EncodedPayload:
+    """
+    One serialized view of the catalog, with its compressed forms and ETag.
+
+    The ETag is the SHA-256 of the uncompressed body; compressed forms get
+    ``-gzip`` / ``-br`` appended, so every representation has its own strong
+    validator.
+    """
+
+    __slots__ = ("body", "gzip", "brotli", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        compress = len(body) >= _MIN_COMPRESS_BYTES
+        self.gzip = gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0) if compress else None
+        self.brotli = brotli.compress(body, quality=_BROTLI_QUALITY) if compress and brotli else None
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str], str]:
+        """
+        The representation to send for an Accept-Encoding header.
+
+        :return: ``(body, content_encoding or None, quoted ETag)``.
+        """
+        accepted = accepted_encodings(accept_encoding)
+        if self.brotli is not None and "br" in accepted:
+            return self.brotli, "br", f'"{self.etag}-br"'
+        if self.gzip is not None and "gzip" in accepted:
+            return self.gzip, "gzip", f'"{self.etag}-gzip"'
+        return self.body, None, f'"{self.etag}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """
+        Whether an If-None-Match header names any representation of this body
+        (weak comparison, as RFC 9110 specifies for If-None-Match).
+        """
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"') in (self.etag, f"{self.etag}-gzip", f"{self.etag}-br"):
+                return True
+        return False
+
+
+def accepted_encodings(header: Optional[str]) -> Tuple[str, ...]:
+    """
+    Content codings an Accept-Encoding header allows (those with q > 0).
+    """
+    accepted = []
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.append(coding.strip().lower())
+    return tuple(accepted)
+
+
+def _finite(value: float) -> Optional[float]:
+    # JSON has no Infinity: a plan without an out-of-pocket maximum is sent as null
+    return value if math.isfinite(value) else None
+
+
+def serialize_plans(columns: PlanColumns, fields: Optional[Sequence[str]] = None,
+                    enrollment_types: Optional[Iterable[str]] = None,
+                    account_types: Optional[Iterable[str]] = None) -> bytes:
+    """
+    ``{plan_id: plan}`` JSON for the plans in ``columns``, in the shape of
+    parse_health_plans output, with infinite amounts as null. Plans loaded
+    with coverage rules also have the PLAN_DETAIL_FIELDS.
+
+    :param fields: Plan keys to include (default: all of ``columns.fields``);
+        PLAN_DETAIL_FIELDS are left out for plans that have none.
+    :param enrollment_types: Only plans with one of these enrollment types.
+    :param account_types: Only plans with one of these HSA/HRA types.
+    """
+    fields = tuple(fields or columns.fields)
+    if columns.details is None:
+        fields = tuple(field for field in fields if field not in PLAN_DETAIL_FIELDS)
+    enrollment_types = set(enrollment_types) if enrollment_types else None
+    account_types = set(account_types) if account_types else None
+    amounts = {
+        "premium": columns.premium.tolist(),
+        "deductible": columns.deductible.tolist(),
+        "oop_max": columns.oop_max.tolist(),
+        "hsa_contribution": columns.hsa_pass_through.tolist(),
+        "hsa_pass_through": columns.hsa_pass_through.tolist(),
+    }
+    services = columns.services.tolist() if "services" in fields else None
+
+    plans = {}
+    for row, plan_id in enumerate(columns.plan_ids):
+        if enrollment_types is not None and columns.enrollment_types[row] not in enrollment_types:
+            continue
+        if account_types is not None and columns.account_types[row] not in account_types:
+            continue
+        plan: Dict[str, Any] = {}
+        for field in fields:
+            if field == "plan_name":
+                plan[field] = columns.plan_names[row]
+            elif field == "enrollment_type":
+                plan[field] = columns.enrollment_types[row]
+            elif field == "hsa_hra_type":
+                plan[field] = columns.account_types[row]
+            elif field == "services":
+                plan[field] = {service: _finite(value) for service, value in zip(SERVICE_NAMES, services[row])}
+            elif field in PLAN_DETAIL_FIELDS:
+                plan[field] = columns.detail(row, field)
+            else:
+                plan[field] = _finite(amounts[field][row])
+        plans[plan_id] = plan
+    return json.dumps(plans, separators=(",", ":"), allow_nan=False).encode()
+
+
+class CatalogPayloads:
+    """
+    Encoded catalog responses for the current snapshot.
+
+    The full catalog is encoded as soon as a snapshot loads (see prime);
+    filtered and projected variants are encoded on first request and kept in
+    a small LRU until the next reload.
+    """
+
+    def __init__(self, max_variants: int = CATALOG_MAX_VARIANTS):
+        self._full: Optional[Tuple[str, EncodedPayload]] = None
+        self._variants = ResultCache(max_entries=max_variants, ttl=float("inf"))
+
+    def prime(self, snapshot: CatalogSnapshot) -> EncodedPayload:
+        """
+        Encode the full catalog of ``snapshot`` and drop older variants.
+        """
+        payload = EncodedPayload(serialize_plans(snapshot.plans.columns))
+        self._variants.clear()
+        self._full = (snapshot.version, payload)
+        return payload
+
+    def get(self, snapshot: CatalogSnapshot, fields: Optional[Sequence[str]] = None,
+            enrollment_types: Optional[Sequence[str]] = None,
+            account_types: Optional[Sequence[str]] = None) -> EncodedPayload:
+        if not (fields or enrollment_types or account_types):
+            full = self._full
+            if full is not None and full[0] == snapshot.version:
+                return full[1]
+            return self.prime(snapshot)
+
+        key = json.dumps([snapshot.version, list(fields or ()), sorted(enrollment_types or ()),
+                          sorted(account_types or ())])
+        payload = self._variants.get(key)
+        if payload is None:
+            payload = EncodedPayload(serialize_plans(snapshot.plans.columns, fields, enrollment_types,
+                                                     account_types))
+            self._variants.put(key, payload)
+        return payload
+
+    def clear(self) -> None:
+        self._full = None
+        self._variants.clear()
+
+
+# Shared by the health-plans endpoint; re-encoded whenever the catalog reloads
+catalog_payloads = CatalogPayloads()
+catalog.add_reload_listener(catalog_payloads.prime)
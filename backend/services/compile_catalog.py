@@ -0,0 +1,84 @@
+"""
+Compile health_plan_info.csv and service_costs.json into a binary catalog.
+
+Usage (from the backend directory)::
+
+    python -m services.compile_catalog
+    python -m services.compile_catalog --plans other.csv --output other.catalog
+
+The server memory-maps the compiled catalog at startup and on reload
+instead of parsing the CSV, as long as it was compiled from the configured
+source files and neither has changed since.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import List, Optional
+
+try:
+    from services.catalog_format import COMPILED_CATALOG_FILE, CatalogFile, write_catalog_file
+    from services.plan_catalog import HEALTH_PLAN_FILE, SERVICE_NAMES, PlanColumns, parse_health_plans
+    from services.service_costs import SERVICE_COSTS_FILE, validate_service_costs
+except ImportError:
+    from backend.services.catalog_format import COMPILED_CATALOG_FILE, CatalogFile, write_catalog_file
+    from backend.services.plan_catalog import HEALTH_PLAN_FILE, SERVICE_NAMES, PlanColumns, parse_health_plans
+    from backend.services.service_costs import SERVICE_COSTS_FILE, validate_service_costs
+
+
+def compile_catalog(plans_path: str = HEALTH_PLAN_FILE, service_costs_path: str = SERVICE_COSTS_FILE,
+                    output_path: str = COMPILED_CATALOG_FILE) -> CatalogFile:
+    """
+    Parse and validate both source files and write the compiled catalog.
+
+    The catalog records the absolute path and SHA-256 of each source, so it
+    is only used in place of those files' current contents, and snapshots
+    loaded from it have the same versions as ones parsed from the sources.
+
+    :raises ValueError: if either source file is invalid, or the plans are
+        an FEHB JSON document (its coverage rules have no place in the format).
+    """
+    if plans_path.endswith(".json"):
+        raise ValueError("FEHB JSON plan files are loaded directly and can't be compiled")
+    with open(plans_path, "rb") as f:
+        plans_raw = f.read()
+    with open(service_costs_path, "rb") as f:
+        costs_raw = f.read()
+
+    columns = PlanColumns.from_plans(parse_health_plans(plans_raw.decode("utf-8-sig")))
+    costs, _, _ = validate_service_costs(json.loads(costs_raw))
+    catalog_file = CatalogFile(
+        plans_path=os.path.abspath(plans_path),
+        plans_version=hashlib.sha256(plans_raw).hexdigest(),
+        service_costs_path=os.path.abspath(service_costs_path),
+        service_costs_version=hashlib.sha256(costs_raw).hexdigest(),
+        plan_ids=columns.plan_ids,
+        enrollment_types=columns.enrollment_types,
+        account_types=columns.account_types,
+        service_names=SERVICE_NAMES,
+        premium=columns.premium,
+        deductible=columns.deductible,
+        oop_max=columns.oop_max,
+        hsa_pass_through=columns.hsa_pass_through,
+        services=columns.services,
+        service_costs=costs,
+    )
+    write_catalog_file(output_path, catalog_file)
+    return catalog_file
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", default=HEALTH_PLAN_FILE, help="health_plan_info.csv to compile")
+    parser.add_argument("--service-costs", default=SERVICE_COSTS_FILE, help="service_costs.json to compile")
+    parser.add_argument("--output", default=COMPILED_CATALOG_FILE, help="Where to write the compiled catalog")
+    args = parser.parse_args(argv)
+
+    catalog_file = compile_catalog(args.plans, args.service_costs, args.output)
+    print(f"Wrote {len(catalog_file.plan_ids)} plans and {len(catalog_file.service_costs)} service costs "
+          f"to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,51 @@
-import json
-from typing import List, Dict, Any, Tuple
+import heapq
+import logging
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Mapping, Optional, Sequence, Tuple
 import os
 
+import numpy as np
+
 try:
     # For production use with uvicorn or FastAPI
-    from routers.health_plans import get_parsed_health_plans
+    from metrics import EVENTS_PROCESSED, PLANS_EVALUATED, registry, span
+    from services.plan_catalog import catalog, CatalogSnapshot, CompiledPlan, SERVICE_INDEX, UNKNOWN_SERVICE
+    from services.service_costs import service_cost_table
+    from services.vectorized_engine import (
+        PlanArrays, accumulate_payments, round_cents, slice_plan_arrays, take_plan_arrays,
+    )
 except ImportError:
     # For running script directly with `python -m`
-    from backend.routers.health_plans import get_parsed_health_plans
-
-# Dynamically resolve the path to the average service costs file
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SERVICE_COSTS_FILE = os.path.join(BASE_DIR, "../data/service_costs.json")
-
-def load_service_costs() -> Dict[str, float]:
+    from backend.metrics import EVENTS_PROCESSED, PLANS_EVALUATED, registry, span
+    from backend.services.plan_catalog import catalog, CatalogSnapshot, CompiledPlan, SERVICE_INDEX, UNKNOWN_SERVICE
+    from backend.services.service_costs import service_cost_table
+    from backend.services.vectorized_engine import (
+        PlanArrays, accumulate_payments, round_cents, slice_plan_arrays, take_plan_arrays,
+    )
+
+logger = logging.getLogger(__name__)
+
+# Cost engine used when calculate_costs isn't told which one to run
+ENGINES = ("scalar", "vectorized")
+COST_ENGINE = os.environ.get("COST_ENGINE", "scalar")
+# Plans costed per NumPy pass when the vectorized engine streams results
+STREAM_CHUNK_PLANS = int(os.environ.get("CALC_STREAM_CHUNK_PLANS", "256"))
+
+# Orderings accepted by rank_plan_costs
+SORT_KEYS = ("total_cost", "premiums", "worst_case")
+# Smallest candidate batch the vectorized engine costs while ranking
+_RANK_BATCH_PLANS = 32
+# Totals are rounded to cents, so a lower bound within half a cent of the
+# K-th best could still round to a tie
+_PRUNE_TOLERANCE = 0.005
+
+def load_service_costs() -> Mapping[str, float]:
     """
-    Load average service costs from the JSON file.
+    Average service costs, loaded once and reloaded only when the file changes.
+
+    The returned mapping is read-only and shared by every caller.
     """
-    try:
-        with open(SERVICE_COSTS_FILE, 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        raise RuntimeError(f"Service costs file not found: {SERVICE_COSTS_FILE}")
-    except Exception as e:
-        raise RuntimeError(f"Error loading service costs: {e}")
+    return service_cost_table.get().costs
 
 def calculate_tax_savings(contribution: float, tax_rate: float) -> float:
     """
@@ -31,29 +53,51 @@ def calculate_tax_savings(contribution: float, tax_rate: float) -> float:
     """
     return contribution * tax_rate
 
-def calculate_hsa_growth(hsa_contribution: float, hsa_pass_through: float,
-                         hsa_percent_spent: float, assumed_rate_of_return: float) -> float:
+# Coefficients of q**11 .. q**0 in the sum of the twelve monthly HSA balances
+_HSA_BALANCE_COEFFICIENTS = np.arange(1, 13, dtype=float)
+
+def hsa_growth_factor(hsa_percent_spent, assumed_rate_of_return):
+    """
+    Investment growth over a year per dollar deposited into the HSA each month.
+
+    Each month the deposit is added, ``hsa_percent_spent / 12`` of the balance
+    is spent and the rest earns the monthly rate ``g``. With
+    ``q = (1 - hsa_percent_spent / 12) * (1 + g)`` the balance before spending
+    in month ``m`` is ``sum(q**j for j < m)`` per dollar, so the year's growth
+    is ``g * (1 - hsa_percent_spent / 12) * sum((12 - j) * q**j for j < 12)``.
+    Accepts floats or NumPy arrays.
+    """
+    monthly_return_rate = (1 + np.asarray(assumed_rate_of_return, dtype=float)) ** (1 / 12) - 1
+    kept = 1 - np.asarray(hsa_percent_spent, dtype=float) / 12
+    q = kept * (1 + monthly_return_rate)
+    return monthly_return_rate * kept * np.polyval(_HSA_BALANCE_COEFFICIENTS, q)
+
+@lru_cache(maxsize=1024)
+def _cached_hsa_growth(hsa_contribution: float, hsa_pass_through: float,
+                       hsa_percent_spent: float, assumed_rate_of_return: float) -> float:
+    monthly_deposit = (hsa_contribution + hsa_pass_through) / 12
+    return round(float(monthly_deposit * hsa_growth_factor(hsa_percent_spent, assumed_rate_of_return)), 2)
+
+registry.callback("hsa_growth_cache_hits_total", "HSA growth memo hits.",
+                  lambda: _cached_hsa_growth.cache_info().hits, kind="counter")
+registry.callback("hsa_growth_cache_misses_total", "HSA growth memo misses.",
+                  lambda: _cached_hsa_growth.cache_info().misses, kind="counter")
+
+def calculate_hsa_growth(hsa_contribution, hsa_pass_through, hsa_percent_spent, assumed_rate_of_return):
     """
     Calculate potential HSA growth on a monthly basis, including investment gains.
+
+    Uses the closed form in hsa_growth_factor instead of stepping through the
+    months. Scalar calls are memoized, since HSA plans share pass-through
+    amounts; if any argument is a NumPy array the growth is computed
+    element-wise and returned as an array.
     """
-    monthly_hsa_contribution = hsa_contribution / 12
-    monthly_pass_through = hsa_pass_through / 12
-    hsa_balance = 0.0
-    total_growth = 0.0
-
-    for month in range(1, 13):
-        hsa_balance += monthly_hsa_contribution + monthly_pass_through
-        # Spend a percentage of the balance (spread over the year)
-        amount_spent = hsa_balance * (hsa_percent_spent / 12)
-        hsa_balance -= amount_spent
-        monthly_return_rate = (1 + assumed_rate_of_return) ** (1/12) - 1
-        investment_gain = hsa_balance * monthly_return_rate
-        hsa_balance += investment_gain
-        total_growth += investment_gain
-    print("HSA contribution:", hsa_contribution, "HSA pass through:", hsa_pass_through, "HSA percent spent:", hsa_percent_spent)
-    print("Total growth:", total_growth)
-    return round(total_growth, 2)
-    
+    args = (hsa_contribution, hsa_pass_through, hsa_percent_spent, assumed_rate_of_return)
+    if any(isinstance(arg, np.ndarray) for arg in args):
+        monthly_deposit = (np.asarray(hsa_contribution, dtype=float) + hsa_pass_through) / 12
+        return round_cents(monthly_deposit * hsa_growth_factor(hsa_percent_spent, assumed_rate_of_return))
+    return _cached_hsa_growth(*(float(arg) for arg in args))
+
 
 def calculate_service_cost(service_cost: float, frequency: int, coverage: Dict[str, Any],
                            deductible_remaining: float, oop_remaining: float) -> Tuple[float, float, float, Dict[str, float]]:
@@ -89,6 +133,8 @@ def calculate_service_cost(service_cost: float, frequency: int, coverage: Dict[s
         cost_breakdown['copay'] = copay_total
     elif coverage.get('coinsurance', 0.0) > 0:
         coinsurance_cost = remaining_service_cost * coverage['coinsurance']
+        if coverage.get('coinsurance_max') is not None:
+            coinsurance_cost = min(coinsurance_cost, coverage['coinsurance_max'] * frequency)
         user_pays += coinsurance_cost
         cost_breakdown['coinsurance'] = coinsurance_cost
 
@@ -101,130 +147,414 @@ def calculate_service_cost(service_cost: float, frequency: int, coverage: Dict[s
 
     return round(user_pays, 2), round(deductible_remaining, 2), round(oop_remaining, 2), {k: round(v, 2) for k, v in cost_breakdown.items()}
 
-def calculate_costs(user_input: Dict[str, Any], tax_rate: float, plan_type: str) -> Dict[str, Any]:
+# Keys the frontend may send alongside the per-service usage
+NON_SERVICE_KEYS = ('planType', 'hsa', 'fsa', 'income', 'assumedRateOfReturn', 'hsaPercentSpent')
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+def layout_events(user_input: Dict[str, Any], service_costs: Mapping[str, float]) -> List[Tuple[int, int, float]]:
+    """
+    Flatten the user's service usage into chronologically ordered events.
+
+    Each event is ``(month_index, service_index, service_cost)`` with a
+    0-based month, the service's slot in SERVICE_NAMES (or UNKNOWN_SERVICE)
+    and its average cost, so the per-plan loop needs no dict or string lookups.
+    Events on the same date are ordered by service (slot, then name), not by
+    the order they were submitted in: which of them meets the deductible
+    first must not depend on key order, since cached results are shared
+    between inputs that differ only in it.
+    """
+    dated_events = []
+    for service, details in user_input.items():
+        if service in NON_SERVICE_KEYS:
+            continue
+
+        service_index = SERVICE_INDEX.get(service, UNKNOWN_SERVICE)
+        service_cost_value = float(service_costs.get(service, 0.0))
+
+        for date in details.get('dates', []):
+            try:
+                month = int(date.split('-')[1])  # Extract month (assuming 'YYYY-MM-DD')
+                if not 1 <= month <= 12:
+                    raise ValueError(f"month {month} out of range")
+            except Exception as e:
+                logger.warning("Skipping unparseable date %r for service %s: %s", date, service, e)
+                continue
+            dated_events.append((date, service_index, service, month - 1, service_cost_value))
+
+    dated_events.sort(key=lambda event: event[:3])
+    return [(month, service_index, cost) for _, service_index, _, month, cost in dated_events]
+
+def user_financials(user_input: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """
+    Read the plan-independent inputs: rate of return, HSA percent spent,
+    HSA contribution and FSA contribution.
+    """
+    return (
+        float(user_input.get('assumedRateOfReturn', 0.0)),
+        float(user_input.get('hsaPercentSpent', 1.0)),
+        float(user_input.get('hsacontribution', 0.0)),
+        float(user_input.get('fsa', {}).get('contribution', 0.0)),
+    )
+
+def _prepare_costs(user_input: Dict[str, Any], plan_type: str, engine: Optional[str],
+                   snapshot: Optional[CatalogSnapshot], service_costs: Optional[Mapping[str, float]]):
+    """
+    Resolve the engine and data for a calculation and lay out its events.
+
+    :return: ``(engine, snapshot, plans, events, financials)``
+    """
+    engine = engine or COST_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown cost engine: {engine}")
+
+    if snapshot is None:
+        with span("load_catalog"):
+            snapshot = catalog.get()
+    if service_costs is None:
+        with span("load_service_costs"):
+            service_costs = load_service_costs()
+    with span("layout_events"):
+        events = layout_events(user_input, service_costs)
+        financials = user_financials(user_input)
+
+    plans = snapshot.tables.get(plan_type, ())
+    PLANS_EVALUATED.observe(len(plans))
+    EVENTS_PROCESSED.observe(len(events))
+    logger.debug("Costing %d %r plans over %d events with the %s engine",
+                 len(plans), plan_type, len(events), engine)
+    return engine, snapshot, plans, events, financials
+
+def calculate_costs(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                    engine: Optional[str] = None, snapshot: Optional[CatalogSnapshot] = None,
+                    service_costs: Optional[Mapping[str, float]] = None) -> Dict[str, Any]:
     """
     Calculate monthly and annual costs for each health plan based on user inputs.
     Returns a dictionary of results keyed by plan ID.
+
+    ``engine`` selects "scalar" (event-by-event) or "vectorized" (NumPy, all
+    plans at once); it defaults to the COST_ENGINE environment variable.
+    Pass ``snapshot`` and ``service_costs`` to evaluate several scenarios
+    against the same data; otherwise the current ones are loaded.
     """
     try:
-        plans = get_parsed_health_plans()
-        service_costs = load_service_costs()
-        results = {}
+        engine, snapshot, plans, events, financials = _prepare_costs(
+            user_input, plan_type, engine, snapshot, service_costs)
+        with span(f"{engine}_engine"):
+            if engine == "vectorized":
+                if not plans:
+                    return {}
+                return _vectorized_costs(snapshot.arrays[plan_type], plans, events, tax_rate, financials)
+            return _scalar_costs(plans, events, tax_rate, financials)
+
+    except Exception:
+        logger.exception("Error in calculate_costs function")
+        raise
 
-        for plan_id, plan_details in plans.items():
-            # Filter by enrollment type
-            if plan_details['enrollment_type'] != plan_type:
-                continue
+def iter_plan_costs(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                    engine: Optional[str] = None, snapshot: Optional[CatalogSnapshot] = None,
+                    service_costs: Optional[Mapping[str, float]] = None,
+                    chunk_size: int = STREAM_CHUNK_PLANS) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Like calculate_costs, but yield ``(plan_id, result)`` pairs as each plan
+    is costed instead of building one dict for the whole catalog.
 
-            try:
-                # Determine if plan is HSA eligible
-                # has_hsa = plan_details.get('hsaEligible', False)
-                has_hsa = (plan_details.get('hsa_hra_type', 'N/A') == 'HSA')
-                deductible_remaining = float(plan_details.get('deductible', 0.0))
-                oop_max = float(plan_details.get('oop_max', float('inf')))
-                oop_remaining = oop_max
-                premium = float(plan_details.get('premium', 0.0))
-                assumed_rate_of_return = float(user_input.get('assumedRateOfReturn', 0.0))
-                hsa_percent_spent = float(user_input.get('hsaPercentSpent', 1.0))
-                hsa_contribution = float(user_input.get('hsacontribution', 0.0)) if has_hsa else 0.0
-                fsa_contribution = float(user_input.get('fsa', {}).get('contribution', 0.0)) if not has_hsa else 0.0
-                hsa_pass_through = float(plan_details.get('hsa_pass_through', 0.0)) if has_hsa else 0.0
-                income = float(user_input.get('income', 0.0))
-
-
-                # Calculate tax savings and HSA growth
-                contribution = hsa_contribution + hsa_pass_through if has_hsa else fsa_contribution
-                tax_savings = calculate_tax_savings(contribution, tax_rate)
-                hsa_growth = calculate_hsa_growth(hsa_contribution, hsa_pass_through, hsa_percent_spent, assumed_rate_of_return) if has_hsa else 0.0
-                total_premiums = premium * 12
-
-                # if has_hsa:
-                #     hsa_growth = calculate_hsa_growth(
-                #         hsa_contribution,
-                #         hsa_pass_through,
-                #         hsa_percent_spent,
-                #         assumed_rate_of_return
-                #     )
-                # print(plan_id,": HSA growth: ", hsa_growth,"HSA contribution: ", hsa_contribution, "HSA pass through: ", hsa_pass_through, "HSA percent spent: ", hsa_percent_spent)
-
-                # Initialize monthly breakdown: each month starts with the premium
-                monthly_breakdown = {month: premium for month in range(1, 13)}
-                cumulative_cost = 0.0
-
-                # Process each service from user input
-                for service, details in user_input.items():
-                    if service in ['planType', 'hsa', 'fsa', 'income', 'assumedRateOfReturn', 'hsaPercentSpent']:
-                        continue
-
-                    # Get average service cost
-                    service_cost_value = float(service_costs.get(service, 0.0))
-                    
-                    # Retrieve coverage information from plan_details['services']
-                    raw_coverage = plan_details.get('services', {})
-                    if not isinstance(raw_coverage, dict):
-                        raw_coverage = {}
-                    coverage = raw_coverage.get(service, {})
-                    if not isinstance(coverage, dict):
-                        coverage = {}
-
-                    # Process each date for this service
-                    for date in details.get('dates', []):
-                        try:
-                            month = int(date.split('-')[1])  # Extract month (assuming 'YYYY-MM-DD')
-                        except Exception as e:
-                            print(f"Error parsing date '{date}' for service {service}: {e}")
-                            continue
-
-                        user_pays, deductible_remaining, oop_remaining, cost_breakdown_detail = calculate_service_cost(
-                            service_cost_value, 1, coverage, deductible_remaining, oop_remaining
-                        )
-                        cumulative_cost += user_pays
-                        monthly_breakdown[month] += user_pays
-
-                if cumulative_cost > oop_max:
-                    cumulative_cost = oop_max
-
-                total_cost = total_premiums + cumulative_cost - tax_savings - hsa_growth
-
-                # Calculate unused HSA or FSA funds
-                if has_hsa:
-                    total_hsa_available = hsa_contribution + hsa_pass_through
-                    print("total HSA available:", total_hsa_available)
-                    total_hsa_spent = total_hsa_available * hsa_percent_spent
-                    unused_hsa = total_hsa_available - total_hsa_spent
-                    unused_fsa = 0.0
+    The data is loaded and the events laid out before this returns, so a
+    missing catalog raises here rather than midway through a response. The
+    vectorized engine costs ``chunk_size`` plans per NumPy pass.
+    """
+    engine, snapshot, plans, events, financials = _prepare_costs(user_input, plan_type, engine, snapshot, service_costs)
+    if engine == "scalar":
+        return _iter_scalar_costs(plans, events, tax_rate, financials)
+    if not plans:
+        return iter(())
+    return _iter_vectorized_costs(snapshot.arrays[plan_type], plans, events, tax_rate, financials, chunk_size)
+
+def worst_case_exposure(arrays: PlanArrays) -> np.ndarray:
+    """
+    Most each plan can cost in a year: its premiums plus the out-of-pocket
+    maximum, or plus the deductible when the plan has no finite maximum.
+    """
+    return arrays.premium * 12 + np.where(np.isfinite(arrays.oop_max), arrays.oop_max, arrays.deductible)
+
+def _cost_subset(engine: str, arrays: PlanArrays, plans: Sequence[CompiledPlan], indices: Sequence[int],
+                 events: List[Tuple[int, int, float]], tax_rate: float,
+                 financials: Tuple[float, float, float, float]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Cost only the plans at ``indices`` with the given engine.
+    """
+    subset = [plans[i] for i in indices]
+    if engine == "scalar":
+        return _iter_scalar_costs(subset, events, tax_rate, financials)
+    return iter(_vectorized_costs(take_plan_arrays(arrays, indices), subset, events, tax_rate, financials).items())
+
+def rank_plan_costs(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                    top_k: Optional[int] = None, sort_by: str = "total_cost",
+                    engine: Optional[str] = None, snapshot: Optional[CatalogSnapshot] = None,
+                    service_costs: Optional[Mapping[str, float]] = None
+                    ) -> Tuple[List[Tuple[str, Dict[str, Any]]], Dict[str, int]]:
+    """
+    The ``top_k`` best plans (all of them when None), cheapest first by
+    ``sort_by``, with their full results; only those plans get a breakdown
+    where possible.
+
+    "premiums" and "worst_case" don't depend on usage, so the top K are picked
+    first. For "total_cost", plans are visited in order of their lower bound,
+    annual premiums minus tax savings and HSA growth (out-of-pocket costs are
+    never negative), and a bounded heap keeps the K best totals seen; once the
+    next lower bound exceeds the K-th best total no remaining plan can enter.
+
+    :return: ``(ranked (plan_id, result) pairs, {"plans_considered", "plans_evaluated"})``
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort_by}")
+    engine, snapshot, plans, events, financials = _prepare_costs(user_input, plan_type, engine, snapshot, service_costs)
+    stats = {"plans_considered": len(plans), "plans_evaluated": 0}
+    if not plans:
+        return [], stats
+    arrays = snapshot.arrays[plan_type]
+    k = len(plans) if top_k is None else max(0, min(top_k, len(plans)))
+
+    if sort_by != "total_cost":
+        keys = (arrays.premium * 12 if sort_by == "premiums" else worst_case_exposure(arrays)).tolist()
+        chosen = heapq.nsmallest(k, range(len(plans)), key=lambda i: (keys[i], i))
+        results = dict(_cost_subset(engine, arrays, plans, chosen, events, tax_rate, financials))
+        stats["plans_evaluated"] = len(chosen)
+        return [(plans[i].plan_id, results[plans[i].plan_id]) for i in chosen if plans[i].plan_id in results], stats
+
+    _, tax_savings, hsa_growth = plan_credits(arrays, tax_rate, financials)
+    lower_bounds = (arrays.premium * 12 - tax_savings - hsa_growth).tolist()
+    candidates = sorted(range(len(plans)), key=lambda i: (lower_bounds[i], i))
+    position_of = {plan.plan_id: i for i, plan in enumerate(plans)}
+    # Vectorized passes amortize NumPy overhead over a batch of candidates
+    batch = 1 if engine == "scalar" else max(k, _RANK_BATCH_PLANS)
+
+    # Max-heap of the best k so far as (-total, -index, plan_id, result)
+    heap: List[Tuple[float, int, str, Dict[str, Any]]] = []
+    start = 0
+    while start < len(candidates) and k:
+        if len(heap) == k and lower_bounds[candidates[start]] > -heap[0][0] + _PRUNE_TOLERANCE:
+            break
+        chunk = candidates[start:start + batch]
+        start += len(chunk)
+        stats["plans_evaluated"] += len(chunk)
+        for plan_id, result in _cost_subset(engine, arrays, plans, chunk, events, tax_rate, financials):
+            entry = (-result["total_cost"], -position_of[plan_id], plan_id, result)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+    ranked = sorted(heap, key=lambda entry: (-entry[0], -entry[1]))
+    return [(plan_id, result) for _, _, plan_id, result in ranked], stats
+
+def _scalar_costs(plans: Sequence[CompiledPlan], events: List[Tuple[int, int, float]],
+                  tax_rate: float, financials: Tuple[float, float, float, float]) -> Dict[str, Any]:
+    """
+    Reference engine: replay every event against every plan in turn.
+    """
+    return dict(_iter_scalar_costs(plans, events, tax_rate, financials))
+
+def _iter_scalar_costs(plans: Sequence[CompiledPlan], events: List[Tuple[int, int, float]], tax_rate: float,
+                       financials: Tuple[float, float, float, float]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield ``(plan_id, result)`` for each plan as the scalar engine costs it.
+    """
+    assumed_rate_of_return, hsa_percent_spent, user_hsa_contribution, user_fsa_contribution = financials
+    # Checked once so per-plan math traces cost nothing unless DEBUG is on
+    trace = logger.isEnabledFor(logging.DEBUG)
+
+    for plan in plans:
+        try:
+            has_hsa = plan.has_hsa
+            premium = plan.premium
+            oop_max = plan.oop_max
+            deductible_remaining = plan.deductible
+            oop_remaining = oop_max
+            coverage = plan.coverage
+            hsa_contribution = user_hsa_contribution if has_hsa else 0.0
+            fsa_contribution = user_fsa_contribution if not has_hsa else 0.0
+            hsa_pass_through = plan.hsa_pass_through
+
+            # Calculate tax savings and HSA growth
+            contribution = hsa_contribution + hsa_pass_through if has_hsa else fsa_contribution
+            tax_savings = calculate_tax_savings(contribution, tax_rate)
+            hsa_growth = calculate_hsa_growth(hsa_contribution, hsa_pass_through, hsa_percent_spent, assumed_rate_of_return) if has_hsa else 0.0
+            total_premiums = premium * 12
+
+            # Initialize monthly breakdown: each month starts with the premium
+            monthly_breakdown = [premium] * 12
+            cumulative_cost = 0.0
+
+            # Same arithmetic as calculate_service_cost with frequency 1,
+            # inlined over the compiled coverage terms
+            for month, service_index, service_cost in events:
+                deductible_applies, copay, coinsurance, coinsurance_max = coverage[service_index]
+                if deductible_applies:
+                    deductible_applied = min(service_cost, deductible_remaining)
+                    deductible_remaining -= deductible_applied
+                    user_pays = deductible_applied + copay + min(
+                        coinsurance * (service_cost - deductible_applied), coinsurance_max)
                 else:
-                    total_fsa_available = fsa_contribution
-                    total_fsa_spent = total_fsa_available  # Assume entire FSA is spent
-                    unused_fsa = total_fsa_available - total_fsa_spent
-                    unused_hsa = 0.0
-
-                results[plan_id] = {
-                    'plan_name': plan_details['plan_name'],
-                    'monthly_breakdown': {
-                        month_name: monthly_breakdown[month]
-                        for month_name, month in zip(
-                            ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"],
-                            range(1, 13)
-                        )
-                    },
-                    'total_cost': round(total_cost, 2),
-                    'tax_savings': round(tax_savings, 2),
-                    'cumulative_cost': round(cumulative_cost, 2),
-                    'unused_hsa': round(unused_hsa, 2),
-                    'unused_fsa': round(unused_fsa, 2),
-                    'hsa_growth': round(hsa_growth, 2)
-                }
+                    user_pays = copay + min(coinsurance * service_cost, coinsurance_max)
 
-            except Exception as e:
-                print(f"Error processing plan {plan_id}: {e}")
-                continue
+                if user_pays > oop_remaining:
+                    user_pays = oop_remaining
+                    oop_remaining = 0.0
+                else:
+                    oop_remaining -= user_pays
+
+                user_pays = round(user_pays, 2)
+                deductible_remaining = round(deductible_remaining, 2)
+                oop_remaining = round(oop_remaining, 2)
+                cumulative_cost += user_pays
+                monthly_breakdown[month] += user_pays
+
+            if cumulative_cost > oop_max:
+                cumulative_cost = oop_max
+
+            total_cost = total_premiums + cumulative_cost - tax_savings - hsa_growth
+            if trace:
+                logger.debug("Plan %s: premiums=%.2f out_of_pocket=%.2f tax_savings=%.2f hsa_growth=%.2f total=%.2f",
+                             plan.plan_id, total_premiums, cumulative_cost, tax_savings, hsa_growth, total_cost)
+
+            # Calculate unused HSA or FSA funds
+            if has_hsa:
+                total_hsa_available = hsa_contribution + hsa_pass_through
+                total_hsa_spent = total_hsa_available * hsa_percent_spent
+                unused_hsa = total_hsa_available - total_hsa_spent
+                unused_fsa = 0.0
+            else:
+                total_fsa_available = fsa_contribution
+                total_fsa_spent = total_fsa_available  # Assume entire FSA is spent
+                unused_fsa = total_fsa_available - total_fsa_spent
+                unused_hsa = 0.0
+
+            result = {
+                'plan_name': plan.plan_name,
+                'monthly_breakdown': dict(zip(MONTH_NAMES, monthly_breakdown)),
+                'total_cost': round(total_cost, 2),
+                'tax_savings': round(tax_savings, 2),
+                'cumulative_cost': round(cumulative_cost, 2),
+                'unused_hsa': round(unused_hsa, 2),
+                'unused_fsa': round(unused_fsa, 2),
+                'hsa_growth': round(hsa_growth, 2)
+            }
+
+        except Exception as e:
+            logger.exception("Error processing plan %s", plan.plan_id)
+            continue
+
+        yield plan.plan_id, result
+
+def plan_credits(arrays: PlanArrays, tax_rate: float,
+                 financials: Tuple[float, float, float, float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Usage-independent credits of each plan: the user's HSA contribution,
+    tax savings and HSA growth, as arrays over the plans in ``arrays``.
+    """
+    assumed_rate_of_return, hsa_percent_spent, user_hsa_contribution, user_fsa_contribution = financials
+    has_hsa = arrays.has_hsa
+    hsa_contribution = np.where(has_hsa, user_hsa_contribution, 0.0)
+    fsa_contribution = np.where(has_hsa, 0.0, user_fsa_contribution)
+    contribution = np.where(has_hsa, hsa_contribution + arrays.hsa_pass_through, fsa_contribution)
+    tax_savings = calculate_tax_savings(contribution, tax_rate)
+    hsa_growth = np.where(
+        has_hsa,
+        calculate_hsa_growth(hsa_contribution, arrays.hsa_pass_through, hsa_percent_spent, assumed_rate_of_return),
+        0.0,
+    )
+    return hsa_contribution, tax_savings, hsa_growth
+
+def _iter_vectorized_costs(arrays: PlanArrays, plans: Sequence[CompiledPlan],
+                           events: List[Tuple[int, int, float]], tax_rate: float,
+                           financials: Tuple[float, float, float, float],
+                           chunk_size: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield ``(plan_id, result)`` pairs from the vectorized engine, costing
+    ``chunk_size`` plans at a time.
+    """
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(plans), chunk_size):
+        stop = start + chunk_size
+        chunk = _vectorized_costs(slice_plan_arrays(arrays, start, stop), plans[start:stop],
+                                  events, tax_rate, financials)
+        yield from chunk.items()
+
+def _vectorized_costs(arrays: PlanArrays, plans: Sequence[CompiledPlan],
+                      events: List[Tuple[int, int, float]], tax_rate: float,
+                      financials: Tuple[float, float, float, float]) -> Dict[str, Any]:
+    """
+    NumPy engine: evaluate every event for every plan in one pass of
+    cumulative sums (see accumulate_payments).
+    """
+    if events:
+        months, service_indices, event_costs = zip(*events)
+        service_indices = np.asarray(service_indices, dtype=int)
+        payments, _, _ = accumulate_payments(
+            np.asarray(event_costs, dtype=float),
+            arrays.deductible_applies[:, service_indices],
+            arrays.copay[:, service_indices],
+            arrays.coinsurance[:, service_indices],
+            arrays.deductible,
+            arrays.oop_max,
+            arrays.coinsurance_max[:, service_indices],
+        )
+        # Accumulate in event order, as the scalar loop does, so the float
+        # sums add no drift beyond SCALAR_PARITY_TOLERANCE
+        monthly_breakdown = np.repeat(arrays.premium[:, None], 12, axis=1)
+        np.add.at(monthly_breakdown, (slice(None), np.asarray(months, dtype=int)), payments)
+        cumulative_cost = np.minimum(np.cumsum(payments, axis=1)[:, -1], arrays.oop_max)
+    else:
+        monthly_breakdown = np.repeat(arrays.premium[:, None], 12, axis=1)
+        cumulative_cost = np.zeros(len(plans))
 
-        return results
+    return vectorized_results(arrays, plans, monthly_breakdown, cumulative_cost, tax_rate, financials)
 
-    except Exception as e:
-        print(f"Error in calculate_costs function: {e}")
-        raise
+
+def vectorized_results(arrays: PlanArrays, plans: Sequence[CompiledPlan], monthly_breakdown: np.ndarray,
+                       cumulative_cost: np.ndarray, tax_rate: float,
+                       financials: Tuple[float, float, float, float]) -> Dict[str, Any]:
+    """
+    Build calculate_costs results from each plan's monthly spending (premium
+    plus out-of-pocket, ``(P, 12)``) and capped out-of-pocket total ``(P,)``.
+    """
+    hsa_percent_spent = financials[1]
+    has_hsa = arrays.has_hsa
+    hsa_contribution, tax_savings, hsa_growth = plan_credits(arrays, tax_rate, financials)
+
+    total_cost = arrays.premium * 12 + cumulative_cost - tax_savings - hsa_growth
+    if logger.isEnabledFor(logging.DEBUG):
+        for plan, row in zip(plans, zip(cumulative_cost, tax_savings, hsa_growth, total_cost)):
+            logger.debug("Plan %s: premiums=%.2f out_of_pocket=%.2f tax_savings=%.2f hsa_growth=%.2f total=%.2f",
+                         plan.plan_id, plan.premium * 12, *row)
+    total_hsa_available = hsa_contribution + arrays.hsa_pass_through
+    unused_hsa = np.where(has_hsa, total_hsa_available - total_hsa_available * hsa_percent_spent, 0.0)
+    unused_fsa = np.zeros(len(plans))  # Assume entire FSA is spent
+
+    columns = zip(
+        plans,
+        monthly_breakdown.tolist(),
+        round_cents(total_cost).tolist(),
+        round_cents(tax_savings).tolist(),
+        round_cents(cumulative_cost).tolist(),
+        round_cents(unused_hsa).tolist(),
+        round_cents(unused_fsa).tolist(),
+        round_cents(hsa_growth).tolist(),
+    )
+    return {
+        plan.plan_id: {
+            'plan_name': plan.plan_name,
+            'monthly_breakdown': dict(zip(MONTH_NAMES, monthly)),
+            'total_cost': total,
+            'tax_savings': savings,
+            'cumulative_cost': cumulative,
+            'unused_hsa': hsa_left,
+            'unused_fsa': fsa_left,
+            'hsa_growth': growth,
+        }
+        for plan, monthly, total, savings, cumulative, hsa_left, fsa_left, growth in columns
+    }
 
 
 
@@ -0,0 +1,232 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from services.cost_calculator import plan_credits
+    from services.plan_catalog import catalog, CatalogSnapshot, SERVICE_INDEX
+    from services.result_cache import ResultCache
+    from services.vectorized_engine import PlanArrays
+except ImportError:
+    from backend.services.cost_calculator import plan_credits
+    from backend.services.plan_catalog import catalog, CatalogSnapshot, SERVICE_INDEX
+    from backend.services.result_cache import ResultCache
+    from backend.services.vectorized_engine import PlanArrays
+
+logger = logging.getLogger(__name__)
+
+# Service whose cost sharing the curves built at catalog load describe
+CURVE_DEFAULT_SERVICE = os.environ.get("CURVE_DEFAULT_SERVICE", "Inpatient Admission")
+# Spending levels one /api/calculate/curves request may evaluate
+CURVE_MAX_LEVELS = int(os.environ.get("CURVE_MAX_LEVELS", "1000"))
+# Enrollment type and service combinations kept until the next reload
+CURVE_MAX_SERVICES = 64
+
+# Start, end of the deductible and point where the out-of-pocket maximum is reached
+_BREAKPOINTS = 3
+
+
+class CostCurves:
+    """
+    Annual out-of-pocket spending of every plan of one enrollment type as a
+    piecewise-linear function of the allowed charges for one service.
+
+    Each plan's curve is ``_BREAKPOINTS`` ``(spending, out_of_pocket)`` points
+    with the slope that applies from each point on: the member pays
+    everything up to the deductible (if it applies to the service), then the
+    service's coinsurance until the out-of-pocket maximum, then nothing.
+    Copays and per-event coinsurance caps depend on the number of events
+    rather than on spending, so they aren't part of the curve.
+    """
+
+    __slots__ = ("plan_ids", "plan_names", "service", "spending", "out_of_pocket", "slope", "_breakpoints")
+
+    def __init__(self, plan_ids: Tuple[str, ...], plan_names: Tuple[str, ...], service: str,
+                 spending: np.ndarray, out_of_pocket: np.ndarray, slope: np.ndarray):
+        self.plan_ids = plan_ids
+        self.plan_names = plan_names
+        self.service = service
+        self.spending = spending
+        self.out_of_pocket = out_of_pocket
+        self.slope = slope
+        self._breakpoints: Optional[List[Dict[str, Any]]] = None
+
+    def evaluate(self, levels: np.ndarray) -> np.ndarray:
+        """
+        Out-of-pocket spending at each of ``levels`` (allowed charges, at
+        least 0), shaped ``(len(levels), plans)``.
+        """
+        levels = np.asarray(levels, dtype=float)
+        return self.at(np.arange(len(self.plan_ids))[None, :], levels[:, None])
+
+    def at(self, rows: np.ndarray, spending: np.ndarray) -> np.ndarray:
+        """
+        Out-of-pocket spending of the plans at ``rows`` at the matching
+        ``spending`` levels (finite, at least 0); the two broadcast together.
+        """
+        # Last breakpoint at or below each level; the first is always 0
+        segment = np.maximum((self.spending[rows] <= spending[..., None]).sum(axis=-1) - 1, 0)
+        start = self.spending[rows, segment]
+        return self.out_of_pocket[rows, segment] + self.slope[rows, segment] * (spending - start)
+
+    def breakpoints(self) -> List[Dict[str, Any]]:
+        """
+        Each plan's curve for the API: its finite, distinct breakpoints and
+        the slope after the last of them. Built once per set of curves.
+        """
+        if self._breakpoints is None:
+            curves = []
+            for xs, ys, slopes in zip(np.round(self.spending, 2).tolist(), np.round(self.out_of_pocket, 2).tolist(),
+                                      self.slope.tolist()):
+                points: List[List[float]] = []
+                final_slope = 0.0
+                for x, y, slope in zip(xs, ys, slopes):
+                    if x == np.inf:
+                        break
+                    if points and points[-1][0] == x:
+                        points[-1] = [x, y]
+                    else:
+                        points.append([x, y])
+                    final_slope = slope
+                curves.append({"breakpoints": points, "final_slope": final_slope})
+            self._breakpoints = curves
+        return self._breakpoints
+
+
+def build_cost_curves(plan_ids: Tuple[str, ...], plan_names: Tuple[str, ...], arrays: PlanArrays,
+                      service: str) -> CostCurves:
+    """
+    Curves for the plans in ``arrays`` under ``service``'s cost sharing.
+
+    :raises ValueError: for a service the catalog doesn't describe.
+    """
+    if service not in SERVICE_INDEX:
+        raise ValueError(f"Unknown service {service!r}")
+    index = SERVICE_INDEX[service]
+    deductible, oop_max = arrays.deductible, arrays.oop_max
+    if not len(deductible):
+        # Empty tables have no coverage columns at all
+        empty = np.zeros((0, _BREAKPOINTS))
+        return CostCurves(plan_ids, plan_names, service, empty, empty, empty)
+    applies = arrays.deductible_applies[:, index].astype(bool) & (deductible > 0)
+    coinsurance = arrays.coinsurance[:, index]
+
+    # Charges are paid in full until the deductible is met (or the
+    # out-of-pocket maximum, if that is lower)
+    deductible_end = np.where(applies, np.minimum(deductible, oop_max), 0.0)
+    reaches_cap = (coinsurance > 0) & np.isfinite(oop_max) & (deductible_end < oop_max)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cap_at = np.where(reaches_cap, deductible_end + (oop_max - deductible_end) / coinsurance, np.inf)
+
+    spending = np.stack([np.zeros_like(deductible), deductible_end, cap_at], axis=-1)
+    out_of_pocket = np.stack([np.zeros_like(deductible), deductible_end,
+                              np.where(reaches_cap, oop_max, np.inf)], axis=-1)
+    slope = np.stack([
+        np.where(applies, 1.0, coinsurance),
+        np.where(deductible_end < oop_max, coinsurance, 0.0),
+        np.zeros_like(deductible),
+    ], axis=-1)
+    return CostCurves(plan_ids, plan_names, service, spending, out_of_pocket, slope)
+
+
+class CostCurveTable:
+    """
+    Cost curves for the current snapshot.
+
+    Curves for CURVE_DEFAULT_SERVICE are built for every enrollment type as
+    soon as a snapshot loads (see prime); other services are built on first
+    request and kept until the next reload.
+    """
+
+    def __init__(self, max_services: int = CURVE_MAX_SERVICES):
+        self._version: Optional[str] = None
+        self._curves = ResultCache(max_entries=max_services, ttl=float("inf"))
+
+    def prime(self, snapshot: CatalogSnapshot) -> None:
+        self._curves.clear()
+        self._version = snapshot.version
+        if CURVE_DEFAULT_SERVICE not in SERVICE_INDEX:
+            logger.warning("CURVE_DEFAULT_SERVICE %r is not a known service", CURVE_DEFAULT_SERVICE)
+            return
+        for plan_type in snapshot.tables:
+            self.get(snapshot, plan_type, CURVE_DEFAULT_SERVICE)
+
+    def get(self, snapshot: CatalogSnapshot, plan_type: str, service: str = CURVE_DEFAULT_SERVICE) -> CostCurves:
+        """
+        :raises KeyError: if ``snapshot`` has no plans of ``plan_type``.
+        :raises ValueError: for a service the catalog doesn't describe.
+        """
+        if self._version != snapshot.version:
+            self._curves.clear()
+            self._version = snapshot.version
+        key = f"{plan_type}\x00{service}"
+        curves = self._curves.get(key)
+        if curves is None:
+            plans = snapshot.tables[plan_type]
+            curves = build_cost_curves(tuple(plan.plan_id for plan in plans),
+                                       tuple(plan.plan_name for plan in plans),
+                                       snapshot.arrays[plan_type], service)
+            self._curves.put(key, curves)
+        return curves
+
+    def clear(self) -> None:
+        self._version = None
+        self._curves.clear()
+
+
+def fixed_costs(arrays: PlanArrays, tax_rate: float, financials: Tuple[float, float, float, float]) -> np.ndarray:
+    """
+    The part of each plan's total annual cost that doesn't depend on usage:
+    premiums less tax savings and HSA growth (which include any HSA/HRA
+    pass-through).
+    """
+    _, tax_savings, hsa_growth = plan_credits(arrays, tax_rate, financials)
+    return arrays.premium * 12 - tax_savings - hsa_growth
+
+
+def evaluate_curves(levels: List[float], tax_rate: float, plan_type: str, financials: Tuple[float, float, float, float],
+                    service: str = CURVE_DEFAULT_SERVICE, snapshot: Optional[CatalogSnapshot] = None
+                    ) -> Dict[str, Any]:
+    """
+    Each plan's out-of-pocket spending and total annual cost (premiums plus
+    out-of-pocket, less tax savings and HSA growth) at each spending level.
+
+    :param financials: As returned by cost_calculator.user_financials.
+    :return: ``{"service", "spending", "plans": {plan_id: {"plan_name",
+        "out_of_pocket", "total_cost", "curve"}}}``; ``curve`` holds the
+        breakpoints clients can interpolate themselves.
+    :raises ValueError: for a service the catalog doesn't describe.
+    """
+    if service not in SERVICE_INDEX:
+        raise ValueError(f"Unknown service {service!r}")
+    if snapshot is None:
+        snapshot = catalog.get()
+    levels_array = np.asarray(levels, dtype=float)
+    if plan_type not in snapshot.tables:
+        return {"service": service, "spending": levels_array.tolist(), "plans": {}}
+
+    curves = cost_curves.get(snapshot, plan_type, service)
+    out_of_pocket = curves.evaluate(levels_array)
+    total_cost = out_of_pocket + fixed_costs(snapshot.arrays[plan_type], tax_rate, financials)
+    out_of_pocket, total_cost = np.round(out_of_pocket, 2).T.tolist(), np.round(total_cost, 2).T.tolist()
+    breakpoints = curves.breakpoints()
+    return {
+        "service": service,
+        "spending": levels_array.tolist(),
+        "plans": {
+            plan_id: {
+                "plan_name": curves.plan_names[row],
+                "out_of_pocket": out_of_pocket[row],
+                "total_cost": total_cost[row],
+                "curve": breakpoints[row],
+            }
+            for row, plan_id in enumerate(curves.plan_ids)
+        },
+    }
+
+
+# Shared by the curves endpoint; rebuilt whenever the catalog reloads
+cost_curves = CostCurveTable()
+catalog.add_reload_listener(cost_curves.prime)
@@ -0,0 +1,409 @@
+"""
+Streaming reader for the FEHB plan comparison JSON (the format of Example.txt).
+
+The document is one object whose ``"FEHB Benefits"`` array holds a record per
+plan and network, with per-enrollment-type columns (``Calendar Year
+Deductible Self`` / ``Self Plus One`` / ``Self & Family``), and whose
+``"Premiums"`` arrays hold a record per enrollment code. Records are decoded
+one at a time from fixed-size chunks, so memory stays proportional to the
+largest record and the normalized output rather than to the file.
+"""
+import codecs
+import functools
+import json
+import logging
+import os
+import re
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+try:
+    from services.plan_catalog import ENROLLMENT_TYPES, SERVICE_COLUMNS
+except ImportError:
+    from backend.services.plan_catalog import ENROLLMENT_TYPES, SERVICE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the file at a time
+FEHB_CHUNK_SIZE = int(os.environ.get("FEHB_CHUNK_SIZE", str(64 * 1024)))
+
+BENEFITS_KEY = "FEHB Benefits"
+PREMIUM_KEYS = ("Premiums", "HMO Premiums (Copy as needed)")
+PREMIUM_COLUMN = "2025 Monthly - Empl. Pays"
+
+# FEHB column for each service where it differs from the CSV's SERVICE_COLUMNS
+FEHB_SERVICE_COLUMNS = {
+    **SERVICE_COLUMNS,
+    "Inpatient Admission": "Surgery & Hospital Charges - Hospital Inpatient Cost Per Admission",
+    "Medications Tier 0": "Prescription Drugs - Tier 0 Prescription",
+}
+
+# Prefix of each Medicare cost-sharing column group
+MEDICARE_GROUPS = {
+    "A & B": "Member Cost with Medicare A & B Primary - ",
+    "Part C": "Member Cost with Medicare Advantage (Part C) Primary - ",
+    "Part D": "Member Cost with Medicare Part D EGWP - ",
+}
+_MEDICARE_PREFIX = "Member Cost with Medicare"
+
+# Plan ID suffix per enrollment type, as in health_plan_info.csv
+ENROLLMENT_SUFFIXES = {"Self": "S", "Self Plus One": "SO", "Self & Family": "SF"}
+
+_WHITESPACE = " \t\r\n"
+_TIER_PREFIX = re.compile(r"^\s*tier\s*\d+\s*:\s*", re.IGNORECASE)
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+_DOLLARS = re.compile(r"\$\s*(\d[\d,]*(?:\.\d+)?)(\s*max(?:imum)?\b)?", re.IGNORECASE)
+_NOT_COVERED = ("not covered", "member pays all", "no benefit")
+_NO_DEDUCTIBLE = ("deductible waived", "no deductible")
+_AFTER_DEDUCTIBLE = ("after deductible", "after the deductible")
+
+
+def iter_json_array_items(stream: IO[bytes], keys: Iterable[str], chunk_size: Optional[int] = None,
+                          digest=None) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield ``(key, item)`` for every element of the arrays under ``keys`` in a
+    JSON object, decoding one element at a time.
+
+    Other top-level values are decoded and dropped. Consumed text is discarded
+    as the reader advances, so memory is bounded by the largest single value.
+
+    :param stream: Binary file object positioned at the start of the document.
+    :param chunk_size: Bytes to read at a time (default FEHB_CHUNK_SIZE).
+    :param digest: Optional ``hashlib`` object updated with every byte read.
+    :raises ValueError: if the document isn't a JSON object or is malformed.
+    """
+    keys = set(keys)
+    chunk_size = chunk_size or FEHB_CHUNK_SIZE
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buf, pos, eof = "", 0, False
+
+    def fill(minimum: int = 1) -> bool:
+        # Append at least ``minimum`` more characters unless the file ends
+        nonlocal buf, pos, eof
+        if pos:
+            buf, pos = buf[pos:], 0
+        target = len(buf) + minimum
+        while not eof and len(buf) < target:
+            raw = stream.read(max(chunk_size, minimum))
+            if digest is not None:
+                digest.update(raw)
+            eof = not raw
+            buf += text_decoder.decode(raw, final=eof)
+        return len(buf) >= target
+
+    def peek() -> str:
+        # Next non-whitespace character, or "" at the end of the document
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return ""
+
+    def value() -> Any:
+        # Retry with more text until the value is complete; a value that ends
+        # exactly at the end of the buffer (e.g. a number) might continue
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"Invalid JSON at character {e.pos}: {e.msg}")
+                fill(len(buf) - pos)
+                continue
+            if end == len(buf) and not eof:
+                fill(len(buf) - pos)
+                continue
+            pos = end
+            return result
+
+    def expect(char: str) -> None:
+        nonlocal pos
+        found = peek()
+        if found != char:
+            raise ValueError(f"Invalid JSON: expected {char!r}, found {found or 'end of document'!r}")
+        pos += 1
+
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        key = value()
+        expect(":")
+        if key in keys and peek() == "[":
+            pos += 1
+            if peek() != "]":
+                while True:
+                    yield key, value()
+                    if peek() != ",":
+                        break
+                    pos += 1
+            expect("]")
+        else:
+            value()
+        if peek() != ",":
+            break
+        pos += 1
+    expect("}")
+
+
+def parse_amount(raw: Any) -> Optional[float]:
+    """
+    A dollar amount such as ``2000``, ``"2000.0"`` or ``"$2,000"``; None for
+    blanks and non-amounts such as ``"No limit"``.
+    """
+    if isinstance(raw, bool) or raw is None:
+        return None
+    if isinstance(raw, (int, float)):
+        return float(raw)
+    text = str(raw).strip().replace("$", "").replace(",", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_cost_expression(raw: Any) -> Optional[Dict[str, Any]]:
+    """
+    Convert one FEHB cost-sharing value into a coverage rule.
+
+    Numbers up to 1 are coinsurance rates (``1`` is 100%) and larger amounts
+    are copays, as in the CSV; dollar strings (``"$1"``) are always copays.
+    Strings may combine terms: ``"25% $350 Max"`` (coinsurance capped
+    per event), ``"Tier 1: $10"``, ``"Tier 2: 45%"``, ``"$20 after
+    deductible"``, ``"Deductible Waived"``. ``"Not Covered"`` and ``"Member
+    Pays All Charges"`` become 100% coinsurance outside the deductible.
+    Coinsurance applies after the deductible and copays don't, unless the text
+    says otherwise.
+
+    :return: ``{"copay", "coinsurance", "deductible_applies"}`` plus
+        ``"coinsurance_max"`` when capped, or None for values that aren't
+        cost terms (``"Yes"``, ``"Covered"``, blanks).
+    """
+    if raw is None or isinstance(raw, bool):
+        return None
+    if isinstance(raw, (int, float)):
+        if 0 < raw <= 1:
+            return {"copay": 0.0, "coinsurance": float(raw), "deductible_applies": True}
+        return {"copay": float(raw), "coinsurance": 0.0, "deductible_applies": False}
+
+    text = _TIER_PREFIX.sub("", str(raw)).strip()
+    lowered = text.lower()
+    if not lowered:
+        return None
+    if any(marker in lowered for marker in _NOT_COVERED):
+        return {"copay": 0.0, "coinsurance": 1.0, "deductible_applies": False}
+    amount = parse_amount(text)
+    if amount is not None:
+        if "$" in text:
+            return {"copay": amount, "coinsurance": 0.0, "deductible_applies": False}
+        return parse_cost_expression(amount)
+
+    rule: Dict[str, Any] = {"copay": 0.0, "coinsurance": 0.0}
+    percent = _PERCENT.search(text)
+    if percent:
+        rule["coinsurance"] = float(percent.group(1)) / 100
+    for match in _DOLLARS.finditer(text):
+        amount = float(match.group(1).replace(",", ""))
+        if match.group(2):
+            rule["coinsurance_max"] = amount
+        else:
+            rule["copay"] = amount
+    if not percent and not rule["copay"]:
+        # A cap or waiver with no charge of its own ("$1200 Max") isn't a cost term
+        return None
+    if not percent:
+        rule.pop("coinsurance_max", None)
+    if any(marker in lowered for marker in _NO_DEDUCTIBLE):
+        rule["deductible_applies"] = False
+    elif any(marker in lowered for marker in _AFTER_DEDUCTIBLE):
+        rule["deductible_applies"] = True
+    else:
+        rule["deductible_applies"] = not rule["copay"]
+    return rule
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_rule(kind: type, raw: Any) -> Optional[Dict[str, Any]]:
+    return parse_cost_expression(raw)
+
+
+def _cost_rule(raw: Any) -> Optional[Dict[str, Any]]:
+    # Files repeat a few hundred distinct values, so equal values share one
+    # (read-only) rule dict. Keyed on the type too, since True == 1.
+    try:
+        return _cached_rule(type(raw), raw)
+    except TypeError:  # Unhashable, e.g. a nested list
+        return parse_cost_expression(raw)
+
+
+def account_type(attributes: Dict[str, Any]) -> str:
+    """
+    ``"HSA"``, ``"HRA"`` or ``"N/A"`` from a benefits record.
+    """
+    raw = attributes.get("Services & Benefits - Type of Account",
+                         attributes.get("Services & Benefits - Medical Account (HRA/HSA)"))
+    text = str(raw or "").upper()
+    for account in ("HSA", "HRA"):
+        if account in text:
+            return account
+    if text == "YES":
+        # HDHPs come with an HSA and consumer-driven plans with an HRA
+        return "HSA" if "HDHP" in str(attributes.get("Plan Code Option", "")).upper() else "HRA"
+    return "N/A"
+
+
+def plan_name(attributes: Dict[str, Any]) -> str:
+    """
+    Plan name plus option, without repeating an option already in the name.
+    """
+    name = str(attributes.get("Plan Code Name") or attributes.get("Plan Code") or "").strip()
+    option = str(attributes.get("Plan Code Option") or "").strip()
+    return name if not option or option.lower() in name.lower() else f"{name} {option}"
+
+
+def _limit(raw: Any) -> Optional[float]:
+    # A plan limit such as 2000, "$2,000" or "$1200 Max"; None for "No" and blanks
+    amount = parse_amount(raw)
+    if amount is None:
+        match = _DOLLARS.search(str(raw or ""))
+        amount = float(match.group(1).replace(",", "")) if match else None
+    return amount
+
+
+def medicare_terms(attributes: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Medicare cost sharing of a benefits record, by MEDICARE_GROUPS group.
+
+    Each group with any values has ``out_of_pocket_max`` and
+    ``part_b_reimbursement`` (annual amounts, or None), ``deductible_waived``
+    and ``services``: coverage rules (see parse_cost_expression) keyed by the
+    column name without the group prefix.
+    """
+    medicare: Dict[str, Dict[str, Any]] = {}
+    for column, raw in attributes.items():
+        if not column.startswith(_MEDICARE_PREFIX):
+            continue
+        for group, prefix in MEDICARE_GROUPS.items():
+            if not column.startswith(prefix):
+                continue
+            terms = medicare.setdefault(group, {"out_of_pocket_max": None, "part_b_reimbursement": None,
+                                                "deductible_waived": False, "services": {}})
+            name = column[len(prefix):]
+            lowered = name.lower()
+            if "out-of-pocket maximum" in lowered:
+                terms["out_of_pocket_max"] = _limit(raw)
+            elif "premium reimbursement" in lowered:
+                terms["part_b_reimbursement"] = _limit(raw)
+            elif "deductible waiver" in lowered:
+                terms["deductible_waived"] = any(marker in str(raw or "").lower() for marker in _NO_DEDUCTIBLE)
+            else:
+                rule = _cost_rule(raw)
+                if rule is not None:
+                    terms["services"][name] = rule
+            break
+    return medicare
+
+
+def normalize_benefits(attributes: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Split one benefits record into a parsed plan per enrollment type.
+
+    Plans have the keys parse_health_plans writes, with the plan's own name
+    in ``plan_name``, plus ``plan_code``, ``network`` and ``medicare`` (see
+    medicare_terms; the cost engine doesn't use it), which the catalog keeps
+    as plan_catalog.PLAN_DETAIL_FIELDS. ``services`` holds coverage rules from
+    parse_cost_expression rather than plain numbers, and ``premium`` is None
+    until the premiums are joined in.
+    """
+    name = plan_name(attributes)
+    network = str(attributes.get("Network Type") or "").strip()
+    account = account_type(attributes)
+    services = {service: _cost_rule(attributes.get(column)) for service, column in FEHB_SERVICE_COLUMNS.items()}
+    services = {service: rule for service, rule in services.items() if rule is not None}
+    medicare = medicare_terms(attributes)
+
+    for enrollment_type in ENROLLMENT_TYPES:
+        deductible = parse_amount(attributes.get(f"Calendar Year Deductible {enrollment_type}"))
+        oop_max = parse_amount(attributes.get(f"Catastrophic Limit {enrollment_type}"))
+        pass_through = parse_amount(
+            attributes.get(f"Premium Pass Through HSA/HRA Contribution {enrollment_type}")) or 0.0
+        plan_id = " ".join(part for part in (name, network, ENROLLMENT_SUFFIXES[enrollment_type]) if part)
+        yield plan_id, {
+            "plan_name": name or plan_id,
+            "enrollment_type": enrollment_type,
+            "premium": None,
+            "deductible": deductible or 0.0,
+            "oop_max": oop_max if oop_max else float("inf"),
+            "hsa_hra_type": account,
+            "hsa_contribution": pass_through,
+            "services": services,
+            "hsa_pass_through": pass_through,
+            "plan_code": str(attributes.get("Plan Code") or "").strip(),
+            "network": network,
+            "medicare": medicare,
+        }
+
+
+def premium_key(attributes: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    ``(plan_code, enrollment_type)`` of a premiums record. Enrollment codes are
+    the plan code plus one digit (``"Z24"`` is plan ``Z2``).
+    """
+    code = str(attributes.get("Enrollment Code") or "").strip()
+    enrollment_type = str(attributes.get("Enrollment Type") or "").strip()
+    if len(code) < 2 or enrollment_type not in ENROLLMENT_SUFFIXES:
+        return None
+    return code[:-1], enrollment_type
+
+
+def load_fehb_plans(source: Union[str, IO[bytes]], chunk_size: Optional[int] = None,
+                    digest=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Stream an FEHB JSON document into ``{plan_id: plan}`` (see
+    normalize_benefits), one plan per plan, network and enrollment type.
+
+    Monthly premiums are the employee share (PREMIUM_COLUMN) of the first
+    premiums record with the plan's code and enrollment type; plans with no
+    premium are dropped, since they can't be costed.
+
+    :param source: Path or binary file object.
+    :param digest: Optional ``hashlib`` object updated with the file's bytes.
+    :raises ValueError: if the document is malformed.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return load_fehb_plans(f, chunk_size, digest)
+
+    plans: Dict[str, Dict[str, Any]] = {}
+    premiums: Dict[Tuple[str, str], float] = {}
+    for key, item in iter_json_array_items(source, (BENEFITS_KEY,) + PREMIUM_KEYS, chunk_size, digest):
+        attributes = item.get("attributes") if isinstance(item, dict) else None
+        if not isinstance(attributes, dict):
+            continue
+        if key != BENEFITS_KEY:
+            join_key = premium_key(attributes)
+            premium = parse_amount(attributes.get(PREMIUM_COLUMN))
+            if join_key is not None and premium is not None:
+                premiums.setdefault(join_key, premium)
+            continue
+        for plan_id, plan in normalize_benefits(attributes):
+            if plan_id in plans:
+                logger.warning("Duplicate FEHB plan %r; keeping the first record", plan_id)
+                continue
+            plans[plan_id] = plan
+
+    unpriced = 0
+    for plan_id, plan in list(plans.items()):
+        plan["premium"] = premiums.get((plan["plan_code"], plan["enrollment_type"]))
+        if plan["premium"] is None:
+            del plans[plan_id]
+            unpriced += 1
+    if unpriced:
+        logger.warning("Dropped %d FEHB plans with no premium record", unpriced)
+    logger.info("Loaded %d FEHB plans (%d premiums)", len(plans), len(premiums))
+    return plans
@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+try:
+    from services.catalog_format import CatalogFile, file_stamp, read_catalog_file, same_path
+except ImportError:
+    from backend.services.catalog_format import CatalogFile, file_stamp, read_catalog_file, same_path
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ReloadableFile(ABC):
+    """
+    Process-wide snapshot of a data file, reloaded when the file changes.
+
+    get() stats the file on every call and only takes the lock when its stamp
+    (mtime/size) differs from the last load. A changed stamp whose content
+    version matches the current snapshot's (the file was touched, not
+    modified) keeps the current snapshot. Each new snapshot is passed to the
+    reload listeners, outside the lock.
+
+    With a ``compiled_path`` (see services.compile_catalog), _read_compiled
+    reads the compiled catalog instead of the file when it was compiled from
+    this ``path`` and from the file's current contents (or the file is
+    missing). A compiled catalog that can't be read or was compiled from
+    another file is skipped with a warning, unless the file is missing too.
+
+    Subclasses implement _read and _build; snapshots need a ``version``.
+    """
+
+    # Names the file in "not found" errors
+    description = "Data file"
+
+    def __init__(self, path: str, compiled_path: Optional[str] = None):
+        self.path = path
+        self.compiled_path = compiled_path
+        self.reload_count = 0
+        self._snapshot: Optional[Any] = None
+        self._file_stamp = None
+        self._lock = threading.Lock()
+        self._reload_listeners: List[Callable[[Any], None]] = []
+
+    def _stat(self):
+        stamp = (file_stamp(self.path), file_stamp(self.compiled_path))
+        if stamp == (None, None):
+            raise RuntimeError(f"{self.description} not found: {self.path}")
+        return stamp
+
+    def _read_compiled(self, stamp, version: Optional[str], source: Callable[[CatalogFile], Tuple[str, str]],
+                       load: Callable[[CatalogFile], T]) -> Optional[T]:
+        """
+        ``load(catalog_file)`` for the compiled catalog, or None to use the
+        file at ``path`` instead.
+
+        :param version: SHA-256 of the file at ``path`` (see _read_file), or
+            None if it is missing.
+        :param source: ``(path, version)`` of this file when ``catalog_file``
+            was compiled.
+        """
+        if stamp[1] is None:
+            return None
+        try:
+            catalog_file = read_catalog_file(self.compiled_path)
+        except (OSError, ValueError) as e:
+            return self._skip_compiled(version, f"Error loading compiled catalog: {e}")
+        compiled_from, compiled_version = source(catalog_file)
+        if not same_path(compiled_from, self.path):
+            return self._skip_compiled(version, f"Compiled catalog {self.compiled_path} was compiled from "
+                                                f"{compiled_from}, not {self.path}")
+        if version is not None and version != compiled_version:
+            logger.info("Compiled catalog %s is out of date; reading %s", self.compiled_path, self.path)
+            return None
+        return load(catalog_file)
+
+    def _skip_compiled(self, version: Optional[str], reason: str) -> None:
+        if version is None:
+            raise RuntimeError(reason)
+        logger.warning("Ignoring compiled catalog: %s", reason)
+
+    def _read_file(self, stamp=None) -> Tuple[Optional[str], Optional[bytes]]:
+        """
+        ``(sha256 hex digest, raw bytes)`` of the file at ``path``, or
+        ``(None, None)`` when ``stamp`` says it is missing and there is a
+        compiled catalog to read instead.
+        """
+        if stamp is not None and stamp[0] is None:
+            return None, None
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raise RuntimeError(f"{self.description} not found: {self.path}")
+        return hashlib.sha256(raw).hexdigest(), raw
+
+    @abstractmethod
+    def _read(self, stamp) -> Tuple[str, Any]:
+        """
+        ``(version, data)`` of the file at ``stamp``; ``data`` is passed to
+        _build unless the version is unchanged.
+        """
+
+    @abstractmethod
+    def _build(self, version: str, data: Any) -> Optional[Any]:
+        """
+        The snapshot for ``data``, or None to keep the current one.
+        """
+
+    def _keep(self, data: Any) -> None:
+        """
+        Called instead of _build when the file changed but its version didn't.
+        """
+
+    def get(self) -> Any:
+        """
+        Return the current snapshot, reloading it first if the file changed.
+        """
+        stamp = self._stat()
+        snapshot = self._snapshot
+        if snapshot is not None and stamp == self._file_stamp:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and stamp == self._file_stamp:
+                return self._snapshot
+            version, data = self._read(stamp)
+            if self._snapshot is not None and version == self._snapshot.version:
+                # Touched (or recompiled) but not modified: keep the parsed data
+                self._file_stamp = stamp
+                self._keep(data)
+                return self._snapshot
+
+            snapshot = self._build(version, data)
+            self._file_stamp = stamp
+            if snapshot is None:
+                return self._snapshot
+            self._snapshot = snapshot
+            self.reload_count += 1
+
+        for listener in list(self._reload_listeners):
+            listener(snapshot)
+        return snapshot
+
+    def add_reload_listener(self, listener: Callable[[Any], None]) -> None:
+        """
+        Call ``listener(snapshot)`` whenever a new snapshot is loaded.
+        """
+        self._reload_listeners.append(listener)
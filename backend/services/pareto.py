@@ -0,0 +1,162 @@
+import logging
+import math
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from services.cost_calculator import worst_case_exposure
+    from services.plan_catalog import catalog, CatalogSnapshot
+    from services.result_cache import cached_costs
+except ImportError:
+    from backend.services.cost_calculator import worst_case_exposure
+    from backend.services.plan_catalog import catalog, CatalogSnapshot
+    from backend.services.result_cache import cached_costs
+
+logger = logging.getLogger(__name__)
+
+# Criteria a frontier can be drawn over; all are annual amounts where lower is better
+PARETO_CRITERIA = ("premium", "worst_case", "expected_cost", "out_of_pocket")
+DEFAULT_PARETO_CRITERIA = ("premium", "worst_case", "expected_cost")
+
+
+def skyline(costs: np.ndarray) -> np.ndarray:
+    """
+    Pareto frontier of a lower-is-better ``(P, 2)`` or ``(P, 3)`` matrix.
+
+    Rows are sorted once and swept in order, which takes O(P log P) instead
+    of comparing every pair. Identical rows share their fate: they don't
+    dominate each other.
+
+    :return: For each row, the index of an undominated row that dominates it
+        (no worse on every criterion, better on at least one), or -1 for rows
+        on the frontier.
+    :raises ValueError: for any other number of criteria.
+    """
+    if costs.ndim != 2 or costs.shape[1] not in (2, 3):
+        raise ValueError("The skyline is computed over two or three criteria")
+    if not len(costs):
+        return np.empty(0, dtype=int)
+    # Sweep the distinct rows in lexicographic order, so anything dominating
+    # a row is ahead of it
+    order = np.lexsort(costs.T[::-1])
+    ordered = costs[order]
+    distinct = np.concatenate(([True], (ordered[1:] != ordered[:-1]).any(axis=1)))
+    points = ordered[distinct]
+    dominators = _sweep_2d(points) if points.shape[1] == 2 else _sweep_3d(points)
+    # Point indices back to plan rows: the first row with those values
+    first_row = order[distinct]
+    result = np.empty(len(costs), dtype=int)
+    result[order] = np.where(dominators >= 0, first_row[dominators], -1)[np.cumsum(distinct) - 1]
+    return result
+
+
+def _sweep_2d(points: np.ndarray) -> np.ndarray:
+    # A point is dominated iff an earlier point has a second criterion no
+    # larger; the earliest point holding the running minimum dominates it
+    second = points[:, 1]
+    running_min = np.minimum.accumulate(second)
+    previous_min = np.concatenate(([np.inf], running_min[:-1]))
+    new_min = second < previous_min
+    holder = np.maximum.accumulate(np.where(new_min, np.arange(len(points)), 0))
+    return np.where(new_min, -1, np.concatenate(([-1], holder[:-1])))
+
+
+def _sweep_3d(points: np.ndarray) -> np.ndarray:
+    # Points come in lexicographic order, so every earlier point is no worse
+    # on the first criterion, and a point is dominated iff an earlier
+    # frontier point is no worse on the other two. A Fenwick tree over the
+    # ranks of the second criterion keeps the minimum third criterion (and
+    # its point) of the frontier points at or below each rank, so each query
+    # and insert takes O(log P) whatever the shape of the data.
+    ranks = (np.searchsorted(np.unique(points[:, 1]), points[:, 1]) + 1).tolist()
+    size = max(ranks, default=0)
+    tree_z = [math.inf] * (size + 1)
+    tree_id = [-1] * (size + 1)
+    dominators = np.full(len(points), -1)
+    for i, (rank, z) in enumerate(zip(ranks, points[:, 2].tolist())):
+        best, best_id, k = math.inf, -1, rank
+        while k:
+            if tree_z[k] < best:
+                best, best_id = tree_z[k], tree_id[k]
+            k &= k - 1
+        if best <= z:
+            dominators[i] = best_id
+            continue
+        k = rank
+        while k <= size:
+            if z < tree_z[k]:
+                tree_z[k], tree_id[k] = z, i
+            k += k & -k
+    return dominators
+
+
+def criteria_costs(results: Mapping[str, Mapping[str, Any]], snapshot: CatalogSnapshot, plan_type: str,
+                   criteria: Sequence[str]) -> Tuple[Tuple[str, ...], np.ndarray]:
+    """
+    Each plan's value for each of ``criteria``, one row per plan of
+    ``plan_type`` that has a result: annual premiums, worst-case exposure
+    (see worst_case_exposure), expected annual cost (calculate_costs
+    ``total_cost``) or out-of-pocket spending (``cumulative_cost``).
+
+    :return: ``(plan_ids, matrix)`` with ``matrix`` shaped ``(P, len(criteria))``.
+    :raises ValueError: for unknown criteria.
+    """
+    unknown = [criterion for criterion in criteria if criterion not in PARETO_CRITERIA]
+    if unknown:
+        raise ValueError(f"Unknown criterion {unknown[0]!r}; expected one of {', '.join(PARETO_CRITERIA)}")
+    rows, plan_ids = snapshot.result_rows(plan_type, results)
+    matrix = np.empty((len(plan_ids), len(criteria)))
+    if not plan_ids:
+        return plan_ids, matrix
+    arrays = snapshot.arrays[plan_type]
+    for column, criterion in enumerate(criteria):
+        if criterion == "premium":
+            matrix[:, column] = arrays.premium[rows] * 12
+        elif criterion == "worst_case":
+            matrix[:, column] = worst_case_exposure(arrays)[rows]
+        else:
+            key = "total_cost" if criterion == "expected_cost" else "cumulative_cost"
+            matrix[:, column] = [results[plan_id][key] for plan_id in plan_ids]
+    return plan_ids, matrix
+
+
+def pareto_frontier(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                    criteria: Sequence[str] = DEFAULT_PARETO_CRITERIA,
+                    results: Optional[Mapping[str, Mapping[str, Any]]] = None,
+                    snapshot: Optional[CatalogSnapshot] = None) -> Dict[str, Any]:
+    """
+    The plans no other plan beats on every one of ``criteria`` for a usage
+    scenario.
+
+    :param criteria: Two or three distinct PARETO_CRITERIA.
+    :param results: calculate_costs results for the scenario against
+        ``snapshot``; from cached_costs when omitted.
+    :return: ``{"frontier": [(plan_id, {criterion: value}), ...],
+        "dominated": {plan_id: dominating frontier plan_id}}``, with the
+        frontier ordered by the first criterion.
+    :raises ValueError: for unknown or repeated criteria or a count other than
+        two or three.
+    """
+    if len(set(criteria)) != len(criteria):
+        raise ValueError("Criteria must not repeat")
+    if snapshot is None:
+        snapshot = catalog.get()
+    if results is None:
+        results = cached_costs(user_input, tax_rate, plan_type, snapshot)
+
+    plan_ids, costs = criteria_costs(results, snapshot, plan_type, criteria)
+    dominators = skyline(costs)
+
+    frontier_rows = np.flatnonzero(dominators < 0)
+    frontier_rows = frontier_rows[np.lexsort(costs[frontier_rows].T[::-1])]
+    logger.debug("Pareto frontier over %s: %d of %d %s plans", ", ".join(criteria), len(frontier_rows),
+                 len(plan_ids), plan_type)
+    return {
+        "frontier": [
+            (plan_ids[row], {criterion: round(float(costs[row, c]), 2) for c, criterion in enumerate(criteria)})
+            for row in frontier_rows
+        ],
+        "dominated": {plan_ids[row]: plan_ids[dominator] for row, dominator in enumerate(dominators.tolist())
+                      if dominator >= 0},
+    }
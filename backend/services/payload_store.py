@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# "sqlite" (default) or "memory"
+PAYLOAD_STORE_BACKEND = os.environ.get("PAYLOAD_STORE_BACKEND", "sqlite")
+PAYLOAD_STORE_PATH = os.environ.get("PAYLOAD_STORE_PATH", os.path.join(BASE_DIR, "../data/user_payloads.sqlite3"))
+PAYLOAD_MAX_BYTES = int(os.environ.get("PAYLOAD_MAX_BYTES", str(256 * 1024)))
+PAYLOAD_TTL_SECONDS = float(os.environ.get("PAYLOAD_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# How often, at most, a store sweeps out expired payloads
+_PURGE_INTERVAL_SECONDS = 60.0
+
+
+class PayloadTooLarge(Exception):
+    """
+    Raised when a serialized payload exceeds the store's size cap.
+    """
+
+
+class PayloadStore(ABC):
+    """
+    Saved Data Input payloads keyed by session ID.
+
+    Payloads are serialized to JSON on save, rejected above ``max_bytes`` and
+    expire ``ttl`` seconds after their last save.
+    """
+
+    def __init__(self, max_bytes: int = PAYLOAD_MAX_BYTES, ttl: float = PAYLOAD_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._last_purge = 0.0
+
+    def save(self, session_id: str, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, separators=(",", ":"))
+        if len(body.encode()) > self.max_bytes:
+            raise PayloadTooLarge(f"Payload exceeds {self.max_bytes} bytes")
+        now = time.time()
+        self._write(session_id, body, now + self.ttl)
+        if now - self._last_purge >= _PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            self.purge_expired(now)
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        body = self._read(session_id, time.time())
+        return json.loads(body) if body is not None else None
+
+    @abstractmethod
+    def _write(self, session_id: str, body: str, expires_at: float) -> None:
+        """
+        Store ``body`` for ``session_id``, replacing any earlier payload.
+        """
+
+    @abstractmethod
+    def _read(self, session_id: str, now: float) -> Optional[str]:
+        """
+        :return: The stored body, or None if there is none or it expired
+            at or before ``now``.
+        """
+
+    @abstractmethod
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        Delete payloads expired at or before ``now`` (default: the current time).
+
+        :return: How many were deleted.
+        """
+
+
+class MemoryPayloadStore(PayloadStore):
+    """
+    Process-local store; payloads are lost on restart and not shared between
+    workers.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._payloads: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _write(self, session_id: str, body: str, expires_at: float) -> None:
+        with self._lock:
+            self._payloads[session_id] = (body, expires_at)
+
+    def _read(self, session_id: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._payloads.get(session_id)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0]
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._payloads.items() if expires_at <= now]
+            for key in expired:
+                del self._payloads[key]
+        return len(expired)
+
+
+class SQLitePayloadStore(PayloadStore):
+    """
+    SQLite store in WAL mode, shared by every worker on the host.
+
+    Each thread gets its own connection. A save is a single upsert in its own
+    transaction, so readers see either the old payload or the new one.
+    """
+
+    def __init__(self, path: str = PAYLOAD_STORE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS user_payloads ("
+                        " session_id TEXT PRIMARY KEY,"
+                        " body TEXT NOT NULL,"
+                        " expires_at REAL NOT NULL)"
+                    )
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS user_payloads_expires_at ON user_payloads (expires_at)"
+                    )
+                    self._schema_ready = True
+        return connection
+
+    def _write(self, session_id: str, body: str, expires_at: float) -> None:
+        self._connection().execute(
+            "INSERT INTO user_payloads (session_id, body, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET body = excluded.body, expires_at = excluded.expires_at",
+            (session_id, body, expires_at),
+        )
+
+    def _read(self, session_id: str, now: float) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT body FROM user_payloads WHERE session_id = ? AND expires_at > ?",
+            (session_id, now),
+        ).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        cursor = self._connection().execute("DELETE FROM user_payloads WHERE expires_at <= ?", (now,))
+        if cursor.rowcount:
+            logger.info("Purged %d expired user payloads", cursor.rowcount)
+        return cursor.rowcount
+
+
+def create_payload_store(backend: str = PAYLOAD_STORE_BACKEND) -> PayloadStore:
+    """
+    Build the payload store selected by PAYLOAD_STORE_BACKEND.
+    """
+    if backend == "sqlite":
+        return SQLitePayloadStore()
+    if backend == "memory":
+        return MemoryPayloadStore()
+    raise ValueError(f"Unknown payload store backend: {backend}")
+
+
+# Shared by the user-data endpoints in this process
+payload_store = create_payload_store()
@@ -0,0 +1,628 @@
+import csv
+import hashlib
+import io
+import logging
+import os
+import sys
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    from services.catalog_format import COMPILED_CATALOG_FILE, CatalogFile
+    from services.file_snapshot import ReloadableFile
+    from services.vectorized_engine import compile_plan_arrays
+except ImportError:
+    from backend.services.catalog_format import COMPILED_CATALOG_FILE, CatalogFile
+    from backend.services.file_snapshot import ReloadableFile
+    from backend.services.vectorized_engine import compile_plan_arrays
+
+logger = logging.getLogger(__name__)
+
+# Dynamically resolve the path to the data file
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# A .json path is read as an FEHB benefits document (see services.fehb_ingest)
+HEALTH_PLAN_FILE = os.environ.get("HEALTH_PLAN_FILE", os.path.join(BASE_DIR, "../data/health_plan_info.csv"))
+
+# CSV column for each service name the cost engine understands
+SERVICE_COLUMNS = {
+    "Primary Care": "Primary/Specialty Care - Primary Care Office Visit",
+    "Specialist": "Primary/Specialty Care - Specialist Office Visit",
+    "Emergency Care": "Emergency & Urgent Care - Emergency Care",
+    "Urgent Care": "Emergency & Urgent Care - Urgent Care",
+    "Accidental Injury": "Emergency & Urgent Care - Accidental Injuries",
+    "Inpatient Admission": "Surgery & Hospital Charges - Hospital Inpatient Cost",
+    "Room and Board": "Surgery & Hospital Charges - Room & Board Charges",
+    "Outpatient Surgery": "Surgery & Hospital Charges - Doctor Costs Outpatient Surgery",
+    "Outpatient Tests": "Surgery & Hospital Charges - Outpatient Tests",
+    "Simple Labs": "Lab, X-Ray & Other Diagnostic Tests - Simple Diagnostic Tests/Procedures",
+    "Complex Labs": "Lab, X-Ray & Other Diagnostic Tests - Complex Diagnostic Tests/Procedures",
+    "Medications Tier 0": "Prescription Drugs - Tier 0 Prescriptions",
+    "Medications Tier 1": "Prescription Drugs - Tier 1 Prescriptions",
+    "Medications Tier 2": "Prescription Drugs - Tier 2 Prescriptions",
+    "Medications Tier 3": "Prescription Drugs - Tier 3 Prescriptions",
+    "Medications Tier 4": "Prescription Drugs - Tier 4 Prescriptions",
+    "Medications Tier 5": "Prescription Drugs - Tier 5 Prescriptions",
+    "ABA": "Treatment, Devices, and Services - Applied Behavioral Analysis (ABA)",
+    "Chiropractic": "Treatment, Devices, and Services - Chiropractic",
+    "OT": "Treatment, Devices, and Services - Occupational Therapy",
+    "Speech Therapy": "Treatment, Devices, and Services - Speech Therapy",
+    "Physical Therapy": "Treatment, Devices, and Services - Physical Therapy",
+    "Infertility Services": "Treatment, Devices, and Services - Infertility Services",
+    "Hearing Services": "Treatment, Devices, and Services - Hearing Services",
+    "Maternity Care": "Treatment, Devices, and Services - Maternity Care - Hospital Stay",
+}
+
+# Fixed service order used by the compiled plan tables
+SERVICE_NAMES = tuple(SERVICE_COLUMNS)
+SERVICE_INDEX = {service: i for i, service in enumerate(SERVICE_NAMES)}
+# Extra coverage slot for services the plan file doesn't describe
+UNKNOWN_SERVICE = len(SERVICE_NAMES)
+
+ENROLLMENT_TYPES = ("Self", "Self Plus One", "Self & Family")
+
+# (deductible_applies, copay, coinsurance, coinsurance_max) used when a plan
+# has no coverage rule
+DEFAULT_COVERAGE = (True, 0.0, 0.0, float("inf"))
+
+
+def parse_cost(value: str) -> float:
+    """
+    Convert cost value to a float. Handles decimals, percentages, and whole numbers.
+    """
+    value = value.strip()
+    if value.endswith("%"):  # Percentage case
+        return float(value.strip("%")) / 100
+    try:
+        return float(value)  # Handle decimals and whole numbers
+    except ValueError:
+        raise ValueError(f"Invalid cost format: {value}")
+
+
+def parse_health_plans(text: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse the contents of health_plan_info.csv into a structured dictionary.
+
+    :param text: Raw CSV text.
+    :return: Dictionary with plan IDs as keys and plan details as values.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    plans = {}
+
+    for row in reader:
+        # Extract unique plan name as ID
+        plan_id = row["Short Name"]
+        hsa_pass_through = parse_cost(row["Premium Pass Through HSA/HRA Contribution"])
+
+        plans[plan_id] = {
+            "plan_name": plan_id,
+            "enrollment_type": row["Enrollment Type"],
+            "premium": parse_cost(row["2025 Monthly - Empl. Pays"]),
+            "deductible": parse_cost(row["Calendar Year Deductible"]),
+            "oop_max": float("inf"),  # Default to infinity if not provided
+            "hsa_hra_type": row["Services & Benefits - Type of Account"],
+            "hsa_contribution": hsa_pass_through,
+            "services": {
+                service: parse_cost(row[column])
+                for service, column in SERVICE_COLUMNS.items()
+            },
+            "hsa_pass_through": hsa_pass_through,
+        }
+
+    return plans
+
+
+class CompiledPlan(NamedTuple):
+    """
+    Fixed-order, lookup-free form of a plan used by the cost engine.
+
+    ``coverage`` holds one ``(deductible_applies, copay, coinsurance,
+    coinsurance_max)`` tuple per entry of SERVICE_NAMES, plus a trailing UNKNOWN_SERVICE slot.
+    ``hsa_pass_through`` is already zeroed for plans without an HSA.
+    """
+    plan_id: str
+    plan_name: str
+    premium: float
+    deductible: float
+    oop_max: float
+    has_hsa: bool
+    hsa_pass_through: float
+    coverage: Tuple[Tuple[bool, float, float, float], ...]
+
+
+def compile_coverage(raw: Any) -> Tuple[bool, float, float, float]:
+    """
+    Reduce a coverage rule to ``(deductible_applies, copay, coinsurance,
+    coinsurance_max)``.
+
+    Mirrors how calculate_service_cost reads a coverage dict: a positive copay
+    wins over coinsurance, so at most one of the two is non-zero afterwards.
+    ``coinsurance_max`` caps the coinsurance charged per event (infinite when
+    the rule has no cap). Anything that isn't a dict falls back to
+    DEFAULT_COVERAGE.
+    """
+    if not isinstance(raw, Mapping):
+        return DEFAULT_COVERAGE
+    copay = float(raw.get("copay", 0.0))
+    coinsurance = float(raw.get("coinsurance", 0.0))
+    if copay > 0:
+        coinsurance = 0.0
+    else:
+        copay = 0.0
+        coinsurance = coinsurance if coinsurance > 0 else 0.0
+    coinsurance_max = raw.get("coinsurance_max")
+    coinsurance_max = float("inf") if coinsurance_max is None else float(coinsurance_max)
+    return (bool(raw.get("deductible_applies", True)), copay, coinsurance, coinsurance_max)
+
+
+def compile_plan(plan_id: str, plan: Mapping[str, Any],
+                 interned: Optional[Dict[tuple, tuple]] = None) -> CompiledPlan:
+    """
+    Compile one parsed plan dict into a CompiledPlan.
+
+    Pass the same ``interned`` dict when compiling many plans so equal
+    coverage rules (and equal coverage tables) are stored once and shared.
+    """
+    has_hsa = plan.get("hsa_hra_type", "N/A") == "HSA"
+    services = plan.get("services", {})
+    if not isinstance(services, Mapping):
+        services = {}
+    coverage = tuple(compile_coverage(services.get(service)) for service in SERVICE_NAMES) + (DEFAULT_COVERAGE,)
+    if interned is not None:
+        coverage = tuple(interned.setdefault(rule, rule) for rule in coverage)
+        coverage = interned.setdefault(coverage, coverage)
+    return CompiledPlan(
+        plan_id=plan_id,
+        plan_name=plan.get("plan_name", plan_id),
+        premium=float(plan.get("premium", 0.0)),
+        deductible=float(plan.get("deductible", 0.0)),
+        oop_max=float(plan.get("oop_max", float("inf"))),
+        has_hsa=has_hsa,
+        hsa_pass_through=float(plan.get("hsa_pass_through", 0.0)) if has_hsa else 0.0,
+        coverage=coverage,
+    )
+
+
+def compile_plan_tables(plans: Mapping[str, Mapping[str, Any]]) -> Mapping[str, Tuple[CompiledPlan, ...]]:
+    """
+    Partition plans by enrollment type and compile each one.
+
+    The three standard enrollment types are always present (possibly empty);
+    any other enrollment type in the file gets its own partition.
+    """
+    tables: Dict[str, list] = {enrollment_type: [] for enrollment_type in ENROLLMENT_TYPES}
+    interned: Dict[tuple, tuple] = {}
+    for plan_id, plan in plans.items():
+        tables.setdefault(plan["enrollment_type"], []).append(compile_plan(plan_id, plan, interned))
+    return MappingProxyType({key: tuple(value) for key, value in tables.items()})
+
+
+# Top-level keys of a parsed plan, in the order parse_health_plans writes them
+PLAN_FIELDS = ("plan_name", "enrollment_type", "premium", "deductible", "oop_max", "hsa_hra_type",
+               "hsa_contribution", "services", "hsa_pass_through")
+# Extra keys of plans loaded with coverage rules and plan details (FEHB):
+# plan code, network, Medicare terms (see fehb_ingest.medicare_terms) and the
+# coverage rule of each service, which ``services`` reduces to one number
+PLAN_DETAIL_FIELDS = ("plan_code", "network", "medicare", "coverage")
+# PlanColumns attribute holding each scalar field
+_FIELD_COLUMNS = {
+    "plan_name": "plan_names",
+    "enrollment_type": "enrollment_types",
+    "premium": "premium",
+    "deductible": "deductible",
+    "oop_max": "oop_max",
+    "hsa_hra_type": "account_types",
+    "hsa_contribution": "hsa_pass_through",
+    "hsa_pass_through": "hsa_pass_through",
+}
+
+
+class PlanColumns:
+    """
+    Parsed plans stored column by column, in file order.
+
+    Strings (plan IDs, enrollment and account types) are interned, amounts are
+    NumPy arrays and the service values are one ``(P, len(SERVICE_NAMES))``
+    array, so a large catalog is a few dozen objects instead of a nested dict
+    per plan, and forked workers keep sharing its pages.
+
+    ``coverage`` is None for plans whose services are plain numbers (the CSV),
+    or a ``(P, len(SERVICE_NAMES) + 1, 4)`` array of compiled coverage rules
+    (see compile_coverage) when the plans came with them. ``details`` is then
+    each plan's read-only ``{field: value}`` for the other PLAN_DETAIL_FIELDS.
+    ``plan_names`` default to the plan IDs.
+    """
+
+    __slots__ = ("plan_ids", "plan_names", "enrollment_types", "account_types", "premium", "deductible",
+                 "oop_max", "hsa_pass_through", "services", "coverage", "details", "index")
+
+    def __init__(self, plan_ids: Sequence[str], enrollment_types: Sequence[str], account_types: Sequence[str],
+                 premium: np.ndarray, deductible: np.ndarray, oop_max: np.ndarray,
+                 hsa_pass_through: np.ndarray, services: np.ndarray, coverage: Optional[np.ndarray] = None,
+                 plan_names: Optional[Sequence[str]] = None,
+                 details: Optional[Sequence[Mapping[str, Any]]] = None):
+        self.plan_ids = tuple(sys.intern(plan_id) for plan_id in plan_ids)
+        self.plan_names = self.plan_ids if plan_names is None else tuple(plan_names)
+        self.enrollment_types = tuple(sys.intern(value) for value in enrollment_types)
+        self.account_types = tuple(sys.intern(value) for value in account_types)
+        self.premium = self._column(premium)
+        self.deductible = self._column(deductible)
+        self.oop_max = self._column(oop_max)
+        self.hsa_pass_through = self._column(hsa_pass_through)
+        self.services = self._column(services).reshape(len(self.plan_ids), len(SERVICE_NAMES))
+        self.coverage = None if coverage is None else self._column(coverage).reshape(
+            len(self.plan_ids), len(SERVICE_NAMES) + 1, len(DEFAULT_COVERAGE))
+        self.details = None if details is None else tuple(MappingProxyType(dict(values)) for values in details)
+        self.index = MappingProxyType({plan_id: row for row, plan_id in enumerate(self.plan_ids)})
+
+    @staticmethod
+    def _column(values) -> np.ndarray:
+        column = np.asarray(values, dtype=float)
+        if column.flags.writeable:
+            column.flags.writeable = False
+        return column
+
+    @classmethod
+    def from_plans(cls, plans: Mapping[str, Mapping[str, Any]]) -> "PlanColumns":
+        """
+        Columnize ``{plan_id: plan dict}`` as returned by parse_health_plans.
+
+        Coverage-rule dicts in ``services`` (as load_fehb_plans writes) are
+        compiled into ``coverage``; ``services`` then keeps the rule's copay,
+        or its coinsurance rate when there is no copay. Those plans keep their
+        PLAN_DETAIL_FIELDS in ``details``.
+        """
+        rows = list(plans.values())
+        coverage = details = None
+        if any(isinstance(value, Mapping) for plan in rows for value in plan["services"].values()):
+            coverage = [[compile_coverage(plan["services"].get(service)) for service in SERVICE_NAMES]
+                        + [DEFAULT_COVERAGE] for plan in rows]
+            details = [{field: plan.get(field) for field in PLAN_DETAIL_FIELDS if field != "coverage"}
+                       for plan in rows]
+        return cls(
+            plan_ids=list(plans),
+            enrollment_types=[plan["enrollment_type"] for plan in rows],
+            account_types=[plan["hsa_hra_type"] for plan in rows],
+            premium=[plan["premium"] for plan in rows],
+            deductible=[plan["deductible"] for plan in rows],
+            oop_max=[plan["oop_max"] for plan in rows],
+            hsa_pass_through=[plan["hsa_pass_through"] for plan in rows],
+            services=np.array([[_service_value(plan["services"].get(service)) for service in SERVICE_NAMES]
+                               for plan in rows], dtype=float).reshape(len(rows), len(SERVICE_NAMES)),
+            coverage=coverage,
+            plan_names=[plan.get("plan_name", plan_id) for plan_id, plan in plans.items()],
+            details=details,
+        )
+
+    @classmethod
+    def from_catalog_file(cls, catalog_file: CatalogFile) -> "PlanColumns":
+        """
+        Wrap a compiled catalog's columns without copying them.
+
+        :raises ValueError: if the file was compiled for another SERVICE_NAMES.
+        """
+        if catalog_file.service_names != SERVICE_NAMES:
+            raise ValueError("compiled catalog was built for a different list of services")
+        return cls(
+            plan_ids=catalog_file.plan_ids,
+            enrollment_types=catalog_file.enrollment_types,
+            account_types=catalog_file.account_types,
+            premium=catalog_file.premium,
+            deductible=catalog_file.deductible,
+            oop_max=catalog_file.oop_max,
+            hsa_pass_through=catalog_file.hsa_pass_through,
+            services=catalog_file.services,
+        )
+
+    def __len__(self) -> int:
+        return len(self.plan_ids)
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """
+        Keys of each plan: PLAN_FIELDS, plus PLAN_DETAIL_FIELDS with details.
+        """
+        return PLAN_FIELDS if self.details is None else PLAN_FIELDS + PLAN_DETAIL_FIELDS
+
+    def coverage_rules(self, row: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Coverage rule of each service of the plan in ``row``, with a null
+        ``coinsurance_max`` when coinsurance is uncapped.
+
+        :raises ValueError: for plans loaded without coverage rules.
+        """
+        if self.coverage is None:
+            raise ValueError("These plans were loaded without coverage rules")
+        return {
+            service: {
+                "deductible_applies": bool(applies),
+                "copay": copay,
+                "coinsurance": coinsurance,
+                "coinsurance_max": coinsurance_max if coinsurance_max != float("inf") else None,
+            }
+            for service, (applies, copay, coinsurance, coinsurance_max)
+            in zip(SERVICE_NAMES, self.coverage[row].tolist())
+        }
+
+    def detail(self, row: int, field: str) -> Any:
+        """
+        PLAN_DETAIL_FIELDS ``field`` of the plan in ``row``.
+        """
+        if self.details is None:
+            raise KeyError(field)
+        if field == "coverage":
+            return self.coverage_rules(row)
+        return self.details[row][field]
+
+    def to_dicts(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The plans as plain nested dicts, shaped like parse_health_plans output
+        (with ``fields`` as keys).
+        """
+        premium = self.premium.tolist()
+        deductible = self.deductible.tolist()
+        oop_max = self.oop_max.tolist()
+        hsa_pass_through = self.hsa_pass_through.tolist()
+        services = self.services.tolist()
+        details = self.fields[len(PLAN_FIELDS):]
+        return {
+            plan_id: {
+                "plan_name": self.plan_names[row],
+                "enrollment_type": self.enrollment_types[row],
+                "premium": premium[row],
+                "deductible": deductible[row],
+                "oop_max": oop_max[row],
+                "hsa_hra_type": self.account_types[row],
+                "hsa_contribution": hsa_pass_through[row],
+                "services": dict(zip(SERVICE_NAMES, services[row])),
+                "hsa_pass_through": hsa_pass_through[row],
+                **{field: self.detail(row, field) for field in details},
+            }
+            for row, plan_id in enumerate(self.plan_ids)
+        }
+
+
+def _service_value(raw: Any) -> float:
+    # The number PlanColumns.services keeps for a service value or coverage rule
+    if raw is None:
+        return 0.0
+    if isinstance(raw, Mapping):
+        copay = float(raw.get("copay", 0.0))
+        return copay if copay > 0 else float(raw.get("coinsurance", 0.0))
+    return float(raw)
+
+
+def compile_column_tables(columns: PlanColumns) -> Mapping[str, Tuple[CompiledPlan, ...]]:
+    """
+    compile_plan_tables for PlanColumns, reading the columns directly.
+
+    Without a ``coverage`` column the values are plain numbers, which carry no
+    coverage rule (see compile_coverage), so every plan shares one default
+    coverage table. Otherwise equal rules and tables are interned as in
+    compile_plan.
+    """
+    shared = (DEFAULT_COVERAGE,) * (len(SERVICE_NAMES) + 1)
+    coverages = [shared] * len(columns)
+    if columns.coverage is not None:
+        interned: Dict[tuple, tuple] = {}
+        for row, rules in enumerate(columns.coverage.tolist()):
+            table = tuple(interned.setdefault(rule, rule) for rule in (
+                (bool(applies), copay, coinsurance, coinsurance_max)
+                for applies, copay, coinsurance, coinsurance_max in rules))
+            coverages[row] = interned.setdefault(table, table)
+    premium = columns.premium.tolist()
+    deductible = columns.deductible.tolist()
+    oop_max = columns.oop_max.tolist()
+    hsa_pass_through = columns.hsa_pass_through.tolist()
+    tables: Dict[str, list] = {enrollment_type: [] for enrollment_type in ENROLLMENT_TYPES}
+    for row, plan_id in enumerate(columns.plan_ids):
+        has_hsa = columns.account_types[row] == "HSA"
+        tables.setdefault(columns.enrollment_types[row], []).append(CompiledPlan(
+            plan_id=plan_id,
+            plan_name=columns.plan_names[row],
+            premium=premium[row],
+            deductible=deductible[row],
+            oop_max=oop_max[row],
+            has_hsa=has_hsa,
+            hsa_pass_through=hsa_pass_through[row] if has_hsa else 0.0,
+            coverage=coverages[row],
+        ))
+    return MappingProxyType({key: tuple(value) for key, value in tables.items()})
+
+
+class PlanServices(Mapping):
+    """
+    Read-only ``{service: value}`` view of one row of PlanColumns.services.
+    """
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values: np.ndarray):
+        self._values = values
+
+    def __getitem__(self, service: str) -> float:
+        return float(self._values[SERVICE_INDEX[service]])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(SERVICE_NAMES)
+
+    def __len__(self) -> int:
+        return len(SERVICE_NAMES)
+
+
+class PlanRecord(Mapping):
+    """
+    Read-only view of one plan in PlanColumns with the keys of a parsed plan
+    dict (PlanColumns.fields). Values are read from the columns on access.
+    """
+
+    __slots__ = ("_columns", "_row")
+
+    def __init__(self, columns: PlanColumns, row: int):
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "services":
+            return PlanServices(self._columns.services[self._row])
+        if key in PLAN_DETAIL_FIELDS:
+            return self._columns.detail(self._row, key)
+        column = getattr(self._columns, _FIELD_COLUMNS[key])
+        value = column[self._row]
+        return float(value) if isinstance(value, np.floating) else value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns.fields)
+
+    def __len__(self) -> int:
+        return len(self._columns.fields)
+
+
+class PlanRecords(Mapping):
+    """
+    Read-only ``{plan_id: PlanRecord}`` mapping over PlanColumns, in file order.
+    """
+
+    __slots__ = ("columns",)
+
+    def __init__(self, columns: PlanColumns):
+        self.columns = columns
+
+    def __getitem__(self, plan_id: str) -> PlanRecord:
+        return PlanRecord(self.columns, self.columns.index[plan_id])
+
+    def __contains__(self, plan_id: object) -> bool:
+        return plan_id in self.columns.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columns.plan_ids)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+
+class CatalogSnapshot:
+    """
+    Immutable view of the plan catalog as of one load of the plan file.
+
+    ``plans`` reads like the ``{plan_id: plan dict}`` mapping parse_health_plans
+    returns but is backed by PlanColumns; ``tables`` and ``arrays`` are the
+    cost engine's compiled forms.
+    """
+
+    __slots__ = ("plans", "tables", "arrays", "version", "loaded_at")
+
+    def __init__(self, plans: Union[PlanColumns, Mapping[str, Mapping[str, Any]]], version: str,
+                 loaded_at: float):
+        if not isinstance(plans, PlanColumns):
+            plans = PlanColumns.from_plans(plans)
+        self.plans = PlanRecords(plans)
+        self.tables = compile_column_tables(plans)
+        self.arrays = MappingProxyType({
+            enrollment_type: compile_plan_arrays(plans)
+            for enrollment_type, plans in self.tables.items()
+        })
+        self.version = version
+        self.loaded_at = loaded_at
+
+    def result_rows(self, plan_type: str, results: Mapping[str, Any]) -> Tuple[np.ndarray, Tuple[str, ...]]:
+        """
+        Rows of ``arrays[plan_type]`` whose plans have an entry in ``results``
+        (e.g. calculate_costs results), and those plans' IDs.
+        """
+        plans = self.tables.get(plan_type, ())
+        rows = np.array([i for i, plan in enumerate(plans) if plan.plan_id in results], dtype=int)
+        return rows, tuple(plans[i].plan_id for i in rows)
+
+
+class PlanCatalog(ReloadableFile):
+    """
+    Process-wide plan catalog that parses the CSV once and re-parses it only
+    when the file's mtime/size changes *and* its content hash differs.
+
+    A current compiled catalog is memory-mapped instead of parsing the CSV
+    (see ReloadableFile); FEHB JSON files are always read directly.
+    """
+
+    description = "Health plan file"
+
+    def __init__(self, path: str = HEALTH_PLAN_FILE, compiled_path: Optional[str] = None):
+        super().__init__(path, compiled_path)
+        self.source: Optional[str] = None
+
+    @property
+    def loaded_at(self) -> Optional[float]:
+        return self._snapshot.loaded_at if self._snapshot else None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._snapshot.version if self._snapshot else None
+
+    def _read_fehb(self) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+        """
+        ``(version, plans)`` streamed from an FEHB JSON document.
+        """
+        # Imported here: fehb_ingest builds on this module's service columns
+        try:
+            from services.fehb_ingest import load_fehb_plans
+        except ImportError:
+            from backend.services.fehb_ingest import load_fehb_plans
+
+        digest = hashlib.sha256()
+        try:
+            plans = load_fehb_plans(self.path, digest=digest)
+        except FileNotFoundError:
+            raise RuntimeError(f"Health plan file not found: {self.path}")
+        except Exception as e:
+            raise RuntimeError(f"Error parsing health plans: {e}")
+        return digest.hexdigest(), plans
+
+    def _read(self, stamp) -> Tuple[str, Tuple[str, Any]]:
+        """
+        ``(version, (source, plans))``; for the CSV, ``plans`` is its raw
+        bytes, parsed only if the version changed.
+        """
+        if self.path.endswith(".json"):
+            # Compiled catalogs are built from the CSV and don't hold coverage
+            # rules. Streamed and parsed in one pass, so there's no raw text to keep
+            version, plans = self._read_fehb()
+            return version, ("fehb", plans)
+        version, raw = self._read_file(stamp)
+        compiled = self._read_compiled(
+            stamp, version, lambda catalog_file: (catalog_file.plans_path, catalog_file.plans_version),
+            lambda catalog_file: (catalog_file.plans_version,
+                                  ("compiled", PlanColumns.from_catalog_file(catalog_file))))
+        if compiled is not None:
+            return compiled
+        return version, ("csv", raw)
+
+    def _keep(self, data: Tuple[str, Any]) -> None:
+        self.source = data[0]
+
+    def _build(self, version: str, data: Tuple[str, Any]) -> CatalogSnapshot:
+        source, plans = data
+        if source == "csv":
+            try:
+                plans = parse_health_plans(plans.decode("utf-8-sig"))
+            except Exception as e:
+                raise RuntimeError(f"Error parsing health plans: {e}")
+        snapshot = CatalogSnapshot(plans, version, time.time())
+        self.source = source
+        return snapshot
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "path": os.path.normpath(self.path),
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reload_count": self.reload_count,
+            "source": self.source,
+            "plan_count": len(snapshot.plans) if snapshot else 0,
+        }
+
+
+# Shared by every handler in the process
+catalog = PlanCatalog(compiled_path=COMPILED_CATALOG_FILE)
@@ -0,0 +1,181 @@
+import logging
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from services.cost_calculator import layout_events, load_service_costs, plan_credits, user_financials
+    from services.plan_catalog import catalog, CatalogSnapshot
+    from services.vectorized_engine import PlanArrays, accumulate_payments, round_cents
+except ImportError:
+    from backend.services.cost_calculator import layout_events, load_service_costs, plan_credits, user_financials
+    from backend.services.plan_catalog import catalog, CatalogSnapshot
+    from backend.services.vectorized_engine import PlanArrays, accumulate_payments, round_cents
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_MAX_YEARS = 30
+
+# Largest years x plans x events array built in one pass
+_MAX_CELLS = 4_000_000
+
+# Per-year amounts reported for each plan, in response order
+PROJECTION_COLUMNS = ("premiums", "out_of_pocket", "tax_savings", "hsa_growth", "total_cost")
+
+
+def hsa_balance_terms(hsa_percent_spent: float, assumed_rate_of_return: float) -> Tuple[float, float, float]:
+    """
+    How a year of the monthly HSA model in hsa_growth_factor treats money
+    already in the account and the year's deposits.
+
+    With ``q = (1 - hsa_percent_spent / 12) * (1 + g)`` (``g`` the monthly
+    rate), a starting balance ``B`` and monthly deposit ``d`` end the year at
+    ``B * q**12 + d * (q + ... + q**12)`` and earn
+    ``g * (1 - hsa_percent_spent / 12) * B * (1 + q + ... + q**11)`` on top of
+    the deposits' own growth.
+
+    :return: ``(balance_kept, growth_per_balance, balance_per_deposit)``: the
+        factors ``q**12``, ``g * (1 - hsa_percent_spent / 12) * sum(q**j, j < 12)``
+        and ``sum(q**j, 1 <= j <= 12)``.
+    """
+    monthly_return_rate = (1 + assumed_rate_of_return) ** (1 / 12) - 1
+    kept = 1 - hsa_percent_spent / 12
+    q = kept * (1 + monthly_return_rate)
+    powers = q ** np.arange(13)
+    return float(powers[12]), float(monthly_return_rate * kept * powers[:12].sum()), float(powers[1:].sum())
+
+
+def project_out_of_pocket(arrays: PlanArrays, events: Sequence[Tuple[int, int, float]],
+                          cost_factors: np.ndarray) -> np.ndarray:
+    """
+    Capped out-of-pocket spending of each plan for the same events in several
+    years, with every event's cost scaled by that year's factor.
+
+    Out-of-pocket spending depends only on a plan's deductible, maximum and
+    coverage of the services used, and only on the year through its factor,
+    so each distinct set of terms is charged once per distinct factor. Those
+    are charged in one accumulate_payments pass per chunk of terms. Plan terms
+    stay the same every year.
+
+    :param cost_factors: Service cost multiplier per year, ``(Y,)``.
+    :return: ``(Y, P)`` out-of-pocket spending.
+    """
+    n_plans = len(arrays.premium)
+    if not events:
+        return np.zeros((len(cost_factors), n_plans))
+    _, service_indices, event_costs = zip(*events)
+    services, event_slots = np.unique(np.asarray(service_indices, dtype=int), return_inverse=True)
+    terms, plan_terms = np.unique(np.column_stack((
+        arrays.deductible, arrays.oop_max, arrays.deductible_applies[:, services], arrays.copay[:, services],
+        arrays.coinsurance[:, services], arrays.coinsurance_max[:, services],
+    )), axis=0, return_inverse=True)
+    deductible, oop_max = terms[:, 0], terms[:, 1]
+    deductible_applies, copay, coinsurance, coinsurance_max = (
+        coverage[:, event_slots] for coverage in np.split(terms[:, 2:], 4, axis=1))
+    factors, year_factors = np.unique(np.asarray(cost_factors, dtype=float), return_inverse=True)
+    event_cost = factors[:, None, None] * np.asarray(event_costs, dtype=float)
+
+    out_of_pocket = np.empty((len(factors), len(terms)))
+    chunk = max(1, _MAX_CELLS // (len(factors) * len(events)))
+    for start in range(0, len(terms), chunk):
+        rows = slice(start, start + chunk)
+        payments, _, _ = accumulate_payments(event_cost, deductible_applies[rows], copay[rows], coinsurance[rows],
+                                             deductible[rows], oop_max[rows], coinsurance_max[rows])
+        # Summed with cumsum, as _vectorized_costs does, so year 1 matches calculate_costs to the cent
+        out_of_pocket[:, rows] = np.minimum(np.cumsum(payments, axis=-1)[..., -1], oop_max[rows])
+    return out_of_pocket[year_factors.reshape(-1)][:, plan_terms.reshape(-1)]
+
+
+def project_costs(usage_by_year: Sequence[Dict[str, Any]], tax_rate: float, plan_type: str, years: int,
+                  premium_inflation: float = 0.0, service_inflation: float = 0.0,
+                  starting_hsa_balance: float = 0.0,
+                  financials: Optional[Tuple[float, float, float, float]] = None,
+                  snapshot: Optional[CatalogSnapshot] = None,
+                  service_costs: Optional[Mapping[str, float]] = None) -> Dict[str, Any]:
+    """
+    Year-by-year cost of each plan over ``years`` years.
+
+    Year ``y`` (from 0) uses ``usage_by_year[y]``, or the last entry once the
+    list runs out; premiums grow by ``premium_inflation`` and service costs
+    by ``service_inflation`` a year. Each year is costed like calculate_costs
+    (premiums plus out-of-pocket, less tax savings and HSA growth), except
+    that HSA plans start every year after the first with the balance left at
+    the end of the previous one, which keeps compounding. Years that share a
+    usage profile are costed together, for all plans at once.
+
+    :param financials: As returned by cost_calculator.user_financials;
+        read from ``usage_by_year[0]`` when omitted.
+    :param starting_hsa_balance: HSA balance at the start of the first year,
+        for HSA plans.
+    :return: ``{"years", "premium_inflation", "service_inflation", "plans":
+        {plan_id: {"plan_name", "years": {column: [per year]},
+        "hsa_balance": [at the end of each year], "cumulative_total_cost":
+        [total cost to the end of each year], "totals": {column: sum}}}}``.
+    :raises ValueError: for a year count outside 1..PROJECTION_MAX_YEARS or
+        no usage profiles.
+    """
+    if not 1 <= years <= PROJECTION_MAX_YEARS:
+        raise ValueError(f"Projections cover 1 to {PROJECTION_MAX_YEARS} years")
+    if not usage_by_year:
+        raise ValueError("At least one usage profile is required")
+    if snapshot is None:
+        snapshot = catalog.get()
+    if service_costs is None:
+        service_costs = load_service_costs()
+    if financials is None:
+        financials = user_financials(usage_by_year[0])
+    summary = {"years": years, "premium_inflation": premium_inflation, "service_inflation": service_inflation}
+    plans = snapshot.tables.get(plan_type, ())
+    if not plans:
+        return {**summary, "plans": {}}
+    arrays = snapshot.arrays[plan_type]
+
+    year_numbers = np.arange(years)
+    premiums = arrays.premium * 12 * ((1 + premium_inflation) ** year_numbers)[:, None]
+    out_of_pocket = np.empty((years, len(plans)))
+    profile_of_year = np.minimum(year_numbers, len(usage_by_year) - 1)
+    for profile in np.unique(profile_of_year).tolist():
+        profile_years = np.flatnonzero(profile_of_year == profile)
+        events = layout_events(usage_by_year[profile], service_costs)
+        out_of_pocket[profile_years] = project_out_of_pocket(
+            arrays, events, (1 + service_inflation) ** profile_years)
+
+    # Deposits earn the same every year; what carries over earns on top of that
+    assumed_rate_of_return, hsa_percent_spent = financials[0], financials[1]
+    hsa_contribution, tax_savings, deposit_growth = plan_credits(arrays, tax_rate, financials)
+    balance_kept, growth_per_balance, balance_per_deposit = hsa_balance_terms(hsa_percent_spent,
+                                                                              assumed_rate_of_return)
+    monthly_deposit = np.where(arrays.has_hsa, (hsa_contribution + arrays.hsa_pass_through) / 12, 0.0)
+    balance = np.where(arrays.has_hsa, float(starting_hsa_balance), 0.0)
+    hsa_growth = np.empty((years, len(plans)))
+    hsa_balance = np.empty((years, len(plans)))
+    for year in range(years):
+        hsa_growth[year] = deposit_growth + round_cents(growth_per_balance * balance)
+        balance = balance * balance_kept + monthly_deposit * balance_per_deposit
+        hsa_balance[year] = balance
+
+    tax_savings = np.broadcast_to(tax_savings, (years, len(plans)))
+    total_cost = premiums + out_of_pocket - tax_savings - hsa_growth
+    logger.debug("Projected %d %r plans over %d years (%d usage profiles)", len(plans), plan_type, years,
+                 min(years, len(usage_by_year)))
+
+    # Plan-major lists, one per column
+    values = dict(zip(PROJECTION_COLUMNS, (round_cents(column).T.tolist() for column in (
+        premiums, out_of_pocket, tax_savings, hsa_growth, total_cost))))
+    totals = dict(zip(PROJECTION_COLUMNS, (round_cents(column.sum(axis=0)).tolist() for column in (
+        premiums, out_of_pocket, tax_savings, hsa_growth, total_cost))))
+    balances = round_cents(hsa_balance).T.tolist()
+    cumulative = round_cents(np.cumsum(total_cost, axis=0)).T.tolist()
+    return {
+        **summary,
+        "plans": {
+            plan.plan_id: {
+                "plan_name": plan.plan_name,
+                "years": {column: values[column][row] for column in PROJECTION_COLUMNS},
+                "hsa_balance": balances[row],
+                "cumulative_total_cost": cumulative[row],
+                "totals": {column: totals[column][row] for column in PROJECTION_COLUMNS},
+            }
+            for row, plan in enumerate(plans)
+        },
+    }
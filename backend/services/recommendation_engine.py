@@ -1,114 +1,181 @@
-from fastapi import APIRouter
-from models import InputDetails
-from typing import List, Dict, Any
+import logging
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
 
-router = APIRouter()
+import numpy as np
 
-@router.post("/")
-def recommend_plan(input_details: InputDetails):
-    """
-    Recommend the best health plan based on user input.
+try:
+    from services.cost_calculator import worst_case_exposure
+    from services.plan_catalog import catalog, CatalogSnapshot
+    from services.result_cache import cached_costs
+except ImportError:
+    from backend.services.cost_calculator import worst_case_exposure
+    from backend.services.plan_catalog import catalog, CatalogSnapshot
+    from backend.services.result_cache import cached_costs
+
+logger = logging.getLogger(__name__)
+
+# Criteria every plan is scored on, in matrix column order
+CRITERIA = ("expected_cost", "worst_case", "tax_savings", "hsa_growth")
+# Criteria where a larger value is better; for the others smaller is better
+HIGHER_IS_BETTER = frozenset({"tax_savings", "hsa_growth"})
+DEFAULT_WEIGHTS = {criterion: 1.0 / len(CRITERIA) for criterion in CRITERIA}
+
+# Plans dominated_mask checks at once; bounds its temporary arrays to about
+# block x (block + frontier) x criteria booleans
+_DOMINANCE_BLOCK = 256
+
+
+def criteria_matrix(results: Mapping[str, Mapping[str, Any]], snapshot: CatalogSnapshot,
+                    plan_type: str) -> Tuple[Tuple[str, ...], np.ndarray]:
     """
-    user_data = input_details.user_data
-    medical_needs = input_details.medical_needs
+    Each plan's raw criteria, one row per plan of ``plan_type`` that has a
+    result: expected annual cost (calculate_costs ``total_cost``), worst-case
+    exposure (premiums plus the out-of-pocket maximum, see
+    worst_case_exposure), tax savings and HSA growth.
 
-    # Mock implementation of recommendations
-    recommendation = "Plan A is the best based on your inputs."
+    :return: ``(plan_ids, matrix)`` with ``matrix`` shaped ``(P, len(CRITERIA))``.
+    """
+    rows, plan_ids = snapshot.result_rows(plan_type, results)
+    if not plan_ids:
+        return plan_ids, np.empty((0, len(CRITERIA)))
+    matrix = np.empty((len(plan_ids), len(CRITERIA)))
+    # Columns in CRITERIA order
+    matrix[:, [0, 2, 3]] = [
+        (result["total_cost"], result["tax_savings"], result["hsa_growth"])
+        for result in map(results.__getitem__, plan_ids)
+    ]
+    matrix[:, 1] = worst_case_exposure(snapshot.arrays[plan_type])[rows]
+    return plan_ids, matrix
+
+
+def as_costs(matrix: np.ndarray, criteria: Sequence[str] = CRITERIA) -> np.ndarray:
+    """
+    ``matrix`` with every criterion turned into lower-is-better.
+    """
+    signs = np.array([-1.0 if criterion in HIGHER_IS_BETTER else 1.0 for criterion in criteria])
+    return matrix * signs
 
-    # Example response with received data echoed back
-    return {
-        "status": "success",
-        "recommendation": recommendation,
-        "data": {
-            "user_data": user_data,
-            "medical_needs": medical_needs
-        }
-    }
 
-def score_plans(
-    plan_costs: Dict[str, Any],
-    user_preferences: Dict[str, float]
-) -> List[Dict[str, Any]]:
+def dominated_mask(costs: np.ndarray) -> np.ndarray:
+    """
+    Which rows of a lower-is-better ``(P, C)`` matrix are Pareto-dominated:
+    some other row is no worse on every criterion and better on at least one.
     """
-    Rank health plans based on user-defined preferences and calculated costs.
+    dominated = np.ones(len(costs), dtype=bool)
+    # In lexicographic order every plan comes after anything dominating it,
+    # and a dominated plan is also dominated by some undominated one, so each
+    # block only needs checking against the frontier found so far and then
+    # against the rest of the block
+    order = np.lexsort(costs.T[::-1])
+    frontier = np.empty((0, costs.shape[1]))
+    for start in range(0, len(order), _DOMINANCE_BLOCK):
+        rows = order[start:start + _DOMINANCE_BLOCK]
+        rows = rows[~_dominates(frontier, costs[rows]).any(axis=0)]
+        block = costs[rows]
+        survivors = ~_dominates(block, block).any(axis=0)
+        frontier = np.concatenate((frontier, block[survivors]))
+        dominated[rows[survivors]] = False
+    return dominated
+
+
+def _dominates(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # (len(a), len(b)) matrix: whether row i of a dominates row j of b
+    a, b = a[:, None, :], b[None, :, :]
+    return (a <= b).all(axis=-1) & (a < b).any(axis=-1)
+
+
+def normalize_criteria(costs: np.ndarray) -> np.ndarray:
+    """
+    Min-max normalize each column of a lower-is-better matrix to ``[0, 1]``
+    with 1 for the best plan. A criterion on which all plans tie scores 1.
+    """
+    low = costs.min(axis=0, initial=np.inf)
+    span = costs.max(axis=0, initial=-np.inf) - low
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = (costs.max(axis=0, initial=-np.inf) - costs) / span
+    return np.where(span > 0, scores, 1.0)
+
 
-    :param plan_costs: Dictionary of plans with calculated costs and details.
-    :param user_preferences: Weights for preferences (cost, flexibility, risk, tax savings).
-    :return: List of plans ranked by their overall scores.
+def resolve_weights(preferences: Optional[Mapping[str, float]] = None) -> Dict[str, float]:
     """
-    # Default weights if user preferences are neutral
-    default_weights = {
-        "cost": 0.25,
-        "flexibility": 0.25,
-        "risk": 0.25,
-        "tax_savings": 0.25
-    }
+    Criterion weights from user preferences (missing criteria keep their
+    default weight), scaled to sum to 1.
 
-    # Merge default weights with user-defined preferences
-    weights = {**default_weights, **user_preferences}
-
-    scored_plans = []
-
-    for plan_id, plan_data in plan_costs.items():
-        # Extract necessary details
-        total_cost = plan_data["total_cost"]
-        tax_savings = plan_data["tax_savings"]
-        flexibility_score = plan_data.get("flexibility_score", 1.0)  # Placeholder
-        risk_score = plan_data.get("risk_score", 1.0)  # Placeholder
-
-        # Normalize cost and tax savings (lower cost and higher tax savings are better)
-        cost_score = 1 / (1 + total_cost)
-        tax_savings_score = tax_savings
-
-        # Calculate overall score
-        overall_score = (
-            weights["cost"] * cost_score +
-            weights["flexibility"] * flexibility_score +
-            weights["risk"] * risk_score +
-            weights["tax_savings"] * tax_savings_score
-        )
-
-        scored_plans.append({
-            "plan_id": plan_id,
-            "plan_name": plan_data["plan_name"],
-            "total_cost": total_cost,
-            "flexibility_score": flexibility_score,
-            "risk_score": risk_score,
-            "tax_savings": tax_savings,
-            "overall_score": overall_score
-        })
-
-    # Sort plans by overall score in descending order
-    scored_plans.sort(key=lambda x: x["overall_score"], reverse=True)
-
-    return scored_plans
-
-# Example Usage
-if __name__ == "__main__":
-    example_plan_costs = {
-        "plan_1": {
-            "plan_name": "Plan A",
-            "total_cost": 5000,
-            "tax_savings": 1200,
-            "flexibility_score": 0.8,
-            "risk_score": 0.9
-        },
-        "plan_2": {
-            "plan_name": "Plan B",
-            "total_cost": 4500,
-            "tax_savings": 1000,
-            "flexibility_score": 0.9,
-            "risk_score": 0.85
-        }
-    }
+    :raises ValueError: for unknown criteria, negative weights, or weights
+        that are all zero.
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    for criterion, weight in (preferences or {}).items():
+        if criterion not in weights:
+            raise ValueError(f"Unknown criterion {criterion!r}; expected one of {', '.join(CRITERIA)}")
+        if not weight >= 0:
+            raise ValueError(f"Weight for {criterion!r} must not be negative")
+        weights[criterion] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("At least one weight must be positive")
+    return {criterion: weight / total for criterion, weight in weights.items()}
+
+
+def score_plans(plan_ids: Sequence[str], matrix: np.ndarray,
+                weights: Mapping[str, float]) -> Dict[str, Any]:
+    """
+    Drop Pareto-dominated plans, then rank the rest by the weighted sum of
+    their min-max normalized criteria (normalized over the remaining plans).
 
-    user_preferences = {
-        "cost": 0.4,
-        "flexibility": 0.2,
-        "risk": 0.2,
-        "tax_savings": 0.2
+    :return: ``{"ranked": [(plan_id, score, normalized_row, raw_row), ...],
+        "dominated": [plan_id, ...]}`` with the best plan first.
+    """
+    costs = as_costs(matrix)
+    dominated = dominated_mask(costs)
+    keep = np.flatnonzero(~dominated)
+    normalized = normalize_criteria(costs[keep])
+    scores = normalized @ np.array([weights[criterion] for criterion in CRITERIA])
+    # Best score first; ties go to the lower expected cost, then file order
+    order = np.lexsort((keep, matrix[keep, 0], -scores))
+    ranked = [(plan_ids[keep[i]], float(scores[i]), normalized[i], matrix[keep[i]]) for i in order]
+    return {"ranked": ranked, "dominated": [plan_ids[i] for i in np.flatnonzero(dominated)]}
+
+
+def recommend_plans(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                    preferences: Optional[Mapping[str, float]] = None, top_n: Optional[int] = None,
+                    results: Optional[Mapping[str, Mapping[str, Any]]] = None,
+                    snapshot: Optional[CatalogSnapshot] = None) -> Dict[str, Any]:
+    """
+    Recommend plans for a usage scenario by multi-criteria scoring.
+
+    :param preferences: Weights per criterion (see resolve_weights).
+    :param results: calculate_costs results for the scenario against
+        ``snapshot``; from cached_costs when omitted.
+    :param top_n: Return only the best ``top_n`` recommendations.
+    :return: ``{"weights", "plan_count", "dominated", "recommendations"}``;
+        each recommendation has the plan ID and name, its rank and score, and
+        its raw and normalized criteria.
+    :raises ValueError: for invalid preferences.
+    """
+    weights = resolve_weights(preferences)
+    if snapshot is None:
+        snapshot = catalog.get()
+    if results is None:
+        results = cached_costs(user_input, tax_rate, plan_type, snapshot)
+
+    plan_ids, matrix = criteria_matrix(results, snapshot, plan_type)
+    scored = score_plans(plan_ids, matrix, weights)
+    ranked = scored["ranked"][:top_n] if top_n is not None else scored["ranked"]
+    logger.debug("Scored %d plans for %s; %d dominated", len(plan_ids), plan_type, len(scored["dominated"]))
+    return {
+        "weights": weights,
+        "plan_count": len(plan_ids),
+        "dominated": scored["dominated"],
+        "recommendations": [
+            {
+                "rank": rank,
+                "plan_id": plan_id,
+                "plan_name": results[plan_id]["plan_name"],
+                "score": round(score, 4),
+                "criteria": dict(zip(CRITERIA, np.round(raw, 2).tolist())),
+                "normalized": dict(zip(CRITERIA, np.round(normalized, 4).tolist())),
+            }
+            for rank, (plan_id, score, normalized, raw) in enumerate(ranked, 1)
+        ],
     }
-
-    ranked_plans = score_plans(example_plan_costs, user_preferences)
-    for plan in ranked_plans:
-        print(plan)
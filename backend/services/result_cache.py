@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    from metrics import span
+    from services import cost_calculator
+    from services.plan_catalog import catalog, CatalogSnapshot
+    from services.service_costs import service_cost_table, ServiceCostSnapshot
+except ImportError:
+    from backend.metrics import span
+    from backend.services import cost_calculator
+    from backend.services.plan_catalog import catalog, CatalogSnapshot
+    from backend.services.service_costs import service_cost_table, ServiceCostSnapshot
+
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "1024"))
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "300"))
+
+
+def _normalize(value: Any) -> Any:
+    """
+    Normalize a payload value so equivalent inputs serialize identically:
+    numbers become floats rounded to 6 places (with -0.0 folded into 0.0) and
+    a service's ``dates`` list is sorted.
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), 6) + 0.0
+    if isinstance(value, dict):
+        normalized = {str(key): _normalize(item) for key, item in value.items()}
+        if isinstance(normalized.get("dates"), list):
+            normalized["dates"] = sorted(normalized["dates"])
+        return normalized
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return str(value)
+
+
+def canonical_key(user_input: Dict[str, Any], tax_rate: float, plan_type: str, engine: str,
+                  catalog_version: str, service_costs_version: str) -> str:
+    """
+    SHA-256 of the canonicalized calculation inputs plus the data versions
+    they were evaluated against.
+    """
+    document = {
+        "user_input": _normalize(user_input),
+        "tax_rate": _normalize(tax_rate),
+        "plan_type": plan_type,
+        "engine": engine,
+        "catalog_version": catalog_version,
+        "service_costs_version": service_costs_version,
+    }
+    encoded = json.dumps(document, sort_keys=True, separators=(",", ":"), allow_nan=True)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def calculation_key(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                    engine: Optional[str] = None, snapshot: Optional[CatalogSnapshot] = None,
+                    service_costs: Optional[ServiceCostSnapshot] = None) -> str:
+    """
+    Cache key for a calculate_costs call against ``snapshot`` and
+    ``service_costs`` (default: the current plan catalog and service costs).
+    """
+    return canonical_key(
+        user_input, tax_rate, plan_type,
+        engine or cost_calculator.COST_ENGINE,
+        (snapshot or catalog.get()).version,
+        (service_costs or service_cost_table.get()).version,
+    )
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL for calculate_costs results.
+
+    Cached results are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl: float = RESULT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Drop every entry, e.g. because the plan data was reloaded.
+        """
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# Shared by the calculate endpoints in this process
+result_cache = ResultCache()
+catalog.add_reload_listener(lambda snapshot: result_cache.clear())
+service_cost_table.add_reload_listener(lambda snapshot: result_cache.clear())
+
+
+def cached_costs(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                 snapshot: Optional[CatalogSnapshot] = None) -> Dict[str, Any]:
+    """
+    calculate_costs results for a scenario against ``snapshot`` (default:
+    the current plan catalog) and the current service costs, from
+    result_cache when an identical calculation is cached and stored there
+    otherwise. The key and the calculation use the same service-cost
+    snapshot, so a reload in between can't file results under the wrong one.
+    """
+    if snapshot is None:
+        snapshot = catalog.get()
+    service_costs = service_cost_table.get()
+    with span("cache_lookup"):
+        cache_key = calculation_key(user_input, tax_rate, plan_type, snapshot=snapshot, service_costs=service_costs)
+        results = result_cache.get(cache_key)
+    if results is None:
+        with span("calculate_costs"):
+            results = cost_calculator.calculate_costs(user_input, tax_rate, plan_type, snapshot=snapshot,
+                                                      service_costs=service_costs.costs)
+        result_cache.put(cache_key, results)
+    return results
+
+
+async def cached_costs_async(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                             calculate: Callable[[Dict[str, float]], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Like cached_costs, but a miss awaits ``calculate(service_costs)`` (e.g. a
+    calculation in the worker pool) for the current catalog's results with
+    those service costs.
+    """
+    service_costs = service_cost_table.get()
+    cache_key = calculation_key(user_input, tax_rate, plan_type, service_costs=service_costs)
+    results = result_cache.get(cache_key)
+    if results is None:
+        results = await calculate(dict(service_costs.costs))
+        result_cache.put(cache_key, results)
+    return results
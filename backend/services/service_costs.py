@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+try:
+    from services.catalog_format import COMPILED_CATALOG_FILE
+    from services.file_snapshot import ReloadableFile
+    from services.plan_catalog import SERVICE_NAMES
+except ImportError:
+    from backend.services.catalog_format import COMPILED_CATALOG_FILE
+    from backend.services.file_snapshot import ReloadableFile
+    from backend.services.plan_catalog import SERVICE_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Dynamically resolve the path to the average service costs file
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_COSTS_FILE = os.path.join(BASE_DIR, "../data/service_costs.json")
+
+
+def validate_service_costs(data: Any) -> Tuple[Dict[str, float], List[str], List[str]]:
+    """
+    Check a decoded service_costs.json document.
+
+    :return: ``(costs, unknown_services, missing_services)`` where unknown
+        services aren't emitted by the plan parser and missing ones will be
+        costed at 0.
+    :raises ValueError: if the document isn't an object of non-negative numbers.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("service costs must be a JSON object")
+    costs = {}
+    for service, value in data.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"cost for {service!r} is not a number: {value!r}")
+        if value < 0 or value != value:
+            raise ValueError(f"cost for {service!r} must be a non-negative number: {value!r}")
+        costs[service] = float(value)
+    unknown = sorted(set(costs) - set(SERVICE_NAMES))
+    missing = [service for service in SERVICE_NAMES if service not in costs]
+    return costs, unknown, missing
+
+
+class ServiceCostSnapshot:
+    """
+    Immutable view of service_costs.json as of one load.
+    """
+
+    __slots__ = ("costs", "version", "loaded_at", "unknown_services", "missing_services")
+
+    def __init__(self, costs: Mapping[str, float], version: str, loaded_at: float,
+                 unknown_services: List[str], missing_services: List[str]):
+        self.costs = costs
+        self.version = version
+        self.loaded_at = loaded_at
+        self.unknown_services = tuple(unknown_services)
+        self.missing_services = tuple(missing_services)
+
+
+class ServiceCostTable(ReloadableFile):
+    """
+    Process-wide average service cost table, reloaded when the file changes.
+
+    A new file only replaces the current snapshot once it has been fully
+    parsed and validated; a file that fails validation is counted in
+    ``validation_failures`` and the previous snapshot stays in use. The costs
+    embedded in a compiled catalog are used while it is current (see
+    ReloadableFile).
+    """
+
+    description = "Service costs file"
+
+    def __init__(self, path: str = SERVICE_COSTS_FILE, compiled_path: Optional[str] = None):
+        super().__init__(path, compiled_path)
+        self.validation_failures = 0
+
+    def _read(self, stamp) -> Tuple[str, Callable[[], Any]]:
+        """
+        ``(version, decode)`` of the file to load, where ``decode()`` returns
+        the service cost document.
+        """
+        version, raw = self._read_file(stamp)
+        compiled = self._read_compiled(
+            stamp, version,
+            lambda catalog_file: (catalog_file.service_costs_path, catalog_file.service_costs_version),
+            lambda catalog_file: (catalog_file.service_costs_version, lambda: dict(catalog_file.service_costs)))
+        if compiled is not None:
+            return compiled
+        return version, lambda: json.loads(raw)
+
+    def _build(self, version: str, decode: Callable[[], Any]) -> Optional[ServiceCostSnapshot]:
+        try:
+            costs, unknown, missing = validate_service_costs(decode())
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            self.validation_failures += 1
+            if self._snapshot is None:
+                raise RuntimeError(f"Error loading service costs: {e}")
+            logger.error("Keeping previous service costs, %s is invalid: %s", self.path, e)
+            return None
+
+        if unknown:
+            logger.warning("Service costs for services no plan covers: %s", ", ".join(unknown))
+        if missing:
+            logger.warning("No average cost for %d services; they will cost 0", len(missing))
+        return ServiceCostSnapshot(MappingProxyType(costs), version, time.time(), unknown, missing)
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "path": os.path.normpath(self.path),
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reload_count": self.reload_count,
+            "validation_failures": self.validation_failures,
+            "unknown_services": list(snapshot.unknown_services) if snapshot else [],
+            "missing_services": list(snapshot.missing_services) if snapshot else [],
+        }
+
+
+# Shared by every handler in the process
+service_cost_table = ServiceCostTable(compiled_path=COMPILED_CATALOG_FILE)
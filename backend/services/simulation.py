@@ -0,0 +1,211 @@
+import logging
+import os
+import time
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+try:
+    from services.cost_calculator import NON_SERVICE_KEYS, load_service_costs, plan_credits, user_financials
+    from services.plan_catalog import catalog, CatalogSnapshot, SERVICE_INDEX, UNKNOWN_SERVICE
+    from services.vectorized_engine import PlanArrays, accumulate_payments, slice_plan_arrays
+except ImportError:
+    from backend.services.cost_calculator import NON_SERVICE_KEYS, load_service_costs, plan_credits, user_financials
+    from backend.services.plan_catalog import catalog, CatalogSnapshot, SERVICE_INDEX, UNKNOWN_SERVICE
+    from backend.services.vectorized_engine import PlanArrays, accumulate_payments, slice_plan_arrays
+
+logger = logging.getLogger(__name__)
+
+SIM_DEFAULT_SAMPLES = int(os.environ.get("SIM_DEFAULT_SAMPLES", "2000"))
+SIM_MAX_SAMPLES = int(os.environ.get("SIM_MAX_SAMPLES", "10000"))
+# Wall-clock budget per simulation; sampling stops early once it is spent
+SIM_TIME_BUDGET_SECONDS = float(os.environ.get("SIM_TIME_BUDGET_SECONDS", "2"))
+# Largest samples x plans x slots array built in one pass
+SIM_MAX_CELLS = int(os.environ.get("SIM_MAX_CELLS", "4000000"))
+# Largest samples x plans matrix of annual totals kept for the percentiles
+SIM_MAX_RESULT_CELLS = int(os.environ.get("SIM_MAX_RESULT_CELLS", "5000000"))
+
+DEFAULT_PERCENTILES = (5.0, 50.0, 95.0)
+# Plans per pass; small enough that a pass stays within SIM_MAX_CELLS
+_PLAN_CHUNK = 256
+
+
+def expected_frequencies(user_input: Dict[str, Any],
+                         overrides: Optional[Mapping[str, float]] = None) -> Dict[str, float]:
+    """
+    Expected events per year for each service: the number of dates (or the
+    ``count``) the user entered, replaced by any ``overrides``. Services with
+    no entered usage can be given a small frequency through ``overrides`` to
+    model unexpected events.
+    """
+    frequencies = {}
+    for service, details in user_input.items():
+        if service in NON_SERVICE_KEYS or not isinstance(details, dict):
+            continue
+        frequencies[service] = float(len(details.get("dates") or []) or details.get("count") or 0)
+    for service, frequency in (overrides or {}).items():
+        if frequency < 0:
+            raise ValueError(f"Frequency for {service!r} must not be negative")
+        frequencies[service] = float(frequency)
+    return {service: frequency for service, frequency in frequencies.items() if frequency > 0}
+
+
+def sample_annual_costs(arrays: PlanArrays, counts: np.ndarray, slot_services: np.ndarray,
+                        slot_costs: np.ndarray) -> np.ndarray:
+    """
+    Out-of-pocket cost of each sampled year for each plan.
+
+    Slots are ``(month, service)`` pairs in chronological order; all events
+    of a service within a month are charged as one event of ``count`` times
+    the service's cost, with ``count`` copays (and ``count`` times any
+    per-event coinsurance cap). That matches replaying them
+    one by one, apart from per-event rounding to the cent.
+
+    :param counts: Events per slot for each sample, ``(N, E)``.
+    :param slot_services: Coverage slot (service index) of each slot, ``(E,)``.
+    :param slot_costs: Average cost of one event in each slot, ``(E,)``.
+    :return: Amount paid per sample and plan, ``(N, P)``.
+    """
+    counts = np.asarray(counts, dtype=float)
+    if counts.shape[-1] == 0:
+        return np.zeros((counts.shape[0], len(arrays.premium)))
+    payments, _, _ = accumulate_payments(
+        (counts * slot_costs)[:, None, :],
+        arrays.deductible_applies[:, slot_services],
+        arrays.copay[:, slot_services] * counts[:, None, :],
+        arrays.coinsurance[:, slot_services],
+        arrays.deductible,
+        arrays.oop_max,
+        # Empty slots cost nothing either way; scaling by at least one keeps
+        # an uncapped (infinite) cap from turning into inf * 0 = nan
+        arrays.coinsurance_max[:, slot_services] * np.maximum(counts, 1.0)[:, None, :],
+    )
+    return payments.sum(axis=-1)
+
+
+def simulate_costs(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                   samples: int = SIM_DEFAULT_SAMPLES, seed: Optional[int] = None,
+                   percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                   frequencies: Optional[Mapping[str, float]] = None,
+                   time_budget: Optional[float] = None,
+                   snapshot: Optional[CatalogSnapshot] = None,
+                   service_costs: Optional[Mapping[str, float]] = None) -> Dict[str, Any]:
+    """
+    Monte Carlo distribution of each plan's annual cost.
+
+    Each sampled year draws a Poisson number of events per service and month
+    (mean: the service's expected annual frequency / 12), and every plan is
+    charged for them with the same deductible, copay, coinsurance and
+    out-of-pocket rules as calculate_costs. Annual cost is premiums plus
+    out-of-pocket spending, minus tax savings and HSA growth.
+
+    Sampling runs in batches and stops after ``time_budget`` seconds (at
+    least one batch always runs; ``truncated`` is then true). ``samples`` is
+    also capped up front so the samples x plans totals stay within
+    SIM_MAX_RESULT_CELLS (``capped`` is then true). Either way ``samples`` in
+    the result is lower than ``requested_samples``. The same seed and sample count give the same result;
+    without a seed one is drawn and returned.
+
+    :return: ``{"samples", "requested_samples", "seed", "capped",
+        "truncated", "elapsed_seconds", "frequencies", "plans"}`` with, per plan ID, the
+        mean, standard deviation and percentiles of the annual cost, the mean
+        out-of-pocket spending and the probability of reaching the
+        out-of-pocket maximum.
+    """
+    started = time.perf_counter()
+    budget = SIM_TIME_BUDGET_SECONDS if time_budget is None else min(time_budget, SIM_TIME_BUDGET_SECONDS)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2 ** 63))
+    rng = np.random.default_rng(seed)
+
+    if snapshot is None:
+        snapshot = catalog.get()
+    if service_costs is None:
+        service_costs = load_service_costs()
+    plans = snapshot.tables.get(plan_type, ())
+    frequencies = expected_frequencies(user_input, frequencies)
+    summary = {
+        "requested_samples": samples,
+        "seed": seed,
+        "frequencies": frequencies,
+    }
+    if not plans:
+        return {**summary, "samples": 0, "capped": False, "truncated": False, "elapsed_seconds": 0.0, "plans": {}}
+
+    arrays = snapshot.arrays[plan_type]
+    n_plans = len(plans)
+    requested = samples
+    samples = max(1, min(samples, SIM_MAX_SAMPLES, max(1, SIM_MAX_RESULT_CELLS // n_plans)))
+    capped = samples < requested
+
+    services = list(frequencies)
+    monthly_means = np.array([frequencies[service] / 12 for service in services])
+    service_slots = np.array([SERVICE_INDEX.get(service, UNKNOWN_SERVICE) for service in services], dtype=int)
+    service_cost = np.array([float(service_costs.get(service, 0.0)) for service in services])
+    # Month-major slot order: every service in January, then February, ...
+    slot_services = np.tile(service_slots, 12)
+    slot_costs = np.tile(service_cost, 12)
+    n_slots = len(slot_services)
+
+    plan_chunk = min(n_plans, _PLAN_CHUNK)
+    batch = max(1, SIM_MAX_CELLS // max(1, plan_chunk * n_slots))
+
+    out_of_pocket = np.empty((samples, n_plans))
+    done = 0
+    while done < samples:
+        n = min(batch, samples - done)
+        counts = rng.poisson(monthly_means, size=(n, 12, len(services))).reshape(n, n_slots)
+        for start in range(0, n_plans, plan_chunk):
+            chunk = slice_plan_arrays(arrays, start, start + plan_chunk)
+            out_of_pocket[done:done + n, start:start + plan_chunk] = sample_annual_costs(
+                chunk, counts, slot_services, slot_costs)
+        done += n
+        if time.perf_counter() - started > budget:
+            break
+
+    truncated = done < samples
+    out_of_pocket = out_of_pocket[:done]
+    _, tax_savings, hsa_growth = plan_credits(arrays, tax_rate, user_financials(user_input))
+    totals = arrays.premium * 12 - tax_savings - hsa_growth + out_of_pocket
+
+    oop_max = arrays.oop_max
+    finite = np.isfinite(oop_max)
+    hit_oop_max = np.where(finite, (out_of_pocket >= np.where(finite, oop_max, 0.0) - 0.005).mean(axis=0), 0.0)
+    percentile_values = np.percentile(totals, percentiles, axis=0) if len(percentiles) else np.empty((0, n_plans))
+
+    columns = zip(
+        plans,
+        totals.mean(axis=0).tolist(),
+        totals.std(axis=0).tolist(),
+        out_of_pocket.mean(axis=0).tolist(),
+        hit_oop_max.tolist(),
+        percentile_values.T.tolist(),
+    )
+    results = {
+        plan.plan_id: {
+            "plan_name": plan.plan_name,
+            "mean": round(mean, 2),
+            "std": round(std, 2),
+            "percentiles": {_percentile_label(p): round(value, 2) for p, value in zip(percentiles, values)},
+            "mean_out_of_pocket": round(oop, 2),
+            "oop_max_probability": round(hit, 4),
+        }
+        for plan, mean, std, oop, hit, values in columns
+    }
+    elapsed = time.perf_counter() - started
+    if capped:
+        logger.info("Simulation capped at %d of %d samples for %d plans", samples, requested, n_plans)
+    if truncated:
+        logger.info("Simulation stopped after %d of %d samples (%.2fs budget)", done, samples, budget)
+    return {
+        **summary,
+        "samples": done,
+        "capped": capped,
+        "truncated": truncated,
+        "elapsed_seconds": round(elapsed, 4),
+        "plans": results,
+    }
+
+
+def _percentile_label(p: float) -> str:
+    return f"p{p:g}"
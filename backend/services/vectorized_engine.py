@@ -0,0 +1,143 @@
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Largest difference in any amount (monthly spending or a total) between the
+# vectorized engine and the scalar reference, calculate_service_cost applied
+# event by event. Both charge each event in whole cents, but the scalar path
+# takes the unrounded charge off the out-of-pocket headroom and rounds what
+# is left, so an event whose charge lands on a half cent can move the
+# headroom a cent away from the sum of the rounded charges. That drift only
+# shifts the event that reaches the out-of-pocket maximum; over random
+# catalogs and years of up to 600 events it stays within 4 cents.
+SCALAR_PARITY_TOLERANCE = 0.05
+
+
+class PlanArrays(NamedTuple):
+    """
+    Column-wise view of one enrollment type's compiled plans.
+
+    Scalars are shaped ``(P,)``; coverage terms are ``(P, S)`` where ``S`` is
+    the number of coverage slots in each CompiledPlan (services + unknown).
+    """
+    premium: np.ndarray
+    deductible: np.ndarray
+    oop_max: np.ndarray
+    has_hsa: np.ndarray
+    hsa_pass_through: np.ndarray
+    deductible_applies: np.ndarray
+    copay: np.ndarray
+    coinsurance: np.ndarray
+    coinsurance_max: np.ndarray
+
+
+def compile_plan_arrays(plans: Sequence) -> PlanArrays:
+    """
+    Stack a sequence of CompiledPlan tuples into PlanArrays.
+
+    When every plan shares one coverage table (as plans compiled from the CSV
+    columns do), the coverage arrays are read-only broadcasts of it rather
+    than ``P`` copies.
+    """
+    if plans and all(plan.coverage is plans[0].coverage for plan in plans):
+        shared = np.array(plans[0].coverage, dtype=float)
+        coverage = np.broadcast_to(shared, (len(plans),) + shared.shape)
+    elif plans:
+        coverage = np.array([plan.coverage for plan in plans], dtype=float)
+    else:
+        coverage = np.zeros((0, 0, 4))
+    return PlanArrays(
+        premium=np.array([plan.premium for plan in plans], dtype=float),
+        deductible=np.array([plan.deductible for plan in plans], dtype=float),
+        oop_max=np.array([plan.oop_max for plan in plans], dtype=float),
+        has_hsa=np.array([plan.has_hsa for plan in plans], dtype=bool),
+        hsa_pass_through=np.array([plan.hsa_pass_through for plan in plans], dtype=float),
+        deductible_applies=coverage[:, :, 0],
+        copay=coverage[:, :, 1],
+        coinsurance=coverage[:, :, 2],
+        coinsurance_max=coverage[:, :, 3],
+    )
+
+
+def slice_plan_arrays(arrays: PlanArrays, start: int, stop: int) -> PlanArrays:
+    """
+    View of plans ``start:stop`` of ``arrays`` (no copy).
+    """
+    return PlanArrays(*(column[start:stop] for column in arrays))
+
+
+def take_plan_arrays(arrays: PlanArrays, indices: Sequence[int]) -> PlanArrays:
+    """
+    Copy of the plans at ``indices`` of ``arrays``, in that order.
+    """
+    indices = np.asarray(indices, dtype=int)
+    return PlanArrays(*(column[indices] for column in arrays))
+
+
+def round_cents(values: np.ndarray) -> np.ndarray:
+    """
+    Round to 2 decimals exactly like Python's ``round(value, 2)``.
+
+    ``np.round`` scales by 100 first, which can tip values such as 15.015
+    (stored as 15.01499...) the other way. Only the values that land on a
+    half-cent after scaling are re-rounded in Python.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    ties = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if ties.any():
+        rounded[ties] = [round(value, 2) for value in values[ties].tolist()]
+    return rounded
+
+
+def accumulate_payments(event_cost: np.ndarray, deductible_applies: np.ndarray,
+                        copay: np.ndarray, coinsurance: np.ndarray,
+                        deductible_remaining: np.ndarray,
+                        oop_remaining: np.ndarray,
+                        coinsurance_max: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Apply deductible, copay/coinsurance and the out-of-pocket cap to a run of
+    chronologically ordered events for many plans at once.
+
+    This is the array form of calling calculate_service_cost once per event:
+    running totals replace the per-event state, so the deductible share of each
+    event is the step in ``min(cumsum(charges), deductible)`` and the amount
+    paid is the step in ``min(cumsum(raw_costs), oop_remaining)``. Amounts are
+    rounded to the cent per event, as calculate_service_cost's results are,
+    so the totals agree with it within SCALAR_PARITY_TOLERANCE.
+
+    :param event_cost: Allowed charge per event, shape ``(..., 1 or P, E)``.
+    :param deductible_applies: 1.0 where the deductible applies, ``(P, E)``.
+    :param copay: Copay per event, ``(P, E)``.
+    :param coinsurance: Coinsurance rate per event, ``(P, E)``.
+    :param deductible_remaining: Starting deductible per plan, ``(..., P)``.
+    :param oop_remaining: Starting out-of-pocket headroom per plan, ``(..., P)``.
+    :param coinsurance_max: Cap on the coinsurance charged per event,
+        ``(P, E)``; no cap when omitted.
+    :return: ``(payments (..., P, E), deductible_remaining, oop_remaining)``.
+    """
+    deductible_remaining = np.asarray(deductible_remaining, dtype=float)
+    oop_remaining = np.asarray(oop_remaining, dtype=float)
+    shape = np.broadcast_shapes(np.shape(event_cost), np.shape(copay),
+                                deductible_remaining.shape + (1,))
+    if shape[-1] == 0:
+        return np.zeros(shape), deductible_remaining, oop_remaining
+
+    # The scalar path rounds the deductible left after every event, so it
+    # comes off in per-event amounts rounded to the cent; summing those (and
+    # rounding the running totals) also removes the drift cumsum/diff would add
+    charges = round_cents(np.cumsum(round_cents(event_cost * deductible_applies), axis=-1))
+    deductible_paid = np.minimum(charges, deductible_remaining[..., None])
+    deductible_applied = round_cents(np.diff(deductible_paid, axis=-1, prepend=0.0))
+
+    coinsurance_cost = coinsurance * (event_cost - deductible_applied)
+    if coinsurance_max is not None:
+        coinsurance_cost = np.minimum(coinsurance_cost, coinsurance_max)
+    raw = round_cents(deductible_applied + copay + coinsurance_cost)
+    paid = np.minimum(round_cents(np.cumsum(raw, axis=-1)), oop_remaining[..., None])
+    payments = round_cents(np.diff(paid, axis=-1, prepend=0.0))
+
+    return payments, deductible_remaining - deductible_paid[..., -1], oop_remaining - paid[..., -1]
+
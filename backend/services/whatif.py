@@ -0,0 +1,220 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+try:
+    from services.cost_calculator import (
+        MONTH_NAMES, NON_SERVICE_KEYS, layout_events, load_service_costs, user_financials, vectorized_results,
+    )
+    from services.plan_catalog import catalog, CatalogSnapshot
+    from services.result_cache import ResultCache, canonical_key
+    from services.service_costs import service_cost_table
+    from services.vectorized_engine import accumulate_payments
+except ImportError:
+    from backend.services.cost_calculator import (
+        MONTH_NAMES, NON_SERVICE_KEYS, layout_events, load_service_costs, user_financials, vectorized_results,
+    )
+    from backend.services.plan_catalog import catalog, CatalogSnapshot
+    from backend.services.result_cache import ResultCache, canonical_key
+    from backend.services.service_costs import service_cost_table
+    from backend.services.vectorized_engine import accumulate_payments
+
+logger = logging.getLogger(__name__)
+
+WHATIF_MAX_STATES = int(os.environ.get("WHATIF_MAX_STATES", "256"))
+WHATIF_TTL_SECONDS = float(os.environ.get("WHATIF_TTL_SECONDS", "1800"))
+
+Event = Tuple[int, int, float]
+
+
+class WhatIfState:
+    """
+    A costed scenario plus the per-plan accumulators at every month boundary.
+
+    ``deductible_remaining[:, m]`` and ``oop_remaining[:, m]`` are each plan's
+    state at the start of month ``m`` (column 12 is the end of the year), and
+    ``payments[:, m]`` is what the plan's member paid out of pocket in month
+    ``m``. A change to month ``m`` or later only has to replay from column
+    ``m``. States are shared through ``whatif_states`` and never mutated.
+    """
+
+    __slots__ = ("token", "user_input", "tax_rate", "plan_type", "snapshot", "service_costs",
+                 "service_costs_version", "events_by_month", "payments", "deductible_remaining", "oop_remaining")
+
+    def __init__(self, token: str, user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                 snapshot: CatalogSnapshot, service_costs: Mapping[str, float], service_costs_version: str,
+                 events_by_month: Tuple[Tuple[Event, ...], ...], payments: np.ndarray,
+                 deductible_remaining: np.ndarray, oop_remaining: np.ndarray):
+        self.token = token
+        self.user_input = user_input
+        self.tax_rate = tax_rate
+        self.plan_type = plan_type
+        self.snapshot = snapshot
+        self.service_costs = service_costs
+        self.service_costs_version = service_costs_version
+        self.events_by_month = events_by_month
+        self.payments = payments
+        self.deductible_remaining = deductible_remaining
+        self.oop_remaining = oop_remaining
+
+    def results(self) -> Dict[str, Any]:
+        """
+        The scenario's costs in the shape calculate_costs returns.
+        """
+        plans = self.snapshot.tables.get(self.plan_type, ())
+        if not plans:
+            return {}
+        arrays = self.snapshot.arrays[self.plan_type]
+        monthly_breakdown = arrays.premium[:, None] + self.payments
+        cumulative_cost = self.payments.sum(axis=1)
+        return vectorized_results(arrays, plans, monthly_breakdown, cumulative_cost, self.tax_rate,
+                                  user_financials(self.user_input))
+
+
+def events_by_month(events: List[Event]) -> Tuple[Tuple[Event, ...], ...]:
+    """
+    Split chronologically ordered events into one tuple per month.
+    """
+    months = [[] for _ in MONTH_NAMES]
+    for event in events:
+        months[event[0]].append(event)
+    return tuple(tuple(month) for month in months)
+
+
+def _replay(snapshot: CatalogSnapshot, plan_type: str, months: Tuple[Tuple[Event, ...], ...], start: int,
+            payments: np.ndarray, deductible_remaining: np.ndarray, oop_remaining: np.ndarray) -> None:
+    """
+    Recompute months ``start`` onwards in place, starting from the
+    checkpoints in column ``start``.
+    """
+    arrays = snapshot.arrays[plan_type]
+    for month in range(start, len(months)):
+        deductible_left = deductible_remaining[:, month]
+        oop_left = oop_remaining[:, month]
+        if months[month]:
+            _, service_indices, event_costs = zip(*months[month])
+            service_indices = np.asarray(service_indices, dtype=int)
+            paid, deductible_left, oop_left = accumulate_payments(
+                np.asarray(event_costs, dtype=float),
+                arrays.deductible_applies[:, service_indices],
+                arrays.copay[:, service_indices],
+                arrays.coinsurance[:, service_indices],
+                deductible_left,
+                oop_left,
+                arrays.coinsurance_max[:, service_indices],
+            )
+            payments[:, month] = paid.sum(axis=1)
+        else:
+            payments[:, month] = 0.0
+        deductible_remaining[:, month + 1] = deductible_left
+        oop_remaining[:, month + 1] = oop_left
+
+
+def costs_version(service_costs: Mapping[str, float]) -> str:
+    """
+    Content hash of the service costs a state was costed with, so states
+    built from different cost tables never share a token.
+    """
+    encoded = json.dumps({service: float(cost) for service, cost in service_costs.items()}, sort_keys=True)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _state_token(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                 snapshot: CatalogSnapshot, service_costs_id: str) -> str:
+    return canonical_key(user_input, tax_rate, plan_type, "whatif", snapshot.version, service_costs_id)
+
+
+def build_state(user_input: Dict[str, Any], tax_rate: float, plan_type: str,
+                snapshot: Optional[CatalogSnapshot] = None,
+                service_costs: Optional[Mapping[str, float]] = None) -> WhatIfState:
+    """
+    Cost a scenario month by month with the vectorized engine, keeping the
+    checkpoints a later what-if needs.
+    """
+    if snapshot is None:
+        snapshot = catalog.get()
+    if service_costs is None:
+        service_costs = load_service_costs()
+    user_input = copy.deepcopy(user_input)
+    months = events_by_month(layout_events(user_input, service_costs))
+    plans = snapshot.tables.get(plan_type, ())
+
+    n_plans = len(plans)
+    payments = np.zeros((n_plans, 12))
+    deductible_remaining = np.empty((n_plans, 13))
+    oop_remaining = np.empty((n_plans, 13))
+    if plans:
+        arrays = snapshot.arrays[plan_type]
+        deductible_remaining[:, 0] = arrays.deductible
+        oop_remaining[:, 0] = arrays.oop_max
+        _replay(snapshot, plan_type, months, 0, payments, deductible_remaining, oop_remaining)
+
+    version = costs_version(service_costs)
+    token = _state_token(user_input, tax_rate, plan_type, snapshot, version)
+    return WhatIfState(token, user_input, tax_rate, plan_type, snapshot, service_costs, version,
+                       months, payments, deductible_remaining, oop_remaining)
+
+
+def apply_delta(user_input: Dict[str, Any], add: Optional[Mapping[str, List[str]]] = None,
+                remove: Optional[Mapping[str, List[str]]] = None) -> Dict[str, Any]:
+    """
+    Copy of ``user_input`` with the dated events in ``add`` added and those in
+    ``remove`` taken out (one occurrence per listed date).
+
+    :raises ValueError: If a date to remove isn't in the scenario.
+    """
+    user_input = copy.deepcopy(user_input)
+    for service in {**(remove or {}), **(add or {})}:
+        if service in NON_SERVICE_KEYS:
+            raise ValueError(f"{service} is not a service")
+    for service, dates in (remove or {}).items():
+        if not dates:
+            continue
+        details = user_input.get(service)
+        existing = list(details.get("dates", [])) if isinstance(details, dict) else []
+        for date in dates:
+            if date not in existing:
+                raise ValueError(f"No {service} event on {date} to remove")
+            existing.remove(date)
+        details["dates"] = existing
+        details["count"] = len(existing)
+    for service, dates in (add or {}).items():
+        details = user_input.setdefault(service, {"service": [], "count": 0, "dates": []})
+        details["dates"] = list(details.get("dates", [])) + list(dates)
+        details["count"] = len(details["dates"])
+    return user_input
+
+
+def replay_state(base: WhatIfState, user_input: Dict[str, Any]) -> Tuple[WhatIfState, int]:
+    """
+    Cost ``user_input`` against ``base``'s data, replaying only from the
+    first month whose events differ.
+
+    :return: ``(new_state, first_replayed_month)``; the month is 12 when no
+        month changed and nothing was replayed.
+    """
+    months = events_by_month(layout_events(user_input, base.service_costs))
+    start = next((m for m, (old, new) in enumerate(zip(base.events_by_month, months)) if old != new), 12)
+
+    payments = base.payments.copy()
+    deductible_remaining = base.deductible_remaining.copy()
+    oop_remaining = base.oop_remaining.copy()
+    if start < 12 and len(payments):
+        _replay(base.snapshot, base.plan_type, months, start, payments, deductible_remaining, oop_remaining)
+    logger.debug("What-if replayed %d of 12 months", 12 - start)
+
+    token = _state_token(user_input, base.tax_rate, base.plan_type, base.snapshot, base.service_costs_version)
+    state = WhatIfState(token, user_input, base.tax_rate, base.plan_type, base.snapshot, base.service_costs,
+                        base.service_costs_version, months, payments, deductible_remaining, oop_remaining)
+    return state, start
+
+
+# Scenarios by token, so the next what-if can start from their checkpoints
+whatif_states = ResultCache(max_entries=WHATIF_MAX_STATES, ttl=WHATIF_TTL_SECONDS)
+catalog.add_reload_listener(lambda snapshot: whatif_states.clear())
+service_cost_table.add_reload_listener(lambda snapshot: whatif_states.clear())
@@ -0,0 +1,129 @@
+import csv
+import json
+
+import pytest
+
+from services.plan_catalog import SERVICE_COLUMNS
+
+SAMPLE_PLANS = [
+    # (short name, enrollment type, monthly premium, deductible, pass through, account type)
+    ("Blue Basic S", "Self", "150.25", "350", "0", "N/A"),
+    ("Blue Basic SO", "Self Plus One", "320.10", "700", "0", "N/A"),
+    ("Blue Basic SF", "Self & Family", "350.75", "700", "0", "N/A"),
+    ("Aetna HDHP S", "Self", "95.50", "1500", "1200", "HSA"),
+    ("Aetna HDHP SO", "Self Plus One", "210.00", "3000", "2400", "HSA"),
+    ("Aetna HDHP SF", "Self & Family", "230.40", "3000", "2400", "HSA"),
+    ("GEHA Standard S", "Self", "120.00", "0", "720", "HRA"),
+]
+
+SAMPLE_SERVICE_COSTS = {
+    "Primary Care": 150.0,
+    "Specialist": 275.5,
+    "Emergency Care": 2200.0,
+    "Urgent Care": 180.0,
+    "Simple Labs": 45.25,
+    "Medications Tier 1": 12.0,
+    "Medications Tier 2": 65.0,
+    "Physical Therapy": 120.0,
+}
+
+
+def write_plan_csv(path, plans=SAMPLE_PLANS):
+    """
+    Write a health_plan_info.csv-shaped file with the given plan rows.
+    """
+    header = [
+        "Short Name",
+        "Enrollment Type",
+        "2025 Monthly - Empl. Pays",
+        "Calendar Year Deductible",
+        "Premium Pass Through HSA/HRA Contribution",
+        "Services & Benefits - Type of Account",
+        *SERVICE_COLUMNS.values(),
+    ]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in plans:
+            writer.writerow([*row, *(["20%"] * len(SERVICE_COLUMNS))])
+    return path
+
+
+@pytest.fixture(autouse=True)
+def fresh_result_cache(monkeypatch):
+    """
+    Give every test an empty result cache (and what-if state store) so cached
+    responses never leak.
+    """
+    from routers import calculate
+    from services import result_cache
+    from services.result_cache import ResultCache
+
+    cache = ResultCache()
+    monkeypatch.setattr(result_cache, "result_cache", cache)
+    monkeypatch.setattr(calculate, "result_cache", cache)
+    monkeypatch.setattr(calculate, "whatif_states", ResultCache())
+    return cache
+
+
+@pytest.fixture
+def plan_csv(tmp_path):
+    return write_plan_csv(tmp_path / "health_plan_info.csv")
+
+
+@pytest.fixture
+def sample_catalog(plan_csv, monkeypatch):
+    """
+    Point the process-wide plan catalog at a temporary sample CSV.
+    """
+    from services import plan_catalog
+
+    monkeypatch.setattr(plan_catalog.catalog, "path", str(plan_csv))
+    monkeypatch.setattr(plan_catalog.catalog, "compiled_path", None)
+    monkeypatch.setattr(plan_catalog.catalog, "_snapshot", None)
+    monkeypatch.setattr(plan_catalog.catalog, "_file_stamp", None)
+    monkeypatch.setattr(plan_catalog.catalog, "reload_count", 0)
+    return plan_catalog.catalog
+
+
+@pytest.fixture
+def service_costs_file(tmp_path, monkeypatch):
+    """
+    Point the process-wide service cost table at a temporary JSON file.
+    """
+    from services.service_costs import service_cost_table
+
+    path = tmp_path / "service_costs.json"
+    path.write_text(json.dumps(SAMPLE_SERVICE_COSTS))
+    monkeypatch.setattr(service_cost_table, "path", str(path))
+    monkeypatch.setattr(service_cost_table, "compiled_path", None)
+    monkeypatch.setattr(service_cost_table, "_snapshot", None)
+    monkeypatch.setattr(service_cost_table, "_file_stamp", None)
+    monkeypatch.setattr(service_cost_table, "reload_count", 0)
+    monkeypatch.setattr(service_cost_table, "validation_failures", 0)
+    return path
+
+
+def make_payload(plan_type="Self", **usage):
+    """
+    Build a /api/calculate request body in the shape the frontend sends.
+    """
+    input_details = {
+        service: {"count": len(dates), "dates": dates}
+        for service, dates in (usage or {
+            "Primary Care": ["2025-01-15", "2025-06-01"],
+            "Emergency Care": ["2025-03-02"],
+        }).items()
+    }
+    return {
+        "userData": {
+            "planType": plan_type,
+            "income": 85000,
+            "taxRate": 22,
+            "assumedRateOfReturn": 0.05,
+            "hsa": {"contribution": 3000, "limit": 4150, "percentSpent": 0.5},
+            "fsa": {"contribution": 0, "limit": 3200},
+            "medicare": {"partBPremium": 0, "coveredPeople": 0},
+        },
+        "inputDetails": input_details,
+    }
@@ -0,0 +1,42 @@
+import csv
+import json
+
+from benchmarks import run
+from benchmarks.synthetic import USAGE_PROFILES, synthetic_payload, write_synthetic_catalog
+from services.plan_catalog import PlanCatalog, catalog
+from services.service_costs import service_cost_table
+
+
+def test_synthetic_catalog_parses(tmp_path):
+    path = write_synthetic_catalog(str(tmp_path / "plans.csv"), 30, seed=1)
+    with open(path, newline="") as f:
+        assert sum(1 for _ in csv.reader(f)) == 31
+    snapshot = PlanCatalog(path).get()
+    assert len(snapshot.plans) == 30
+    assert {len(plans) for plans in snapshot.tables.values()} == {10}
+
+
+def test_synthetic_payload_matches_profile():
+    payload = synthetic_payload("high_utilizer", seed=3)
+    events = sum(len(details["dates"]) for details in payload["inputDetails"].values())
+    assert events == sum(USAGE_PROFILES["high_utilizer"].values())
+    assert payload == synthetic_payload("high_utilizer", seed=3)
+
+
+def test_benchmark_run_writes_json(tmp_path):
+    paths = catalog.path, service_cost_table.path
+    output = tmp_path / "results.json"
+    run.main(["--plans", "6", "--profiles", "light", "--repeat", "2", "--budget", "0.01",
+              "--requests", "4", "--concurrency", "2", "--output", str(output)])
+    assert (catalog.path, service_cost_table.path) == paths
+
+    results = json.loads(output.read_text())
+    names = {entry["name"] for entry in results["micro"]}
+    assert "calculate_costs/vectorized/light/6" in names
+    # The streaming FEHB reader is compared with json.load on time and peak heap
+    fehb = {entry["name"]: entry for entry in results["micro"] if entry["name"].startswith("fehb_ingest/")}
+    assert set(fehb) == {"fehb_ingest/stream/6", "fehb_ingest/json_load/6"}
+    assert all(entry["peak_mb"] > 0 and entry["median_s"] > 0 for entry in fehb.values())
+    load, = results["load"]
+    assert load["requests"] == 4
+    assert load["p50_ms"] <= load["p99_ms"]
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.break_even import break_even
+from services.cost_curves import evaluate_curves
+from services.plan_catalog import CatalogSnapshot, SERVICE_NAMES
+from tests.conftest import make_payload
+
+client = TestClient(app)
+
+FINANCIALS = (0.05, 0.5, 2000.0, 1000.0)
+
+
+def random_snapshot(seed, n_plans=12):
+    rng = np.random.default_rng(seed)
+    plans = {}
+    for i in range(n_plans):
+        rule = {"copay": 0.0, "coinsurance": float(rng.choice([0.0, 0.1, 0.2, 0.3])),
+                "deductible_applies": bool(rng.random() < 0.8)}
+        plans[f"Plan {i}"] = {
+            "plan_name": f"Plan {i}", "enrollment_type": "Self",
+            "premium": float(rng.uniform(50, 600)), "deductible": float(rng.choice([0.0, 500.0, 1500.0, 3000.0])),
+            "oop_max": float(rng.choice([3000.0, 6000.0, 9000.0, np.inf])),
+            "hsa_hra_type": str(rng.choice(["HSA", "HRA", "N/A"])), "hsa_contribution": 0.0,
+            "hsa_pass_through": float(rng.choice([0.0, 750.0, 1500.0])),
+            "services": dict.fromkeys(SERVICE_NAMES, rule),
+        }
+    return CatalogSnapshot(plans, f"random-{seed}", 0.0)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matrix_matches_sampled_curves(seed):
+    snapshot = random_snapshot(seed)
+    result = break_even(0.22, "Self", FINANCIALS, snapshot=snapshot)
+    levels = np.linspace(0.0, 80000.0, 16001)
+    totals = evaluate_curves(levels.tolist(), 0.22, "Self", FINANCIALS, snapshot=snapshot)["plans"]
+    plans = result["plans"]
+    for i, plan_a in enumerate(plans):
+        assert result["matrix"][i][i] == []
+        for j, plan_b in enumerate(plans[i + 1:], i + 1):
+            assert result["matrix"][i][j] == result["matrix"][j][i]
+            difference = np.array(totals[plan_b]["total_cost"]) - np.array(totals[plan_a]["total_cost"])
+            signs = np.sign(np.where(np.abs(difference) < 0.02, 0.0, difference))
+            signs = signs[signs != 0]
+            expected = np.count_nonzero(signs[1:] != signs[:-1])
+            sampled = [level for level in result["matrix"][i][j] if level < levels[-1]]
+            assert len(sampled) == expected, (plan_a, plan_b)
+            for level in sampled:
+                at = np.interp(level, levels, difference)
+                assert abs(at) < 1.0
+
+
+def test_break_even_against_reference():
+    # A: $1,200/year premiums, $1,000 deductible then 20% to a $3,000 cap.
+    # B: $3,600/year premiums and 10% from the first dollar, no cap
+    rule = {"copay": 0.0, "coinsurance": 0.2, "deductible_applies": True}
+    base = {"enrollment_type": "Self", "hsa_hra_type": "N/A", "hsa_contribution": 0.0, "hsa_pass_through": 0.0}
+    plans = {
+        "A": {**base, "plan_name": "A", "premium": 100.0, "deductible": 1000.0, "oop_max": 3000.0,
+              "services": dict.fromkeys(SERVICE_NAMES, rule)},
+        "B": {**base, "plan_name": "B", "premium": 300.0, "deductible": 0.0, "oop_max": float("inf"),
+              "services": dict.fromkeys(SERVICE_NAMES, {**rule, "coinsurance": 0.1})},
+    }
+    snapshot = CatalogSnapshot(plans, "ab", 0.0)
+    result = break_even(0.0, "Self", (0.0, 1.0, 0.0, 0.0), reference="A", snapshot=snapshot)
+    assert result["plans"] == ["A", "B"]
+    assert result["fixed_costs"] == [1200.0, 3600.0]
+    # A tops out at 4200 when it hits its cap at x = 11000, where B already
+    # costs 4700, so B is never cheaper
+    assert result["break_even"] == [[], []]
+
+    plans["B"]["premium"] = 110.0
+    result = break_even(0.0, "Self", (0.0, 1.0, 0.0, 0.0), reference="A", snapshot=CatalogSnapshot(plans, "ab2", 0.0))
+    # B: 1320 + 0.1x. A: 1200 + x to 1000, then 2200 + 0.2(x - 1000) to the
+    # cap of 4200 at 11000. Equal at x = 133.33 (A cheaper below) and again
+    # at 28800 (B cheaper in between)
+    assert result["break_even"][1] == [133.33, 28800.0]
+
+
+def test_break_even_endpoint(sample_catalog, service_costs_file):
+    response = client.post("/api/calculate/break-even", json=make_payload())
+    assert response.status_code == 200
+    body = response.json()
+    assert body["plans"] == ["Blue Basic S", "Aetna HDHP S", "GEHA Standard S"]
+    assert len(body["matrix"]) == 3
+
+    response = client.post("/api/calculate/break-even", json={**make_payload(), "reference": "Blue Basic S",
+                                                              "plan_ids": ["Aetna HDHP S"]})
+    assert response.status_code == 200
+    assert list(response.json()) == ["message", "service", "plans", "fixed_costs", "reference", "break_even"]
+
+
+@pytest.mark.parametrize("body", [{"reference": "Nope"}, {"plan_ids": ["Nope"]}, {"service": "Teleportation"}])
+def test_break_even_endpoint_rejects_unknown_names(sample_catalog, service_costs_file, body):
+    response = client.post("/api/calculate/break-even", json={**make_payload(), **body})
+    assert response.status_code == 422
+
+
+def test_matrix_size_is_bounded(sample_catalog, service_costs_file, monkeypatch):
+    from services import break_even as module
+
+    monkeypatch.setattr(module, "BREAKEVEN_MAX_PLANS", 2)
+    response = client.post("/api/calculate/break-even", json=make_payload())
+    assert response.status_code == 422
@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from main import app
 
@@ -40,3 +41,313 @@ def test_calculate():
     response = client.post("/api/calculate", json=data)
     assert response.status_code == 200
     assert response.json()["status"] == "success"
+
+
+USAGE = {
+    "Primary Care": {"count": 3, "dates": ["2025-05-01", "2025-01-15", "2025-09-01"]},
+    "Emergency Care": {"count": 1, "dates": ["2025-03-02"]},
+    "Medications Tier 1": {"count": 12, "dates": [f"2025-{m:02d}-10" for m in range(1, 13)]},
+    "Dental Cleaning": {"count": 1, "dates": ["2025-02-01"]},
+}
+
+
+def test_plan_tables_partition_by_enrollment_type(sample_catalog):
+    tables = sample_catalog.get().tables
+    assert set(tables) == {"Self", "Self Plus One", "Self & Family"}
+    assert [plan.plan_id for plan in tables["Self"]] == ["Blue Basic S", "Aetna HDHP S", "GEHA Standard S"]
+    hdhp = tables["Self"][1]
+    assert hdhp.has_hsa and hdhp.hsa_pass_through == 1200.0
+    assert not tables["Self"][2].has_hsa and tables["Self"][2].hsa_pass_through == 0.0
+
+
+def test_layout_events_is_chronological():
+    from services.cost_calculator import layout_events
+    from services.plan_catalog import SERVICE_INDEX, UNKNOWN_SERVICE
+
+    events = layout_events(USAGE, {"Primary Care": 150.0})
+    assert len(events) == 17
+    assert events[0] == (0, SERVICE_INDEX["Medications Tier 1"], 0.0)
+    assert events[1] == (0, SERVICE_INDEX["Primary Care"], 150.0)
+    assert events[2] == (1, UNKNOWN_SERVICE, 0.0)
+
+
+def test_layout_events_does_not_depend_on_service_order():
+    from services.cost_calculator import layout_events
+
+    costs = {"Primary Care": 150.0, "Emergency Care": 900.0}
+    usage = {"Primary Care": {"dates": ["2025-03-02"]}, "Emergency Care": {"dates": ["2025-03-02"]},
+             "Massage": {"dates": ["2025-03-02"]}, "Acupuncture": {"dates": ["2025-03-02"]}}
+    reordered = dict(reversed(list(usage.items())))
+    assert layout_events(usage, costs) == layout_events(reordered, costs)
+
+
+def test_calculate_costs_matches_per_service_reference(sample_catalog, service_costs_file):
+    from services.cost_calculator import (
+        calculate_costs, calculate_service_cost, layout_events, load_service_costs,
+    )
+    from services.plan_catalog import SERVICE_NAMES
+
+    results = calculate_costs(USAGE, tax_rate=0.22, plan_type="Self")
+    assert set(results) == {"Blue Basic S", "Aetna HDHP S", "GEHA Standard S"}
+
+    service_names = SERVICE_NAMES + ("unknown",)
+    events = layout_events(USAGE, load_service_costs())
+    for plan_id, plan in sample_catalog.get().plans.items():
+        if plan["enrollment_type"] != "Self":
+            continue
+        deductible_remaining, oop_remaining = plan["deductible"], plan["oop_max"]
+        monthly = [plan["premium"]] * 12
+        for month, service_index, cost in events:
+            coverage = plan["services"].get(service_names[service_index], {})
+            if not isinstance(coverage, dict):
+                coverage = {}
+            user_pays, deductible_remaining, oop_remaining, _ = calculate_service_cost(
+                cost, 1, coverage, deductible_remaining, oop_remaining
+            )
+            monthly[month] += user_pays
+        assert list(results[plan_id]["monthly_breakdown"].values()) == monthly
+
+
+def _hsa_growth_by_month(contribution, pass_through, percent_spent, rate):
+    balance = growth = 0.0
+    for _ in range(12):
+        balance += (contribution + pass_through) / 12
+        balance -= balance * (percent_spent / 12)
+        gain = balance * ((1 + rate) ** (1 / 12) - 1)
+        balance += gain
+        growth += gain
+    return round(growth, 2)
+
+
+def test_hsa_growth_closed_form_matches_monthly_loop():
+    import numpy as np
+    from services.cost_calculator import calculate_hsa_growth
+
+    cases = [
+        (contribution, pass_through, percent_spent, rate)
+        for contribution in (0.0, 1500.0, 4150.0)
+        for pass_through in (0.0, 750.0, 1200.0)
+        for percent_spent in (0.0, 0.25, 1.0)
+        for rate in (0.0, 0.05, 0.12)
+    ]
+    for case in cases:
+        assert calculate_hsa_growth(*case) == pytest.approx(_hsa_growth_by_month(*case), abs=0.01)
+
+    contributions, pass_throughs, percents, rates = (np.array(column) for column in zip(*cases))
+    growth = calculate_hsa_growth(contributions, pass_throughs, percents, rates)
+    assert isinstance(growth, np.ndarray)
+    np.testing.assert_allclose(growth, [_hsa_growth_by_month(*case) for case in cases], atol=0.01)
+
+
+def test_hsa_growth_is_memoized():
+    from services.cost_calculator import _cached_hsa_growth, calculate_hsa_growth
+
+    calculate_hsa_growth(2000.0, 1000.0, 0.5, 0.07)
+    hits = _cached_hsa_growth.cache_info().hits
+    calculate_hsa_growth(2000, 1000, 0.5, 0.07)
+    assert _cached_hsa_growth.cache_info().hits == hits + 1
+
+
+def test_calculate_endpoint_with_frontend_payload(sample_catalog, service_costs_file):
+    from tests.conftest import make_payload
+
+    response = client.post("/api/calculate", json=make_payload())
+    assert response.status_code == 200
+    plans = response.json()["plans"]
+    assert set(plans) == {"Blue Basic S", "Aetna HDHP S", "GEHA Standard S"}
+    assert plans["Blue Basic S"]["monthly_breakdown"]["Jan"] == 150.25 + 150.0
+
+
+def test_calculate_streams_ndjson_and_sse(sample_catalog, service_costs_file):
+    import json
+    from tests.conftest import make_payload
+
+    expected = client.post("/api/calculate", json=make_payload()).json()["plans"]
+
+    for cached in (True, False):
+        if not cached:
+            from routers import calculate
+            calculate.result_cache.clear()
+        response = client.post("/api/calculate?stream=true", json=make_payload())
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        *lines, done = [json.loads(line) for line in response.text.splitlines()]
+        assert {line["plan_id"]: line["plan"] for line in lines} == expected
+        assert done == {"message": "Cost calculation successful", "count": len(expected)}
+
+    response = client.post("/api/calculate?stream=true", json=make_payload(),
+                           headers={"Accept": "text/event-stream"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [event for event, _ in events] == ["event: plan"] * len(expected) + ["event: done"]
+    first = json.loads(events[0][1][len("data: "):])
+    assert first["plan"] == expected[first["plan_id"]]
+
+
+def test_calculate_top_k(sample_catalog, service_costs_file):
+    from tests.conftest import make_payload
+
+    full = client.post("/api/calculate", json=make_payload()).json()["plans"]
+    cheapest = sorted(full, key=lambda plan_id: full[plan_id]["annual_cost"])
+
+    body = client.post("/api/calculate?top_k=2", json=make_payload()).json()
+    assert list(body["plans"]) == cheapest[:2]
+    assert body["plans"][cheapest[0]] == full[cheapest[0]]
+    assert body["ranking"]["sort_by"] == "total_cost"
+    assert body["ranking"]["plans_considered"] == 3
+
+    body = client.post("/api/calculate?sort_by=worst_case", json=make_payload()).json()
+    assert list(body["plans"]) == ["GEHA Standard S", "Blue Basic S", "Aetna HDHP S"]
+
+    assert client.post("/api/calculate?top_k=0", json=make_payload()).status_code == 422
+    assert client.post("/api/calculate?sort_by=name", json=make_payload()).status_code == 422
+
+
+def test_async_calculate_matches_sync_in_process_pool(sample_catalog, service_costs_file, monkeypatch):
+    from routers import calculate
+    from services.calculation_pool import CalculationPool
+    from tests.conftest import make_payload
+
+    pool = CalculationPool(workers=1, max_pending=2, timeout=30)
+    monkeypatch.setattr(calculate, "calculation_pool", pool)
+    try:
+        response = client.post("/api/calculate/async", json=make_payload())
+    finally:
+        pool.shutdown()
+    assert response.status_code == 200
+    assert response.json() == client.post("/api/calculate", json=make_payload()).json()
+
+
+def test_async_calculate_returns_503_when_saturated(sample_catalog, service_costs_file, monkeypatch):
+    from routers import calculate
+    from services.calculation_pool import CalculationPool
+    from tests.conftest import make_payload
+
+    monkeypatch.setattr(calculate, "calculation_pool", CalculationPool(workers=0, max_pending=0))
+    response = client.post("/api/calculate/async", json=make_payload())
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_async_calculate_times_out(sample_catalog, service_costs_file, monkeypatch):
+    import time
+    from routers import calculate
+    from services.calculation_pool import CalculationPool
+    from tests.conftest import make_payload
+
+    monkeypatch.setattr(calculate, "calculation_pool", CalculationPool(workers=0, max_pending=1, timeout=0.05))
+    monkeypatch.setattr(calculate, "run_calculation", lambda *args: time.sleep(0.5))
+    response = client.post("/api/calculate/async", json=make_payload())
+    assert response.status_code == 504
+
+
+def test_timed_out_calculation_keeps_its_slot():
+    import asyncio
+    import time
+    from services.calculation_pool import CalculationPool, PoolSaturated
+
+    async def scenario():
+        pool = CalculationPool(workers=0, max_pending=1, timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(time.sleep, 0.5)
+        # The calculation is still running, so its slot stays taken
+        assert pool.pending == 1
+        with pytest.raises(PoolSaturated):
+            await pool.run(time.sleep, 0)
+        for _ in range(100):
+            if not pool.pending:
+                break
+            await asyncio.sleep(0.02)
+        assert pool.pending == 0
+        assert await pool.run(abs, -3) == 3
+
+    asyncio.run(scenario())
+
+
+def test_batch_calculate_matches_single_requests(sample_catalog, service_costs_file, monkeypatch):
+    from routers import calculate
+    from services.calculation_pool import CalculationPool
+    from tests.conftest import make_payload
+
+    monkeypatch.setattr(calculate, "calculation_pool", CalculationPool(workers=0, max_pending=4))
+    payloads = [
+        make_payload(),
+        make_payload("Self Plus One", **{"Specialist": ["2025-02-01"] * 3}),
+        make_payload("Self & Family", **{"Urgent Care": ["2025-07-04", "2025-08-01"]}),
+    ]
+    payloads[1]["userData"]["taxRate"] = 32
+
+    response = client.post("/api/calculate/batch", json=payloads)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["catalog_version"] == sample_catalog.version
+    assert [item["index"] for item in body["results"]] == [0, 1, 2]
+    for payload, item in zip(payloads, body["results"]):
+        assert item["plans"] == client.post("/api/calculate", json=payload).json()["plans"]
+
+
+def test_batch_calculate_streams_ndjson(sample_catalog, service_costs_file, monkeypatch):
+    import json
+    from routers import calculate
+    from services.calculation_pool import CalculationPool
+    from tests.conftest import make_payload
+
+    monkeypatch.setattr(calculate, "calculation_pool", CalculationPool(workers=2, max_pending=4))
+    try:
+        response = client.post("/api/calculate/batch?stream=true", json=[make_payload()] * 5)
+    finally:
+        calculate.calculation_pool.shutdown()
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3, 4]
+    assert all(len(line["plans"]) == 3 for line in lines)
+
+
+def test_batch_calculate_rejects_oversized_batches(sample_catalog, monkeypatch):
+    from routers import calculate
+    from tests.conftest import make_payload
+
+    monkeypatch.setattr(calculate, "CALC_BATCH_MAX_SCENARIOS", 2)
+    response = client.post("/api/calculate/batch", json=[make_payload()] * 3)
+    assert response.status_code == 413
+
+
+def test_calculate_reuses_cached_results(sample_catalog, service_costs_file, fresh_result_cache):
+    from tests.conftest import make_payload
+
+    first = client.post("/api/calculate", json=make_payload(**{"Primary Care": ["2025-06-01", "2025-01-15"]}))
+    # Same usage with dates in another order and an integer tax rate written as a float
+    payload = make_payload(**{"Primary Care": ["2025-01-15", "2025-06-01"]})
+    payload["userData"]["taxRate"] = 22.0
+    second = client.post("/api/calculate", json=payload)
+
+    assert second.json() == first.json()
+    stats = client.get("/api/calculate/cache-stats").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_result_cache_evicts_expires_and_invalidates(sample_catalog, plan_csv):
+    import os
+    from services.result_cache import ResultCache
+    from tests.conftest import SAMPLE_PLANS, write_plan_csv
+
+    cache = ResultCache(max_entries=2, ttl=60)
+    for key in ("a", "b", "c"):
+        cache.put(key, {key: 1})
+    assert cache.get("a") is None and cache.get("c") == {"c": 1}
+    assert cache.evictions == 1
+
+    cache.ttl = 0
+    cache.put("d", {})
+    assert cache.get("d") is None and cache.expirations == 1
+
+    from services import result_cache as module
+    sample_catalog.get()
+    module.result_cache.put("stale", {})
+    stat = os.stat(plan_csv)
+    write_plan_csv(plan_csv, SAMPLE_PLANS[:3])
+    os.utime(plan_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    sample_catalog.get()
+    assert module.result_cache.get("stale") is None
+    assert module.result_cache.invalidations >= 1
@@ -0,0 +1,109 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from services.catalog_format import read_catalog_file
+from services.compile_catalog import compile_catalog
+from services.plan_catalog import PlanCatalog, compile_plan_tables
+from services.service_costs import ServiceCostTable
+from tests.conftest import SAMPLE_SERVICE_COSTS
+
+
+@pytest.fixture
+def compiled(plan_csv, service_costs_file, tmp_path):
+    path = str(tmp_path / "plans.catalog")
+    compile_catalog(str(plan_csv), str(service_costs_file), path)
+    return path
+
+
+def _bump(path, seconds=5):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+
+def test_compiled_catalog_matches_csv(plan_csv, compiled):
+    from_csv = PlanCatalog(str(plan_csv)).get()
+    catalog = PlanCatalog(str(plan_csv), compiled)
+    from_compiled = catalog.get()
+
+    assert catalog.source == "compiled"
+    assert from_compiled.version == from_csv.version
+    assert from_compiled.plans.columns.to_dicts() == from_csv.plans.columns.to_dicts()
+    assert dict(from_compiled.tables) == dict(compile_plan_tables(from_csv.plans))
+    for plan_type, arrays in from_csv.arrays.items():
+        for expected, actual in zip(arrays, from_compiled.arrays[plan_type]):
+            np.testing.assert_array_equal(expected, actual)
+    # Columns are views of the mapped file, not copies
+    assert not from_compiled.plans.columns.premium.flags.owndata
+
+
+def test_edited_csv_takes_precedence(plan_csv, compiled):
+    catalog = PlanCatalog(str(plan_csv), compiled)
+    catalog.get()
+    assert catalog.source == "compiled"
+
+    # Touched but not edited: the compiled catalog still matches it
+    _bump(plan_csv)
+    catalog.get()
+    assert catalog.source == "compiled"
+    assert catalog.reload_count == 1
+
+    with open(plan_csv, "a") as f:
+        f.write("\n")
+    _bump(plan_csv, 10)
+    catalog.get()
+    assert catalog.source == "csv"
+    assert catalog.reload_count == 2
+
+
+def test_compiled_catalog_of_another_csv_is_ignored(plan_csv, compiled, tmp_path):
+    other_csv = tmp_path / "other_plans.csv"
+    other_csv.write_bytes(plan_csv.read_bytes())
+    _bump(compiled)
+    catalog = PlanCatalog(str(other_csv), compiled)
+    assert len(catalog.get().plans) == 7
+    assert catalog.source == "csv"
+
+    os.remove(other_csv)
+    with pytest.raises(RuntimeError):
+        PlanCatalog(str(other_csv), compiled).get()
+
+
+def test_unreadable_compiled_catalog_falls_back_to_csv(plan_csv, compiled):
+    with open(compiled, "r+b") as f:
+        f.write(b"NOTACATL")
+    catalog = PlanCatalog(str(plan_csv), compiled)
+    assert len(catalog.get().plans) == 7
+    assert catalog.source == "csv"
+
+    os.remove(plan_csv)
+    with pytest.raises(RuntimeError):
+        PlanCatalog(str(plan_csv), compiled).get()
+
+
+def test_compiled_catalog_without_csv(plan_csv, compiled):
+    os.remove(plan_csv)
+    catalog = PlanCatalog(str(plan_csv), compiled)
+    assert len(catalog.get().plans) == 7
+
+
+def test_truncated_compiled_catalog_is_rejected(compiled):
+    with open(compiled, "r+b") as f:
+        f.truncate(os.path.getsize(compiled) - 16)
+    with pytest.raises(ValueError):
+        read_catalog_file(compiled)
+
+
+def test_service_costs_from_compiled_catalog(service_costs_file, compiled):
+    from_json = ServiceCostTable(str(service_costs_file)).get()
+    table = ServiceCostTable(str(service_costs_file), compiled)
+    snapshot = table.get()
+    assert dict(snapshot.costs) == {service: float(cost) for service, cost in SAMPLE_SERVICE_COSTS.items()}
+    assert snapshot.version == from_json.version
+
+    # An edited service_costs.json no longer matches the compiled catalog
+    service_costs_file.write_text(json.dumps({**SAMPLE_SERVICE_COSTS, "Primary Care": 99}))
+    _bump(service_costs_file)
+    assert table.get().costs["Primary Care"] == 99.0
@@ -0,0 +1,95 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.cost_calculator import calculate_costs
+from services.cost_curves import evaluate_curves
+from services.plan_catalog import CatalogSnapshot, SERVICE_NAMES
+from tests.conftest import make_payload
+
+client = TestClient(app)
+
+FINANCIALS = (0.0, 1.0, 0.0, 0.0)
+
+
+def plan(deductible, oop_max, rule):
+    return {
+        "plan_name": None, "enrollment_type": "Self", "premium": 100.0, "deductible": deductible,
+        "oop_max": oop_max, "hsa_hra_type": "N/A", "hsa_contribution": 0.0, "hsa_pass_through": 0.0,
+        "services": dict.fromkeys(SERVICE_NAMES, rule),
+    }
+
+
+def snapshot():
+    coinsurance = {"copay": 0.0, "coinsurance": 0.2, "deductible_applies": True}
+    plans = {
+        "Capped": plan(1000.0, 3000.0, coinsurance),
+        "Uncapped": plan(500.0, float("inf"), coinsurance),
+        "No deductible": plan(1000.0, 2000.0, {**coinsurance, "deductible_applies": False}),
+        "Deductible above cap": plan(5000.0, 2000.0, coinsurance),
+        "Copay": plan(1000.0, 3000.0, {"copay": 40.0, "coinsurance": 0.0, "deductible_applies": False}),
+    }
+    for plan_id, details in plans.items():
+        details["plan_name"] = plan_id
+    return CatalogSnapshot(plans, "test", 0.0)
+
+
+def test_curves_match_event_replay():
+    snap = snapshot()
+    levels = [0.0, 250.0, 1000.0, 5000.0, 11000.0, 20000.0]
+    curves = evaluate_curves(levels, 0.22, "Self", FINANCIALS, service="Inpatient Admission", snapshot=snap)
+    assert curves["plans"]["Capped"]["out_of_pocket"] == [0.0, 250.0, 1000.0, 1800.0, 3000.0, 3000.0]
+    assert curves["plans"]["Uncapped"]["out_of_pocket"][-1] == pytest.approx(500.0 + 0.2 * 19500.0)
+    assert curves["plans"]["No deductible"]["out_of_pocket"][:3] == [0.0, 50.0, 200.0]
+    assert curves["plans"]["Deductible above cap"]["out_of_pocket"] == [0.0, 250.0, 1000.0, 2000.0, 2000.0, 2000.0]
+
+    # One inpatient admission billed at each level costs what the engine says
+    usage = {"Inpatient Admission": {"count": 1, "dates": ["2025-03-01"]}}
+    for i, level in enumerate(levels):
+        results = calculate_costs(usage, 0.22, "Self", snapshot=snap, service_costs={"Inpatient Admission": level})
+        for plan_id, result in results.items():
+            if plan_id == "Copay":
+                continue
+            assert curves["plans"][plan_id]["out_of_pocket"][i] == pytest.approx(result["cumulative_cost"])
+            assert curves["plans"][plan_id]["total_cost"][i] == pytest.approx(result["total_cost"])
+
+
+def test_curve_breakpoints():
+    curves = evaluate_curves([0.0], 0.22, "Self", FINANCIALS, service="Specialist", snapshot=snapshot())["plans"]
+    assert curves["Capped"]["curve"] == {"breakpoints": [[0.0, 0.0], [1000.0, 1000.0], [11000.0, 3000.0]],
+                                         "final_slope": 0.0}
+    assert curves["Uncapped"]["curve"] == {"breakpoints": [[0.0, 0.0], [500.0, 500.0]], "final_slope": 0.2}
+    assert curves["No deductible"]["curve"] == {"breakpoints": [[0.0, 0.0], [10000.0, 2000.0]], "final_slope": 0.0}
+    # Copays are per event, so spending alone never reaches them
+    assert curves["Copay"]["curve"] == {"breakpoints": [[0.0, 0.0]], "final_slope": 0.0}
+
+
+def test_curves_endpoint(sample_catalog, service_costs_file):
+    body = {**make_payload(), "grid": {"start": 0, "stop": 3000, "steps": 4}}
+    response = client.post("/api/calculate/curves", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["service"] == "Inpatient Admission"
+    assert result["spending"] == [0.0, 1000.0, 2000.0, 3000.0]
+    assert set(result["plans"]) == {"Blue Basic S", "Aetna HDHP S", "GEHA Standard S"}
+    blue = result["plans"]["Blue Basic S"]
+    # CSV plans carry no coverage rules, so the engine charges only the $350
+    # deductible
+    assert blue["out_of_pocket"] == [0.0, 350.0, 350.0, 350.0]
+    assert blue["total_cost"][1] == pytest.approx(blue["total_cost"][0] + 350.0)
+
+    response = client.post("/api/calculate/curves", json={"userData": make_payload()["userData"],
+                                                          "spending": [500], "service": "Specialist"})
+    assert response.status_code == 200
+    assert response.json()["plans"]["Blue Basic S"]["out_of_pocket"] == [350.0]
+
+
+@pytest.mark.parametrize("body", [
+    {"service": "Teleportation"},
+    {"spending": [-1]},
+    {"spending": []},
+    {"grid": {"start": 10, "stop": 0}},
+])
+def test_curves_endpoint_rejects_bad_input(sample_catalog, service_costs_file, body):
+    response = client.post("/api/calculate/curves", json={**make_payload(), **body})
+    assert response.status_code == 422
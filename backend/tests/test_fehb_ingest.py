@@ -0,0 +1,183 @@
+import io
+import json
+
+import pytest
+
+from services.cost_calculator import calculate_costs
+from services.fehb_ingest import iter_json_array_items, load_fehb_plans, parse_cost_expression
+from services.plan_catalog import PlanCatalog, compile_plan_tables
+
+BENEFITS = {
+    "Plan Code": "Z2",
+    "Plan Code Name": "Aetna Advantage",
+    "Network Type": "In-Network 1",
+    "Plan Code Option": "Advantage",
+    "Premium Pass Through HSA/HRA Contribution Self": 0,
+    "Premium Pass Through HSA/HRA Contribution Self & Family": 0,
+    "Premium Pass Through HSA/HRA Contribution Self Plus One": 0,
+    "Catastrophic Limit Self": 7500.0,
+    "Catastrophic Limit Self & Family": 15000.0,
+    "Catastrophic Limit Self Plus One": 15000.0,
+    "Calendar Year Deductible Self": 2000.0,
+    "Calendar Year Deductible Self & Family": 4000.0,
+    "Calendar Year Deductible Self Plus One": 4000.0,
+    "Services & Benefits - Medical Account (HRA/HSA)": "No",
+    "Member Cost with Medicare Part D EGWP - EGWP Tier 5": "25% $350 Max",
+    "Member Cost with Medicare Advantage (Part C) Primary - Part B Premium Reimbursement with Part C": "$1200 Max",
+    "Member Cost with Medicare Advantage (Part C) Primary - Out-of-Pocket Maximum with Part C": 2000,
+    "Member Cost with Medicare Advantage (Part C) Primary - Deductible Waiver with Part C": "Deductible Waived",
+    "Member Cost with Medicare Part D EGWP - Out-of-Pocket Maximum": 2000.0,
+    "Member Cost with Medicare Part D EGWP - EGWP Tier 1": 2,
+    "Primary/Specialty Care - Primary Care Office Visit": 0.3,
+    "Primary/Specialty Care - Specialist Office Visit": "$40",
+    "Emergency & Urgent Care - Emergency Care": 0.3,
+    "Prescription Drugs - Tier 0 Prescription": 0.0,
+    "Prescription Drugs - Tier 1 Prescriptions": "Tier 1: $10",
+    "Prescription Drugs - Tier 2 Prescriptions": "25% $350 Max",
+    "Treatment, Devices, and Services - Chiropractic": "Member Pays All Charges",
+    "Vision - Routine Eye Exams": "Yes",
+}
+
+
+def premium(code, enrollment_type, amount, name_key="Plan"):
+    return {"attributes": {name_key: "Aetna Advantage", "Option": "Advantage", "Enrollment Code": code,
+                           "Enrollment Type": enrollment_type, "2025 Monthly - Empl. Pays": amount}}
+
+
+def fehb_document(benefits=(BENEFITS,)):
+    return {
+        "FEHB Benefits": [{"id": i, "attributes": attributes} for i, attributes in enumerate(benefits, 1)],
+        "Notes": {"ignored": [1, 2, 3]},
+        "Premiums": [premium(474, "Self", 186.33)],
+        "HMO Premiums (Copy as needed)": [
+            premium("Z24", "Self", 115.34, "Column1"),
+            premium("Z25", "Self & Family", 290.0, "Column1"),
+            premium("Z26", "Self Plus One", 250.0, "Column1"),
+            premium("Z24", "Self", 999.0, "Column1"),
+        ],
+    }
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (0.3, {"copay": 0.0, "coinsurance": 0.3, "deductible_applies": True}),
+    (10, {"copay": 10.0, "coinsurance": 0.0, "deductible_applies": False}),
+    (1, {"copay": 0.0, "coinsurance": 1.0, "deductible_applies": True}),
+    ("1", {"copay": 0.0, "coinsurance": 1.0, "deductible_applies": True}),
+    ("$1", {"copay": 1.0, "coinsurance": 0.0, "deductible_applies": False}),
+    (0.0, {"copay": 0.0, "coinsurance": 0.0, "deductible_applies": False}),
+    ("Tier 1: $10", {"copay": 10.0, "coinsurance": 0.0, "deductible_applies": False}),
+    ("Tier 2: 45%", {"copay": 0.0, "coinsurance": 0.45, "deductible_applies": True}),
+    ("25% $350 Max", {"copay": 0.0, "coinsurance": 0.25, "coinsurance_max": 350.0, "deductible_applies": True}),
+    ("$20 after deductible", {"copay": 20.0, "coinsurance": 0.0, "deductible_applies": True}),
+    ("20% deductible waived", {"copay": 0.0, "coinsurance": 0.2, "deductible_applies": False}),
+    ("Not Covered", {"copay": 0.0, "coinsurance": 1.0, "deductible_applies": False}),
+    ("Member Pays All Charges", {"copay": 0.0, "coinsurance": 1.0, "deductible_applies": False}),
+    ("$1200 Max", None),
+    ("Deductible Waived", None),
+    ("Yes", None),
+    ("Covered", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_cost_expression(raw, expected):
+    assert parse_cost_expression(raw) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_streamed_items_match_json_load(chunk_size):
+    document = fehb_document()
+    raw = json.dumps(document, indent=2).encode("utf-8-sig")
+    items = list(iter_json_array_items(io.BytesIO(raw), ["FEHB Benefits", "Premiums"], chunk_size))
+    assert items == ([("FEHB Benefits", item) for item in document["FEHB Benefits"]]
+                     + [("Premiums", item) for item in document["Premiums"]])
+
+
+@pytest.mark.parametrize("raw", [b"[]", b'{"FEHB Benefits": [{"id": 1}', b'{"FEHB Benefits": [1 2]}'])
+def test_malformed_documents_are_rejected(raw):
+    with pytest.raises(ValueError):
+        list(iter_json_array_items(io.BytesIO(raw), ["FEHB Benefits"], 4))
+
+
+def test_load_fehb_plans_normalizes_each_enrollment_type():
+    no_premium = {**BENEFITS, "Plan Code": "Q9", "Plan Code Name": "Unpriced"}
+    raw = json.dumps(fehb_document([BENEFITS, no_premium])).encode()
+    plans = load_fehb_plans(io.BytesIO(raw), chunk_size=64)
+
+    assert list(plans) == ["Aetna Advantage In-Network 1 S", "Aetna Advantage In-Network 1 SO",
+                           "Aetna Advantage In-Network 1 SF"]
+    self_plan = plans["Aetna Advantage In-Network 1 S"]
+    assert self_plan["premium"] == 115.34  # first matching premium record wins
+    assert (self_plan["deductible"], self_plan["oop_max"]) == (2000.0, 7500.0)
+    assert plans["Aetna Advantage In-Network 1 SF"]["premium"] == 290.0
+    assert plans["Aetna Advantage In-Network 1 SO"]["oop_max"] == 15000.0
+    assert self_plan["hsa_hra_type"] == "N/A"
+
+    services = self_plan["services"]
+    assert services["Specialist"] == {"copay": 40.0, "coinsurance": 0.0, "deductible_applies": False}
+    assert services["Medications Tier 0"]["copay"] == 0.0
+    assert services["Medications Tier 2"]["coinsurance_max"] == 350.0
+    assert services["Chiropractic"]["coinsurance"] == 1.0
+    assert "Urgent Care" not in services
+    assert self_plan["plan_name"] == "Aetna Advantage"
+    assert (self_plan["plan_code"], self_plan["network"]) == ("Z2", "In-Network 1")
+    assert self_plan["medicare"] == {
+        "Part D": {
+            "out_of_pocket_max": 2000.0,
+            "part_b_reimbursement": None,
+            "deductible_waived": False,
+            "services": {
+                "EGWP Tier 5": {"copay": 0.0, "coinsurance": 0.25, "coinsurance_max": 350.0,
+                                "deductible_applies": True},
+                "EGWP Tier 1": {"copay": 2.0, "coinsurance": 0.0, "deductible_applies": False},
+            },
+        },
+        "Part C": {"out_of_pocket_max": 2000.0, "part_b_reimbursement": 1200.0, "deductible_waived": True,
+                   "services": {}},
+    }
+
+
+def test_catalog_loads_fehb_json_with_coverage_rules(tmp_path, monkeypatch):
+    from services import plan_catalog
+
+    path = tmp_path / "fehb.json"
+    path.write_text(json.dumps(fehb_document()))
+    monkeypatch.setattr(plan_catalog, "catalog", PlanCatalog(str(path)))
+    snapshot = plan_catalog.catalog.get()
+    assert plan_catalog.catalog.source == "fehb"
+    assert len(snapshot.plans) == 3
+    assert dict(snapshot.tables) == dict(compile_plan_tables(load_fehb_plans(str(path))))
+
+    # Two Tier 2 fills after the deductible is met: 25% of $4000 is capped at
+    # $350 per fill
+    usage = {
+        "Emergency Care": {"count": 1, "dates": ["2025-01-10"]},
+        "Medications Tier 2": {"count": 2, "dates": ["2025-02-01", "2025-03-01"]},
+    }
+    costs = {"Emergency Care": 2000.0, "Medications Tier 2": 4000.0}
+    for engine in ("scalar", "vectorized"):
+        result = calculate_costs(usage, 0.22, "Self", snapshot=snapshot, service_costs=costs, engine=engine)
+        plan = result["Aetna Advantage In-Network 1 S"]
+        assert plan["cumulative_cost"] == pytest.approx(2000.0 + 2 * 350.0)
+
+
+def test_fehb_plan_details_reach_the_catalog_payload(tmp_path):
+    from services.catalog_payload import serialize_plans
+
+    path = tmp_path / "fehb.json"
+    path.write_text(json.dumps(fehb_document()))
+    snapshot = PlanCatalog(str(path)).get()
+    plan_id = "Aetna Advantage In-Network 1 S"
+    assert snapshot.tables["Self"][0].plan_name == "Aetna Advantage"
+    record = snapshot.plans[plan_id]
+    assert record["medicare"]["Part C"]["out_of_pocket_max"] == 2000.0
+
+    plan = json.loads(serialize_plans(snapshot.plans.columns))[plan_id]
+    assert plan["plan_name"] == "Aetna Advantage"
+    assert (plan["plan_code"], plan["network"]) == ("Z2", "In-Network 1")
+    assert plan["medicare"]["Part D"]["services"]["EGWP Tier 1"]["copay"] == 2.0
+    assert plan["coverage"]["Medications Tier 2"] == {
+        "deductible_applies": True, "copay": 0.0, "coinsurance": 0.25, "coinsurance_max": 350.0}
+    assert plan["coverage"]["Urgent Care"]["coinsurance_max"] is None
+
+    projected = json.loads(serialize_plans(snapshot.plans.columns, ["plan_name", "network"]))[plan_id]
+    assert projected == {"plan_name": "Aetna Advantage", "network": "In-Network 1"}
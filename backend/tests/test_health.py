@@ -0,0 +1,118 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.plan_catalog import PlanCatalog
+from tests.conftest import SAMPLE_PLANS, write_plan_csv
+
+client = TestClient(app)
+
+
+def test_catalog_parses_once(plan_csv):
+    catalog = PlanCatalog(str(plan_csv))
+    first = catalog.get()
+    assert catalog.get() is first
+    assert catalog.reload_count == 1
+    assert len(first.plans) == len(SAMPLE_PLANS)
+    plan = first.plans["Aetna HDHP S"]
+    assert plan["premium"] == 95.5
+    assert plan["hsa_pass_through"] == 1200.0
+    assert plan["services"]["Primary Care"] == 0.2
+
+
+def test_catalog_is_read_only(plan_csv):
+    plans = PlanCatalog(str(plan_csv)).get().plans
+    try:
+        plans["Aetna HDHP S"]["premium"] = 0
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("catalog plans should be immutable")
+
+
+def test_catalog_reloads_only_on_content_change(plan_csv):
+    catalog = PlanCatalog(str(plan_csv))
+    first = catalog.get()
+
+    # Touching the file without changing it keeps the snapshot
+    stat = os.stat(plan_csv)
+    os.utime(plan_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert catalog.get() is first
+    assert catalog.reload_count == 1
+
+    write_plan_csv(plan_csv, SAMPLE_PLANS[:2])
+    os.utime(plan_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    second = catalog.get()
+    assert second is not first
+    assert second.version != first.version
+    assert len(second.plans) == 2
+    assert catalog.reload_count == 2
+
+
+def test_catalog_status_endpoint(sample_catalog):
+    response = client.get("/api/health-plans/catalog-status")
+    assert response.status_code == 200
+    assert response.json()["reload_count"] == 0
+
+    sample_catalog.get()
+    status = client.get("/api/health-plans/catalog-status").json()
+    assert status["reload_count"] == 1
+    assert status["plan_count"] == len(SAMPLE_PLANS)
+    assert status["loaded_at"] is not None
+
+
+def test_catalog_plans_are_columnar(plan_csv):
+    import numpy as np
+    from services.plan_catalog import parse_health_plans
+
+    snapshot = PlanCatalog(str(plan_csv)).get()
+    columns = snapshot.plans.columns
+    assert isinstance(columns.premium, np.ndarray) and columns.services.shape == (len(SAMPLE_PLANS), 25)
+    # Serializing the columns gives back exactly what the CSV parser produces
+    assert columns.to_dicts() == parse_health_plans(plan_csv.read_text())
+    assert {plan_id: dict(plan, services=dict(plan["services"])) for plan_id, plan in snapshot.plans.items()} \
+        == columns.to_dicts()
+    # Plans share one coverage table when their coverage rules are equal
+    tables = snapshot.tables["Self"]
+    assert tables[0].coverage is tables[1].coverage
+
+
+def test_health_plans_endpoint_is_cached_with_etag(sample_catalog):
+    response = client.get("/api/health-plans/health-plans", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    etag = response.headers["etag"]
+    plans = response.json()
+    assert len(plans) == len(SAMPLE_PLANS)
+    assert plans["Aetna HDHP S"]["oop_max"] is None  # no maximum: JSON has no Infinity
+    assert plans["Aetna HDHP S"]["services"]["Primary Care"] == 0.2
+
+    # The same encoded payload is served until the catalog reloads
+    assert client.get("/api/health-plans", headers={"Accept-Encoding": "gzip"}).headers["etag"] == etag
+    identity = client.get("/api/health-plans/health-plans", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.headers["etag"] != etag
+
+    not_modified = client.get("/api/health-plans/health-plans", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+
+    write_plan_csv(sample_catalog.path, SAMPLE_PLANS[:2])
+    stat = os.stat(sample_catalog.path)
+    os.utime(sample_catalog.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    reloaded = client.get("/api/health-plans/health-plans", headers={"If-None-Match": etag})
+    assert reloaded.status_code == 200 and len(reloaded.json()) == 2
+
+
+def test_health_plans_projection_and_filters(sample_catalog):
+    response = client.get("/api/health-plans/health-plans",
+                          params={"fields": "premium,deductible", "enrollment_type": "Self", "hsa_hra_type": "HSA"})
+    assert response.status_code == 200
+    assert response.json() == {"Aetna HDHP S": {"premium": 95.5, "deductible": 1500.0}}
+
+    both = client.get("/api/health-plans/health-plans",
+                      params=[("fields", "premium"), ("enrollment_type", "Self"), ("enrollment_type", "Self Plus One")])
+    assert set(both.json()) == {"Blue Basic S", "Blue Basic SO", "Aetna HDHP S", "Aetna HDHP SO",
+                                "GEHA Standard S"}
+
+    assert client.get("/api/health-plans/health-plans", params={"fields": "premium,bogus"}).status_code == 422
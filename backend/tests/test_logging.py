@@ -0,0 +1,38 @@
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+from logging_config import JsonFormatter, RequestIdFilter, request_id_var
+from main import app
+
+client = TestClient(app)
+
+
+def make_record(message, *args, **extra):
+    record = logging.LogRecord("services.cost_calculator", logging.INFO, __file__, 1, message, args, None)
+    record.__dict__.update(extra)
+    RequestIdFilter().filter(record)
+    return record
+
+
+def test_json_formatter_includes_request_id_and_extras():
+    token = request_id_var.set("abc123")
+    try:
+        record = make_record("Plan %s costs %.2f", "Blue Basic S", 1234.5, plan_count=3)
+    finally:
+        request_id_var.reset(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Plan Blue Basic S costs 1234.50"
+    assert entry["request_id"] == "abc123"
+    assert entry["level"] == "INFO"
+    assert entry["plan_count"] == 3
+
+
+def test_request_id_is_echoed_or_generated():
+    response = client.get("/ping", headers={"X-Request-ID": "req-42"})
+    assert response.headers["X-Request-ID"] == "req-42"
+
+    generated = client.get("/ping").headers["X-Request-ID"]
+    assert len(generated) == 32
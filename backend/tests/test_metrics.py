@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from metrics import Counter, Registry, SPAN_DURATION
+from tests.conftest import make_payload
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route="/a")
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("things_total", "Things.", ("name",))
+    counter.inc(name='say "hi"')
+    counter.inc(2, name='say "hi"')
+    assert list(counter.samples()) == ['things_total{name="say \\"hi\\""} 3']
+
+
+def test_metrics_endpoint_reports_calculate_request(sample_catalog, service_costs_file):
+    before = SPAN_DURATION.count(span="calculate_costs")
+    response = client.post("/api/calculate", json=make_payload())
+    assert response.status_code == 200
+    assert response.json()["message"] == "Cost calculation successful"
+    client.post("/api/calculate", json=make_payload())
+    assert SPAN_DURATION.count(span="calculate_costs") == before + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="POST",handler="calculate_cost",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{method="POST",handler="calculate_cost",le="+Inf"}' in body
+    for name in ("parse_and_validate", "cache_lookup", "layout_events", "serialize"):
+        assert f'calc_span_duration_seconds_count{{span="{name}"}}' in body
+    assert "calc_plans_evaluated_count" in body
+    assert "calc_events_processed_count" in body
+    assert "result_cache_hits_total 1" in body
+    assert "result_cache_hit_ratio 0.5" in body
@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.pareto import skyline
+from tests.conftest import make_payload
+
+client = TestClient(app)
+
+
+def dominates(a, b):
+    return (a <= b).all() and (a < b).any()
+
+
+@pytest.mark.parametrize("n_criteria", [2, 3])
+@pytest.mark.parametrize("seed", range(5))
+def test_skyline_matches_pairwise_check(n_criteria, seed):
+    # Integer values so ties and duplicate rows occur
+    costs = np.random.default_rng(seed).integers(0, 8, size=(60, n_criteria)).astype(float)
+    dominators = skyline(costs)
+    for row, dominator in enumerate(dominators):
+        beaten = any(dominates(other, costs[row]) for other in costs)
+        assert (dominator >= 0) == beaten
+        if dominator >= 0:
+            assert dominates(costs[dominator], costs[row])
+            assert dominators[dominator] == -1  # always a frontier plan
+
+
+def test_skyline_keeps_duplicates_and_rejects_other_dimensions():
+    costs = np.array([[1.0, 2.0], [1.0, 2.0], [2.0, 1.0], [2.0, 2.0]])
+    assert skyline(costs).tolist() == [-1, -1, -1, 2]
+    assert skyline(np.empty((0, 3))).tolist() == []
+    with pytest.raises(ValueError):
+        skyline(np.zeros((3, 4)))
+
+
+def test_skyline_is_fast_on_anti_correlated_criteria():
+    # Every row is on the frontier: the worst case for a staircase sweep
+    x = np.arange(5000.0)
+    costs = np.column_stack((x, -x, x))
+    started = time.perf_counter()
+    dominators = skyline(costs)
+    assert time.perf_counter() - started < 0.5
+    assert (dominators == -1).all()
+
+
+def test_pareto_endpoint(sample_catalog, service_costs_file, fresh_result_cache):
+    calculated = client.post("/api/calculate", json=make_payload()).json()["plans"]
+    response = client.post("/api/calculate/pareto", json={**make_payload(), "criteria": ["premium", "expected_cost"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert fresh_result_cache.stats()["hits"] == 1
+    assert body["criteria"] == ["premium", "expected_cost"]
+    assert set(body["frontier"]) | set(body["dominated"]) == set(calculated)
+    assert set(body["dominated"].values()) <= set(body["frontier"])
+
+    frontier = list(body["frontier"].items())
+    premiums = [plan["criteria"]["premium"] for _, plan in frontier]
+    assert premiums == sorted(premiums)
+    for plan_id, plan in frontier:
+        assert plan["annual_cost"] == calculated[plan_id]["annual_cost"]
+        assert plan["criteria"]["expected_cost"] == plan["annual_cost"]
+
+
+@pytest.mark.parametrize("criteria", [["premium"], ["premium", "premium"], ["premium", "flexibility"],
+                                      ["premium", "worst_case", "expected_cost", "out_of_pocket"]])
+def test_pareto_endpoint_rejects_bad_criteria(sample_catalog, service_costs_file, criteria):
+    response = client.post("/api/calculate/pareto", json={**make_payload(), "criteria": criteria})
+    assert response.status_code == 422
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.payload_store import MemoryPayloadStore, PayloadStore, PayloadTooLarge, SQLitePayloadStore
+
+client = TestClient(app)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryPayloadStore(max_bytes=1024, ttl=60)
+    return SQLitePayloadStore(str(tmp_path / "payloads.sqlite3"), max_bytes=1024, ttl=60)
+
+
+def test_store_keeps_payloads_per_session(store):
+    store.save("alice", {"userData": {"planType": "Self"}})
+    store.save("bob", {"userData": {"planType": "Self & Family"}})
+    store.save("alice", {"userData": {"planType": "Self Plus One"}})
+
+    assert store.load("alice") == {"userData": {"planType": "Self Plus One"}}
+    assert store.load("bob") == {"userData": {"planType": "Self & Family"}}
+    assert store.load("carol") is None
+
+
+def test_incomplete_backend_cannot_be_created():
+    class WriteOnly(PayloadStore):
+        def _write(self, session_id, body, expires_at):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnly()
+
+
+def test_store_rejects_oversized_payloads(store):
+    with pytest.raises(PayloadTooLarge):
+        store.save("alice", {"notes": "x" * 2048})
+    assert store.load("alice") is None
+
+
+def test_store_expires_payloads(store):
+    store.save("alice", {"a": 1})
+    assert store.purge_expired(now=time.time() + 120) == 1
+    assert store.load("alice") is None
+
+    store.ttl = -1
+    store.save("bob", {"b": 1})
+    assert store.load("bob") is None
+
+
+def test_sqlite_store_concurrent_writers(tmp_path):
+    store = SQLitePayloadStore(str(tmp_path / "payloads.sqlite3"))
+
+    def write(worker):
+        for i in range(25):
+            store.save(f"session-{worker}", {"worker": worker, "i": i})
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for worker in range(8):
+        assert store.load(f"session-{worker}") == {"worker": worker, "i": 24}
+
+
+def test_user_data_routes_are_scoped_by_session(monkeypatch):
+    from routers import calculate
+
+    monkeypatch.setattr(calculate, "payload_store", MemoryPayloadStore(max_bytes=512))
+
+    assert client.get("/api/user-data", headers={"X-Session-ID": "a"}).status_code == 404
+    assert client.post("/api/user-data", json={"tab": "a"}, headers={"X-Session-ID": "a"}).status_code == 200
+    assert client.post("/api/user-data", json={"tab": "default"}).status_code == 200
+
+    assert client.get("/api/user-data", headers={"X-Session-ID": "a"}).json() == {"tab": "a"}
+    assert client.get("/api/user-data").json() == {"tab": "default"}
+    assert client.post("/api/user-data", json={"tab": "x" * 1024}).status_code == 413
+
+
+def test_clients_without_a_session_get_their_own(monkeypatch):
+    from routers import calculate
+
+    monkeypatch.setattr(calculate, "payload_store", MemoryPayloadStore(max_bytes=512))
+    alice, bob = TestClient(app), TestClient(app)
+
+    response = alice.post("/api/user-data", json={"tab": "alice"})
+    assert response.status_code == 200
+    set_cookie = response.headers["set-cookie"]
+    assert "session_id=" in set_cookie and "HttpOnly" in set_cookie and "SameSite=lax" in set_cookie
+
+    assert bob.get("/api/user-data").status_code == 404
+    assert bob.post("/api/user-data", json={"tab": "bob"}).status_code == 200
+    assert alice.get("/api/user-data").json() == {"tab": "alice"}
+    assert bob.get("/api/user-data").json() == {"tab": "bob"}
@@ -0,0 +1,92 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.cost_calculator import calculate_costs, load_service_costs
+from services.projection import project_costs
+from tests.conftest import make_payload
+
+client = TestClient(app)
+
+USAGE = {
+    "assumedRateOfReturn": 0.06,
+    "hsaPercentSpent": 0.5,
+    "Primary Care": {"count": 2, "dates": ["2025-01-15", "2025-06-01"]},
+    "Emergency Care": {"count": 1, "dates": ["2025-03-02"]},
+}
+
+
+def test_first_year_matches_calculate_costs(sample_catalog, service_costs_file):
+    projection = project_costs([USAGE], 0.22, "Self", 1, premium_inflation=0.05, service_inflation=0.1)
+    expected = calculate_costs(USAGE, 0.22, "Self", engine="vectorized")
+    assert set(projection["plans"]) == set(expected)
+    for plan_id, plan in projection["plans"].items():
+        assert plan["years"]["total_cost"] == [expected[plan_id]["total_cost"]]
+        assert plan["years"]["out_of_pocket"] == [expected[plan_id]["cumulative_cost"]]
+        assert plan["years"]["hsa_growth"] == [expected[plan_id]["hsa_growth"]]
+        assert plan["cumulative_total_cost"] == plan["years"]["total_cost"]
+
+
+def test_inflation_and_usage_by_year(sample_catalog, service_costs_file):
+    quiet = {"Primary Care": {"count": 1, "dates": ["2025-02-01"]}}
+    projection = project_costs([USAGE, quiet], 0.22, "Self", 4, premium_inflation=0.05, service_inflation=0.1)
+    inflated = {service: cost * 1.1 ** 3 for service, cost in load_service_costs().items()}
+    expected = calculate_costs(quiet, 0.22, "Self", service_costs=inflated, engine="vectorized")
+    for plan_id, plan in projection["plans"].items():
+        years = plan["years"]
+        assert years["premiums"][3] == pytest.approx(years["premiums"][0] * 1.05 ** 3, abs=0.01)
+        # Year 4 repeats the last profile, with four years of service inflation
+        assert years["out_of_pocket"][3] == pytest.approx(expected[plan_id]["cumulative_cost"], abs=0.01)
+        assert plan["cumulative_total_cost"][-1] == pytest.approx(sum(years["total_cost"]), abs=0.02)
+        assert plan["totals"]["total_cost"] == pytest.approx(sum(years["total_cost"]), abs=0.02)
+
+
+def test_hsa_balance_carries_forward(sample_catalog, service_costs_file):
+    financials = (0.06, 0.5, 2000.0, 0.0)
+    projection = project_costs([{}], 0.22, "Self", 5, starting_hsa_balance=1000.0, financials=financials)
+    hsa_plan = projection["plans"]["Aetna HDHP S"]
+
+    # Month by month: deposit, spend hsaPercentSpent / 12 of the balance,
+    # and the rest earns the monthly rate
+    monthly_rate = 1.06 ** (1 / 12) - 1
+    deposit = (2000.0 + 1200.0) / 12
+    balance, growth_by_year, balances = 1000.0, [], []
+    for _ in range(5):
+        growth = 0.0
+        for _ in range(12):
+            kept = (balance + deposit) * (1 - 0.5 / 12)
+            growth += kept * monthly_rate
+            balance = kept * (1 + monthly_rate)
+        growth_by_year.append(growth)
+        balances.append(balance)
+    assert hsa_plan["years"]["hsa_growth"] == pytest.approx(growth_by_year, abs=0.02)
+    assert hsa_plan["hsa_balance"] == pytest.approx(balances, abs=0.01)
+    # Growth compounds on what is carried over
+    assert hsa_plan["years"]["hsa_growth"][4] > hsa_plan["years"]["hsa_growth"][0]
+
+    no_hsa = projection["plans"]["Blue Basic S"]
+    assert no_hsa["hsa_balance"] == [0.0] * 5
+    assert no_hsa["years"]["hsa_growth"] == [0.0] * 5
+
+
+def test_projection_rejects_bad_year_counts(sample_catalog, service_costs_file):
+    for years in (0, 31):
+        with pytest.raises(ValueError):
+            project_costs([USAGE], 0.22, "Self", years)
+
+
+def test_projection_endpoint(sample_catalog, service_costs_file):
+    body = {**make_payload(), "years": 3, "premium_inflation": 0.05,
+            "usage_by_year": [make_payload()["inputDetails"], {}]}
+    response = client.post("/api/calculate/projection", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["years"] == 3
+    assert set(result["plans"]) == {"Blue Basic S", "Aetna HDHP S", "GEHA Standard S"}
+    blue = result["plans"]["Blue Basic S"]
+    assert len(blue["years"]["total_cost"]) == 3
+    assert blue["years"]["out_of_pocket"][0] > 0
+    assert blue["years"]["out_of_pocket"][1:] == [0.0, 0.0]
+
+    response = client.post("/api/calculate/projection", json={**make_payload(), "years": 31})
+    assert response.status_code == 422
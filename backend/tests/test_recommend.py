@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.recommendation_engine import (
+    CRITERIA, dominated_mask, normalize_criteria, resolve_weights, score_plans,
+)
+from tests.conftest import make_payload
+
+client = TestClient(app)
+
+
+def brute_force_dominated(costs):
+    return np.array([
+        any((other <= row).all() and (other < row).any() for other in costs)
+        for row in costs
+    ])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_dominated_mask_matches_pairwise_check(seed, monkeypatch):
+    from services import recommendation_engine
+
+    # Small blocks so several are needed; integer values so ties occur
+    monkeypatch.setattr(recommendation_engine, "_DOMINANCE_BLOCK", 7)
+    costs = np.random.default_rng(seed).integers(0, 6, size=(40, 3)).astype(float)
+    assert (dominated_mask(costs) == brute_force_dominated(costs)).all()
+
+
+def test_identical_plans_do_not_dominate_each_other():
+    costs = np.array([[1.0, 2.0], [1.0, 2.0], [2.0, 3.0]])
+    assert dominated_mask(costs).tolist() == [False, False, True]
+
+
+def test_normalize_criteria_scores_best_plan_one():
+    normalized = normalize_criteria(np.array([[100.0, 5.0], [300.0, 5.0], [200.0, 5.0]]))
+    assert normalized[:, 0].tolist() == [1.0, 0.0, 0.5]
+    assert normalized[:, 1].tolist() == [1.0, 1.0, 1.0]
+
+
+def test_resolve_weights():
+    assert resolve_weights() == {criterion: 0.25 for criterion in CRITERIA}
+    weights = resolve_weights({"expected_cost": 3, "worst_case": 1, "tax_savings": 0, "hsa_growth": 0})
+    assert weights == {"expected_cost": 0.75, "worst_case": 0.25, "tax_savings": 0.0, "hsa_growth": 0.0}
+    for preferences in ({"flexibility": 1}, {"worst_case": -1}, dict.fromkeys(CRITERIA, 0)):
+        with pytest.raises(ValueError):
+            resolve_weights(preferences)
+
+
+def test_score_plans_drops_dominated_and_ranks_by_weight():
+    # expected_cost, worst_case, tax_savings, hsa_growth
+    matrix = np.array([
+        [5000.0, 9000.0, 600.0, 0.0],  # cheap but risky
+        [6000.0, 7000.0, 600.0, 0.0],  # safer but pricier
+        [6500.0, 9500.0, 500.0, 0.0],  # worse than the first on everything
+    ])
+    plan_ids = ("cheap", "safe", "worse")
+    scored = score_plans(plan_ids, matrix, resolve_weights({"expected_cost": 3, "worst_case": 1}))
+    assert scored["dominated"] == ["worse"]
+    assert [plan_id for plan_id, *_ in scored["ranked"]] == ["cheap", "safe"]
+
+    scored = score_plans(plan_ids, matrix, resolve_weights({"expected_cost": 1, "worst_case": 3}))
+    assert [plan_id for plan_id, *_ in scored["ranked"]] == ["safe", "cheap"]
+
+
+def test_recommend_endpoint(sample_catalog, service_costs_file, fresh_result_cache):
+    calculated = client.post("/api/calculate", json=make_payload()).json()["plans"]
+    response = client.post("/api/recommend", json={**make_payload(), "preferences": {"expected_cost": 2}})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["message"] == "Recommendation successful"
+    assert body["plan_count"] == 3
+    assert fresh_result_cache.stats()["hits"] == 1  # costed once, by /api/calculate
+    assert body["weights"]["expected_cost"] == pytest.approx(2 / 2.75)  # others keep 0.25
+
+    recommendations = body["recommendations"]
+    assert len(recommendations) + len(body["dominated"]) == 3
+    assert [r["rank"] for r in recommendations] == list(range(1, len(recommendations) + 1))
+    assert [r["score"] for r in recommendations] == sorted((r["score"] for r in recommendations), reverse=True)
+    for recommendation in recommendations:
+        plan = calculated[recommendation["plan_id"]]
+        assert recommendation["criteria"]["expected_cost"] == plan["annual_cost"]
+        assert recommendation["criteria"]["tax_savings"] == plan["tax_savings"]
+
+    top = client.post("/api/recommend", json={**make_payload(), "top_n": 1}).json()
+    assert len(top["recommendations"]) == 1
+
+
+def test_recommend_endpoint_rejects_bad_preferences(sample_catalog, service_costs_file):
+    response = client.post("/api/recommend", json={**make_payload(), "preferences": {"flexibility": 1}})
+    assert response.status_code == 422
+    assert "flexibility" in response.json()["detail"]
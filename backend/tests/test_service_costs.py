@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from services.service_costs import ServiceCostTable, validate_service_costs
+from tests.conftest import SAMPLE_SERVICE_COSTS
+
+
+def _rewrite(path, data, bump_ns=10**9):
+    stat = os.stat(path)
+    path.write_text(data if isinstance(data, str) else json.dumps(data))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump_ns))
+
+
+def test_service_costs_load_once(service_costs_file):
+    table = ServiceCostTable(str(service_costs_file))
+    first = table.get()
+    assert table.get() is first
+    assert table.reload_count == 1
+    assert first.costs["Primary Care"] == SAMPLE_SERVICE_COSTS["Primary Care"]
+    with pytest.raises(TypeError):
+        first.costs["Primary Care"] = 0
+
+
+def test_service_costs_reload_on_change(service_costs_file):
+    table = ServiceCostTable(str(service_costs_file))
+    first = table.get()
+    seen = []
+    table.add_reload_listener(seen.append)
+
+    # Same content under a new mtime keeps the snapshot
+    _rewrite(service_costs_file, SAMPLE_SERVICE_COSTS)
+    assert table.get() is first
+
+    _rewrite(service_costs_file, {**SAMPLE_SERVICE_COSTS, "Primary Care": 175}, bump_ns=2 * 10**9)
+    second = table.get()
+    assert second is not first
+    assert second.version != first.version
+    assert second.costs["Primary Care"] == 175.0
+    assert table.reload_count == 2
+    assert seen == [second]
+
+
+def test_invalid_service_costs_keep_previous_snapshot(service_costs_file):
+    table = ServiceCostTable(str(service_costs_file))
+    first = table.get()
+
+    _rewrite(service_costs_file, '{"Primary Care": "lots"}')
+    assert table.get() is first
+    _rewrite(service_costs_file, "{not json", bump_ns=2 * 10**9)
+    assert table.get() is first
+    assert table.validation_failures == 2
+    assert table.reload_count == 1
+
+
+def test_invalid_service_costs_without_previous_snapshot(tmp_path):
+    path = tmp_path / "service_costs.json"
+    path.write_text(json.dumps([1, 2]))
+    table = ServiceCostTable(str(path))
+    with pytest.raises(RuntimeError):
+        table.get()
+    assert table.validation_failures == 1
+
+
+def test_validate_service_costs_reports_unknown_and_missing():
+    costs, unknown, missing = validate_service_costs({"Primary Care": 150, "Massage": 80})
+    assert costs == {"Primary Care": 150.0, "Massage": 80.0}
+    assert unknown == ["Massage"]
+    assert "Primary Care" not in missing and "Emergency Care" in missing
+    with pytest.raises(ValueError):
+        validate_service_costs({"Primary Care": -1})
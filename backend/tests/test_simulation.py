@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.cost_calculator import calculate_costs, load_service_costs
+from services.plan_catalog import SERVICE_INDEX
+from services.simulation import expected_frequencies, sample_annual_costs, simulate_costs
+from tests.conftest import make_payload
+
+client = TestClient(app)
+
+USAGE = {
+    "Primary Care": {"count": 4, "dates": ["2025-01-15", "2025-04-01", "2025-07-01", "2025-10-01"]},
+    "Emergency Care": {"count": 1, "dates": ["2025-03-02"]},
+}
+
+
+def test_expected_frequencies_apply_overrides():
+    frequencies = expected_frequencies(USAGE, {"Emergency Care": 0, "Specialist": 2.5})
+    assert frequencies == {"Primary Care": 4.0, "Specialist": 2.5}
+    with pytest.raises(ValueError):
+        expected_frequencies(USAGE, {"Specialist": -1})
+
+
+def test_simulation_is_reproducible_with_a_seed(sample_catalog, service_costs_file):
+    first = simulate_costs(USAGE, 0.22, "Self", samples=500, seed=7, time_budget=60)
+    second = simulate_costs(USAGE, 0.22, "Self", samples=500, seed=7, time_budget=60)
+    assert first["plans"] == second["plans"]
+    assert first["samples"] == 500 and not first["truncated"] and not first["capped"]
+    for plan in first["plans"].values():
+        assert plan["percentiles"]["p5"] <= plan["percentiles"]["p50"] <= plan["percentiles"]["p95"]
+        assert 0.0 <= plan["oop_max_probability"] <= 1.0
+
+
+def test_simulation_without_usage_matches_calculate_costs(sample_catalog, service_costs_file):
+    result = simulate_costs({}, 0.22, "Self", samples=50, seed=1)
+    expected = calculate_costs({}, 0.22, "Self")
+    assert set(result["plans"]) == set(expected)
+    for plan_id, plan in result["plans"].items():
+        assert plan["mean"] == pytest.approx(expected[plan_id]["total_cost"], abs=0.01)
+        assert plan["std"] == 0.0
+        assert plan["mean_out_of_pocket"] == 0.0
+
+
+def test_sampled_year_matches_calculate_costs(sample_catalog, service_costs_file):
+    # Two visits a month, both in the same slot: aggregated, they cost the
+    # same as the event-by-event replay up to per-event rounding
+    usage = {"Specialist": {"count": 24, "dates": [f"2025-{m:02d}-{d:02d}" for m in range(1, 13) for d in (3, 17)]}}
+    expected = calculate_costs(usage, 0.22, "Self")
+    snapshot = sample_catalog.get()
+    arrays = snapshot.arrays["Self"]
+    slot_services = np.full(12, SERVICE_INDEX["Specialist"])
+    slot_costs = np.full(12, load_service_costs()["Specialist"])
+    paid = sample_annual_costs(arrays, np.full((1, 12), 2), slot_services, slot_costs)
+    for plan, amount in zip(snapshot.tables["Self"], paid[0]):
+        assert amount == pytest.approx(expected[plan.plan_id]["cumulative_cost"], abs=0.05)
+
+
+def test_simulation_stops_at_the_time_budget(sample_catalog, service_costs_file, monkeypatch):
+    from services import simulation
+
+    monkeypatch.setattr(simulation, "SIM_MAX_CELLS", 1)
+    result = simulate_costs(USAGE, 0.22, "Self", samples=10000, seed=3, time_budget=1e-9)
+    assert result["truncated"]
+    assert 1 <= result["samples"] < 10000
+
+
+def test_simulation_reports_the_result_size_cap(sample_catalog, service_costs_file, monkeypatch):
+    from services import simulation
+
+    monkeypatch.setattr(simulation, "SIM_MAX_RESULT_CELLS", 300)
+    result = simulate_costs(USAGE, 0.22, "Self", samples=500, seed=3, time_budget=60)
+    # Three plans: at most 100 samples fit
+    assert result["samples"] == 100 and result["requested_samples"] == 500
+    assert result["capped"] and not result["truncated"]
+
+
+def test_simulate_endpoint(sample_catalog, service_costs_file, monkeypatch):
+    from routers import calculate
+    from services.calculation_pool import CalculationPool
+
+    monkeypatch.setattr(calculate, "calculation_pool", CalculationPool(workers=0, max_pending=4))
+    payload = {**make_payload(), "simulation": {"samples": 200, "seed": 11, "percentiles": [10, 90]}}
+    response = client.post("/api/calculate/simulate", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["samples"] == 200 and body["seed"] == 11
+    assert set(body["plans"]) == {"Blue Basic S", "Aetna HDHP S", "GEHA Standard S"}
+    assert set(body["plans"]["Blue Basic S"]["percentiles"]) == {"p10", "p90"}
+    assert client.post("/api/calculate/simulate", json=payload).json()["plans"] == body["plans"]
+
+    payload["simulation"]["percentiles"] = [101]
+    assert client.post("/api/calculate/simulate", json=payload).status_code == 422
+    payload["simulation"] = {"samples": 0}
+    assert client.post("/api/calculate/simulate", json=payload).status_code == 422
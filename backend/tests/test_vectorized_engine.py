@@ -0,0 +1,187 @@
+import random
+
+import numpy as np
+import pytest
+
+from services import cost_calculator
+from services.cost_calculator import (
+    MONTH_NAMES, _scalar_costs, _vectorized_costs, calculate_costs, calculate_service_cost, iter_plan_costs,
+    layout_events,
+)
+from services.plan_catalog import SERVICE_NAMES, UNKNOWN_SERVICE, compile_plan
+from services.vectorized_engine import SCALAR_PARITY_TOLERANCE, accumulate_payments, compile_plan_arrays
+from tests.conftest import SAMPLE_SERVICE_COSTS
+
+
+def random_plan(rng, plan_id):
+    services = {}
+    for service in SERVICE_NAMES:
+        kind = rng.random()
+        if kind < 0.3:
+            services[service] = {"copay": rng.choice([10.0, 25.0, 40.0, 150.0])}
+        elif kind < 0.7:
+            services[service] = {"coinsurance": rng.choice([0.1, 0.15, 0.2, 0.3])}
+        elif kind < 0.78:
+            services[service] = {"coinsurance": 0.25, "coinsurance_max": rng.choice([50.0, 350.0])}
+        elif kind < 0.85:
+            services[service] = {"deductible_applies": False, "coinsurance": 0.25}
+        else:
+            services[service] = rng.choice([0.2, 30.0])  # Plain CSV value, no coverage rule
+    return compile_plan(plan_id, {
+        "plan_name": plan_id,
+        "enrollment_type": "Self",
+        "premium": round(rng.uniform(50, 600), 2),
+        "deductible": rng.choice([0.0, 350.0, 1500.0, 3200.0]),
+        "oop_max": rng.choice([float("inf"), 2500.0, 6000.0]),
+        "hsa_hra_type": rng.choice(["HSA", "HRA", "N/A"]),
+        "hsa_pass_through": rng.choice([0.0, 750.0, 1200.0]),
+        "services": services,
+    })
+
+
+def random_events(rng, count):
+    events = []
+    for _ in range(count):
+        service_index = rng.randrange(UNKNOWN_SERVICE + 1)
+        events.append((rng.randrange(12), service_index, round(rng.uniform(5, 4000), 2)))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def assert_results_match(expected, actual):
+    assert list(expected) == list(actual)
+    for plan_id, plan in expected.items():
+        other = actual[plan_id]
+        assert other["plan_name"] == plan["plan_name"]
+        for month, value in plan["monthly_breakdown"].items():
+            assert other["monthly_breakdown"][month] == pytest.approx(value, abs=SCALAR_PARITY_TOLERANCE)
+        for key in ("total_cost", "tax_savings", "cumulative_cost", "unused_hsa", "unused_fsa", "hsa_growth"):
+            assert other[key] == pytest.approx(plan[key], abs=SCALAR_PARITY_TOLERANCE), (plan_id, key)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_vectorized_engine_matches_scalar(seed):
+    rng = random.Random(seed)
+    plans = tuple(random_plan(rng, f"plan-{i}") for i in range(rng.randrange(1, 40)))
+    events = random_events(rng, rng.randrange(0, 200))
+    financials = (rng.choice([0.0, 0.05]), rng.choice([1.0, 0.5]), rng.choice([0.0, 3000.0]), rng.choice([0.0, 2000.0]))
+
+    expected = _scalar_costs(plans, events, 0.22, financials)
+    actual = _vectorized_costs(compile_plan_arrays(plans), plans, events, 0.22, financials)
+    assert_results_match(expected, actual)
+
+
+def reference_out_of_pocket(plan, events):
+    """Replay ``events`` through calculate_service_cost, one call per event."""
+    deductible_remaining, oop_remaining = plan.deductible, plan.oop_max
+    monthly = [0.0] * 12
+    for month, service_index, service_cost in events:
+        deductible_applies, copay, coinsurance, coinsurance_max = plan.coverage[service_index]
+        coverage = {"deductible_applies": bool(deductible_applies), "copay": copay,
+                    "coinsurance": coinsurance, "coinsurance_max": coinsurance_max}
+        user_pays, deductible_remaining, oop_remaining, _ = calculate_service_cost(
+            service_cost, 1, coverage, deductible_remaining, oop_remaining)
+        monthly[month] += user_pays
+    return monthly
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_vectorized_engine_matches_reference_with_sub_cent_service_costs(seed):
+    rng = random.Random(seed)
+    plans = tuple(random_plan(rng, f"plan-{i}") for i in range(rng.randrange(1, 40)))
+    service_costs = {service: rng.uniform(5, 4000) for service in SERVICE_NAMES}
+    usage = {
+        service: {"dates": [f"2025-{rng.randrange(1, 13):02d}-01" for _ in range(rng.randrange(0, 12))]}
+        for service in SERVICE_NAMES
+    }
+    events = layout_events(usage, service_costs)
+    assert events and any(cost != round(cost, 2) for _, _, cost in events)
+
+    actual = _vectorized_costs(compile_plan_arrays(plans), plans, events, 0.22, (0.0, 1.0, 0.0, 0.0))
+    for plan in plans:
+        monthly = reference_out_of_pocket(plan, events)
+        result = actual[plan.plan_id]
+        assert result["cumulative_cost"] == pytest.approx(min(sum(monthly), plan.oop_max),
+                                                          abs=SCALAR_PARITY_TOLERANCE)
+        for month, paid in zip(MONTH_NAMES, monthly):
+            assert result["monthly_breakdown"][month] == pytest.approx(plan.premium + paid,
+                                                                       abs=SCALAR_PARITY_TOLERANCE)
+
+
+def test_accumulate_payments_caps_at_oop_and_deductible():
+    payments, deductible_left, oop_left = accumulate_payments(
+        np.array([300.0, 300.0, 300.0]),
+        np.ones((1, 3)),
+        np.zeros((1, 3)),
+        np.full((1, 3), 0.5),
+        np.array([400.0]),
+        np.array([600.0]),
+    )
+    # 300 to deductible, then 100 + 50% of 200, then capped at the remaining 100
+    np.testing.assert_allclose(payments, [[300.0, 200.0, 100.0]])
+    np.testing.assert_allclose(deductible_left, [0.0])
+    np.testing.assert_allclose(oop_left, [0.0])
+
+
+def test_calculate_costs_engine_switch(sample_catalog, service_costs_file):
+    usage = {
+        service: {"count": 4, "dates": ["2025-01-03", "2025-04-10", "2025-07-22", "2025-11-30"]}
+        for service in SAMPLE_SERVICE_COSTS
+    }
+    for plan_type in ("Self", "Self Plus One", "Self & Family", "Unknown"):
+        assert_results_match(
+            calculate_costs(usage, 0.24, plan_type, engine="scalar"),
+            calculate_costs(usage, 0.24, plan_type, engine="vectorized"),
+        )
+
+    with pytest.raises(ValueError):
+        calculate_costs(usage, 0.24, "Self", engine="gpu")
+
+
+def test_calculate_costs_uses_configured_engine(sample_catalog, service_costs_file, monkeypatch):
+    calls = []
+    monkeypatch.setattr(cost_calculator, "COST_ENGINE", "vectorized")
+    monkeypatch.setattr(cost_calculator, "_vectorized_costs", lambda *args: calls.append(args) or {})
+    calculate_costs({}, 0.2, "Self")
+    assert len(calls) == 1
+
+
+def test_iter_plan_costs_matches_calculate_costs(sample_catalog, service_costs_file):
+    usage = {
+        service: {"count": 2, "dates": ["2025-02-03", "2025-09-10"]}
+        for service in SAMPLE_SERVICE_COSTS
+    }
+    for engine in cost_calculator.ENGINES:
+        expected = calculate_costs(usage, 0.22, "Self", engine=engine)
+        streamed = list(iter_plan_costs(usage, 0.22, "Self", engine=engine, chunk_size=2))
+        assert [plan_id for plan_id, _ in streamed] == list(expected)
+        assert dict(streamed) == expected
+    assert list(iter_plan_costs(usage, 0.22, "Unknown", engine="vectorized")) == []
+
+
+@pytest.mark.parametrize("engine", ["scalar", "vectorized"])
+def test_rank_plan_costs_matches_full_sort(tmp_path, engine):
+    from benchmarks.synthetic import SYNTHETIC_SERVICE_COSTS, synthetic_usage, write_synthetic_catalog
+    from services.plan_catalog import PlanCatalog
+
+    snapshot = PlanCatalog(write_synthetic_catalog(str(tmp_path / "plans.csv"), 240, seed=5)).get()
+    for profile in ("light", "high_utilizer"):
+        usage = synthetic_usage(profile, seed=2)
+        full = calculate_costs(usage, 0.22, "Self", engine=engine, snapshot=snapshot,
+                               service_costs=SYNTHETIC_SERVICE_COSTS)
+        order = list(full)
+        expected = sorted(full, key=lambda plan_id: (full[plan_id]["total_cost"], order.index(plan_id)))
+
+        ranked, stats = cost_calculator.rank_plan_costs(usage, 0.22, "Self", top_k=10, engine=engine,
+                                                        snapshot=snapshot, service_costs=SYNTHETIC_SERVICE_COSTS)
+        assert [plan_id for plan_id, _ in ranked] == expected[:10]
+        assert all(result == full[plan_id] for plan_id, result in ranked)
+        assert stats["plans_considered"] == 80
+        if engine == "scalar":
+            assert stats["plans_evaluated"] < 80
+
+    premiums = {plan.plan_id: plan.premium for plan in snapshot.tables["Self"]}
+    ranked, stats = cost_calculator.rank_plan_costs({}, 0.22, "Self", top_k=3, sort_by="premiums", engine=engine,
+                                                    snapshot=snapshot, service_costs=SYNTHETIC_SERVICE_COSTS)
+    assert [plan_id for plan_id, _ in ranked] == sorted(premiums, key=premiums.get)[:3]
+    assert stats["plans_evaluated"] == 3
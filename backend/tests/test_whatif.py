@@ -0,0 +1,96 @@
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.cost_calculator import calculate_costs
+from services.whatif import apply_delta, build_state, replay_state
+from tests.conftest import SAMPLE_SERVICE_COSTS, make_payload
+
+client = TestClient(app)
+
+
+def random_usage(rng):
+    usage = {}
+    for service in rng.sample(sorted(SAMPLE_SERVICE_COSTS), 4):
+        dates = [f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}" for _ in range(rng.randrange(1, 6))]
+        usage[service] = {"count": len(dates), "dates": dates}
+    return usage
+
+
+def test_whatif_state_matches_calculate_costs(sample_catalog, service_costs_file):
+    usage = random_usage(random.Random(0))
+    expected = calculate_costs(usage, 0.22, "Self", engine="vectorized")
+    actual = build_state(usage, 0.22, "Self").results()
+    assert list(actual) == list(expected)
+    for plan_id, plan in expected.items():
+        for key in ("total_cost", "cumulative_cost", "tax_savings", "hsa_growth"):
+            assert actual[plan_id][key] == pytest.approx(plan[key], abs=0.01)
+        for month, value in plan["monthly_breakdown"].items():
+            assert actual[plan_id]["monthly_breakdown"][month] == pytest.approx(value, abs=0.01)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_replay_matches_full_rebuild(sample_catalog, service_costs_file, seed):
+    rng = random.Random(seed)
+    base = build_state(random_usage(rng), 0.22, "Self")
+    month = rng.randrange(1, 13)
+    user_input = apply_delta(base.user_input, add={"Emergency Care": [f"2025-{month:02d}-15"]})
+
+    state, start = replay_state(base, user_input)
+    rebuilt = build_state(user_input, 0.22, "Self")
+    assert start == month - 1
+    assert state.token == rebuilt.token
+    np.testing.assert_array_equal(state.payments, rebuilt.payments)
+    np.testing.assert_array_equal(state.deductible_remaining, rebuilt.deductible_remaining)
+    # Months before the change are reused, not recomputed
+    np.testing.assert_array_equal(state.payments[:, :start], base.payments[:, :start])
+
+
+def test_state_token_depends_on_the_service_costs_used(sample_catalog, service_costs_file):
+    usage = random_usage(random.Random(1))
+    default = build_state(usage, 0.22, "Self")
+    assert build_state(usage, 0.22, "Self", service_costs=dict(SAMPLE_SERVICE_COSTS)).token == default.token
+    pricier = {service: cost * 2 for service, cost in SAMPLE_SERVICE_COSTS.items()}
+    assert build_state(usage, 0.22, "Self", service_costs=pricier).token != default.token
+
+
+def test_apply_delta_adds_and_removes_dates():
+    usage = {"Primary Care": {"count": 2, "dates": ["2025-01-15", "2025-06-01"]}}
+    updated = apply_delta(usage, add={"Specialist": ["2025-03-01"]}, remove={"Primary Care": ["2025-01-15"]})
+    assert updated["Primary Care"] == {"count": 1, "dates": ["2025-06-01"]}
+    assert updated["Specialist"]["dates"] == ["2025-03-01"] and updated["Specialist"]["count"] == 1
+    assert usage["Primary Care"]["count"] == 2
+    with pytest.raises(ValueError):
+        apply_delta(usage, remove={"Primary Care": ["2025-02-01"]})
+    with pytest.raises(ValueError):
+        apply_delta(usage, add={"hsa": ["2025-02-01"]})
+
+
+def test_whatif_endpoints(sample_catalog, service_costs_file):
+    base = client.post("/api/calculate/whatif", json=make_payload())
+    assert base.status_code == 200
+    token = base.json()["token"]
+    assert base.json()["plans"] == client.post("/api/calculate", json=make_payload()).json()["plans"]
+
+    response = client.post(f"/api/calculate/whatif/{token}", json={"add": {"Emergency Care": ["2025-03-20"]}})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["replayed_from"] == "Mar" and body["base_token"] == token
+    expected = client.post("/api/calculate", json=make_payload(**{
+        "Primary Care": ["2025-01-15", "2025-06-01"],
+        "Emergency Care": ["2025-03-02", "2025-03-20"],
+    })).json()["plans"]
+    for plan_id, plan in expected.items():
+        assert body["plans"][plan_id]["annual_cost"] == pytest.approx(plan["annual_cost"], abs=0.01)
+
+    # Toggling the visit back off returns to the base scenario
+    undo = client.post(f"/api/calculate/whatif/{body['token']}", json={"remove": {"Emergency Care": ["2025-03-20"]}})
+    assert undo.json()["token"] == token
+    assert undo.json()["plans"] == base.json()["plans"]
+
+    assert client.post("/api/calculate/whatif/unknown", json={}).status_code == 404
+    missing = client.post(f"/api/calculate/whatif/{token}", json={"remove": {"Specialist": ["2025-01-01"]}})
+    assert missing.status_code == 422
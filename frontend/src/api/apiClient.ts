@@ -5,6 +5,8 @@ const baseURL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:8000/api
 
 const apiClient = axios.create({
   baseURL,
+  // Send the session cookie that keeps this browser's saved data separate
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
   },